@@ -2,7 +2,7 @@
 Ejemplo básico de uso del procesador HTML con diferentes clientes LLM.
 """
 
-import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from src.models import ProcessingOptions
 from src.pipeline import process_html
@@ -17,6 +17,32 @@ logger = setup_logging(
 # Cargar variables de entorno
 load_dotenv()
 
+def process_with_provider(html: str, model_name: str, task: str):
+    """
+    Procesa el HTML con un modelo y una tarea.
+    
+    Args:
+        html: HTML a procesar
+        model_name: Modelo LLM (determina el proveedor)
+        task: Tarea a realizar
+        
+    Returns:
+        ProcessingResult: Resultado del procesamiento
+    """
+    logger.info(f"Procesando con {model_name} - Tarea: {task}")
+    
+    # Configurar opciones
+    options = ProcessingOptions(
+        task=task,
+        language="he",  # Idioma principal
+        model=model_name,
+        temperature=0.7,
+        preserve_html=True,
+        use_cache=True  # Usar caché para evitar llamadas repetidas
+    )
+    
+    return process_html(html, options)
+
 def main():
     """Función principal del ejemplo."""
     # HTML de ejemplo con texto en hebreo y en inglés
@@ -47,23 +73,24 @@ def main():
     
     tasks = ["paraphrase", "summarize"]
     
-    for provider_name, model_name in providers:
-        for task in tasks:
+    # Cada combinación proveedor/tarea es independiente: lanzarlas en paralelo
+    # para solapar la espera de red en lugar de ejecutarlas una tras otra
+    jobs = [
+        (provider_name, model_name, task)
+        for provider_name, model_name in providers
+        for task in tasks
+    ]
+    
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = {
+            executor.submit(process_with_provider, html, model_name, task): (provider_name, task)
+            for provider_name, model_name, task in jobs
+        }
+        
+        for future in as_completed(futures):
+            provider_name, task = futures[future]
             try:
-                logger.info(f"Procesando con {provider_name}/{model_name} - Tarea: {task}")
-                
-                # Configurar opciones
-                options = ProcessingOptions(
-                    task=task,
-                    language="he",  # Idioma principal
-                    model=model_name,
-                    temperature=0.7,
-                    preserve_html=True,
-                    use_cache=True  # Usar caché para evitar llamadas repetidas
-                )
-                
-                # Procesar HTML
-                result = process_html(html, options)
+                result = future.result()
                 
                 # Mostrar resultado y estadísticas
                 logger.info(f"Resultado ({provider_name}/{task}):")
@@ -5,7 +5,7 @@ llm-html-processor - Procesador de HTML multilingüe con LLMs
 __version__ = "0.1.0"
 
 from .models import ProcessingOptions, ProcessingResult, TextChunk, CostEstimate
-from .pipeline import process_html
+from .pipeline import process_html, aprocess_html
 from .utils.logging import configure_from_env, get_logger
 from .cli import main as cli_main
 
@@ -15,6 +15,7 @@ configure_from_env()
 # API pública
 __all__ = [
     "process_html",
+    "aprocess_html",
     "ProcessingOptions",
     "ProcessingResult",
     "TextChunk",
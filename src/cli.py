@@ -3,7 +3,6 @@ Interfaz de línea de comandos para el procesador HTML.
 """
 
 import argparse
-import json
 import os
 import sys
 from pathlib import Path
@@ -12,6 +11,7 @@ from typing import Dict, Any, Optional
 from . import process_html
 from .models import ProcessingOptions
 from .utils.logging import configure_from_env, get_logger, LogConfig, setup_logging
+from .utils.serialization import dumps
 
 def parse_args() -> argparse.Namespace:
     """
@@ -75,6 +75,11 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Desactivar caché"
     )
+    parser.add_argument(
+        "--semantic-cache",
+        action="store_true",
+        help="Reutilizar respuestas de textos casi idénticos (requiere sentence-transformers)"
+    )
     parser.add_argument(
         "--clear-cache",
         action="store_true",
@@ -100,6 +105,17 @@ def parse_args() -> argparse.Namespace:
         default=2,
         help="Longitud mínima de texto para procesar"
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=16,
+        help="Chunks agrupados por petición al LLM (1 = una petición por chunk)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Recibir las respuestas del LLM en streaming"
+    )
     parser.add_argument(
         "--recursive",
         action="store_true",
@@ -236,8 +252,8 @@ def save_stats(stats: Dict[str, Any], filename: str) -> None:
         filename: Nombre del archivo
     """
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, indent=2)
+        with open(filename, 'wb') as f:
+            f.write(dumps(stats, indent=True))
     except Exception as e:
         logger = get_logger()
         logger.error(f"Error al guardar estadísticas: {e}")
@@ -271,7 +287,10 @@ def main() -> int:
         max_tokens=args.max_tokens,
         extra_prompt=args.prompt,
         use_cache=not args.no_cache,
-        min_text_length=args.min_text_length
+        semantic_cache=args.semantic_cache,
+        min_text_length=args.min_text_length,
+        batch_size=args.batch_size,
+        stream=args.stream
     )
     
     # Estadísticas globales
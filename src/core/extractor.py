@@ -3,53 +3,247 @@ Extractor de texto de documentos HTML.
 """
 
 import re
-from bs4 import BeautifulSoup, Tag, NavigableString, ParserError
-from typing import List, Optional
+import weakref
+from collections import Counter
+from bs4 import BeautifulSoup, Tag, NavigableString, ParserRejectedMarkup, SoupStrainer
+from bs4.element import PreformattedString
+from typing import IO, Any, Dict, Iterable, List, Optional, Tuple, Union
 from ..models import TextChunk
 from .errors import MalformedHTMLError, EmptyHTMLError, HTMLTooLargeError
+from .parser import make_soup
 from ..utils.logging import get_logger
 
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml es opcional: se usa solo BeautifulSoup
+    etree = None
+    lxml_html = None
+
 logger = get_logger("extractor")
 
 # Constantes para validación
 MAX_HTML_SIZE = 10 * 1024 * 1024  # 10 MB
 MIN_HTML_SIZE = 10  # 10 bytes
 
-def _generate_css_path(node: Tag) -> str:
+# Tags cuyo contenido nunca se envía al LLM
+_NON_TEXT_TAGS = frozenset({
+    'script', 'style', 'noscript', 'template', 'head', 'meta', 'link', 'title'
+})
+
+# Tags con código: su texto no debe reescribirse (se omite el subárbol entero)
+_CODE_TAGS = frozenset({'code', 'pre', 'kbd', 'samp'})
+_SKIP_SUBTREE_TAGS = _NON_TEXT_TAGS | _CODE_TAGS
+
+# Textos sin contenido lingüístico: solo números/puntuación/símbolos, o una URL
+_SKIP_RE = re.compile(r'^[\s\d\W_]+$|^https?://\S*$')
+
+def _is_text_bearing(name: str, attrs: Optional[dict] = None) -> bool:
+    """Filtro de parseo: descarta <html> y los tags sin texto de nivel superior."""
+    return name != 'html' and name not in _NON_TEXT_TAGS
+
+# BeautifulSoup solo aplica el strainer a los tags de nivel superior: al
+# descartar <html> se evalúan sus hijos, y <head> se omite sin construir su
+# subárbol. Los tags sin texto anidados en <body> se saltan en el recorrido.
+_TEXT_STRAINER = SoupStrainer(_is_text_bearing)
+
+# Códigos de idiomas RTL comunes (se compara el subtag de 2 letras)
+_RTL_LANGS = frozenset({'he', 'ar', 'fa', 'ur', 'yi', 'ps', 'dv'})
+
+# Bloques Unicode de escrituras RTL: hebreo a árabe extendido, y formas de
+# presentación hebreas y árabes
+_RTL_RANGES = ((0x0590, 0x08FF), (0xFB1D, 0xFDFF), (0xFE70, 0xFEFF))
+
+# Atributos del <html> raíz relevantes para RTL (el strainer descarta el tag)
+_HTML_TAG_RE = re.compile(r'<html\b([^>]*)>', re.I)
+_ROOT_ATTR_RE = re.compile(r'\b(dir|lang)\s*=\s*["\']?([^"\'\s>]+)', re.I)
+
+# libxml2 añade un DOCTYPE HTML 4.0 por defecto cuando el documento no lo
+# declara; extract_document registra esas raíces para no serializarlo
+_DOCTYPE_RE = re.compile(r'\s*(<!--.*?-->\s*)*<!doctype', re.I | re.S)
+IMPLIED_DOCTYPE_ROOTS: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+# Contenido de scripts y estilos (texto plano, no anidable). Se vacía antes
+# de parsear conservando el tag, para que los paths (nth-of-type) no cambien.
+# También se buscan los comentarios, para saltarlos: un <script> dentro de un
+# comentario no abre nada. El lookahead excluye elementos como <script-loader>
+_RAW_TEXT_OPEN_RE = re.compile(r'<!--|<(script|style)(?=[\s/>])[^>]*>', re.I)
+_COMMENT_CLOSE = '-->'
+_RAW_TEXT_CLOSE_RE = {
+    'script': re.compile(r'</script\s*>', re.I),
+    'style': re.compile(r'</style\s*>', re.I),
+}
+
+# Patrones de _sanitize_html, compilados una vez
+_NULL_TABLE = str.maketrans('', '', '\0')
+_UNCLOSED_RE = re.compile(r'<(img|br|hr|meta|input|link)([^>]*[^/])>', re.I)
+_ATTR_RE = re.compile(r'=([^\s>"\'][^\s>]*)')
+
+def _strip_raw_text(html: str) -> str:
+    """
+    Vacía el contenido de los tags <script> y <style>.
+    
+    Busca cada apertura y su cierre por separado: con un único patrón
+    perezoso (.*?) la búsqueda es más lenta que dejar que el parser lo lea.
+    
+    Args:
+        html: HTML a procesar
+        
+    Returns:
+        str: HTML con scripts y estilos vacíos
+    """
+    parts = []
+    pos = 0
+    search_from = 0
+    while True:
+        opening = _RAW_TEXT_OPEN_RE.search(html, search_from)
+        if not opening:
+            break
+        if opening.group(1) is None:
+            # Comentario: se conserva tal cual (incluye <!--> y <!--->)
+            end = html.find(_COMMENT_CLOSE, opening.start() + 2)
+            if end < 0:
+                break
+            search_from = end + len(_COMMENT_CLOSE)
+            continue
+        closing = _RAW_TEXT_CLOSE_RE[opening.group(1).lower()].search(html, opening.end())
+        if not closing:
+            break
+        parts.append(html[pos:opening.end()])
+        pos = search_from = closing.start()
+    
+    if not parts:
+        return html
+    parts.append(html[pos:])
+    return "".join(parts)
+
+def _copy_root_attrs(html: str, soup: BeautifulSoup) -> None:
+    """
+    Copia dir/lang del tag <html> al documento para que _detect_rtl los vea.
+    
+    Args:
+        html: HTML original
+        soup: Documento parseado con _TEXT_STRAINER
+    """
+    match = _HTML_TAG_RE.search(html)
+    if match:
+        for name, value in _ROOT_ATTR_RE.findall(match.group(1)):
+            soup.attrs[name.lower()] = value
+
+def _is_rtl_lang(lang: Optional[str]) -> bool:
+    """Indica si un atributo lang corresponde a un idioma RTL."""
+    return bool(lang) and lang[:2].lower() in _RTL_LANGS
+
+def _is_rtl_text(text: str) -> bool:
+    """Indica si el primer carácter visible del texto es de una escritura RTL."""
+    for char in text:
+        if not char.isspace():
+            code = ord(char)
+            return any(low <= code <= high for low, high in _RTL_RANGES)
+    return False
+
+def _sibling_indices(parent: Tag) -> Dict[int, int]:
+    """
+    Calcula en una sola pasada la posición de cada hijo entre sus hermanos
+    del mismo tag.
+    
+    Args:
+        parent: Nodo BeautifulSoup padre
+        
+    Returns:
+        Dict[int, int]: Índice 1-based por id() del hijo, o 0 si es el único
+            hermano con ese tag
+    """
+    totals: Counter = Counter()
+    indices: Dict[int, Tuple[str, int]] = {}
+    for child in parent.children:
+        if isinstance(child, Tag):
+            totals[child.name] += 1
+            indices[id(child)] = (child.name, totals[child.name])
+    return {
+        key: index if totals[name] > 1 else 0
+        for key, (name, index) in indices.items()
+    }
+
+def _sibling_index(node: Tag, cache: Optional[Dict[int, Dict[int, int]]] = None) -> int:
+    """
+    Calcula la posición de un nodo entre sus hermanos del mismo tag.
+    
+    Args:
+        node: Nodo BeautifulSoup
+        cache: Índices ya calculados por id() del padre. Cada padre se
+            recorre una sola vez, sea cual sea el número de hijos consultados.
+        
+    Returns:
+        int: Índice 1-based, o 0 si es el único hermano con ese tag
+    """
+    parent = node.parent
+    if not parent:
+        return 0
+    
+    if cache is None:
+        return _sibling_indices(parent).get(id(node), 0)
+    
+    indices = cache.get(id(parent))
+    if indices is None:
+        indices = cache[id(parent)] = _sibling_indices(parent)
+    return indices.get(id(node), 0)
+
+def _generate_css_path(
+    node: Tag,
+    cache: Optional[Dict[int, str]] = None,
+    sibling_cache: Optional[Dict[int, Dict[int, int]]] = None
+) -> str:
     """
     Genera un path CSS único para un nodo.
     
     Args:
         node: Nodo BeautifulSoup
+        cache: Paths ya calculados, indexados por id() del nodo. Se completa
+            con el path de cada ancestro recorrido.
+        sibling_cache: Índices entre hermanos por id() del padre (ver
+            _sibling_index)
         
     Returns:
         str: Path CSS para el nodo
     """
-    path_parts = []
-    current = node
+    if cache is None:
+        cache = {}
+    if sibling_cache is None:
+        sibling_cache = {}
     
+    # Subir hasta la raíz o hasta el primer ancestro con path conocido
+    pending = []
+    current = node
+    prefix = ""
     while current and current.name != "[document]":
-        # Obtener el tag
-        tag_str = current.name
-        
-        # Añadir ID si existe
-        if current.get('id'):
-            tag_str += f"#{current['id']}"
-        # Si no hay ID pero hay clase, añadir la primera clase
-        elif current.get('class'):
-            tag_str += f".{current['class'][0]}"
-        # Si no hay ID ni clase, añadir índice entre hermanos del mismo tipo
-        else:
-            siblings = list(filter(lambda x: x.name == current.name, 
-                                  list(current.parent.children) if current.parent else []))
-            if len(siblings) > 1:
-                index = siblings.index(current) + 1
-                tag_str += f":nth-of-type({index})"
-                
-        path_parts.append(tag_str)
+        cached = cache.get(id(current))
+        if cached is not None:
+            prefix = cached
+            break
+        pending.append(current)
         current = current.parent
+    
+    # Construir los paths de arriba abajo, guardando cada sufijo parcial
+    for current in reversed(pending):
+        name = current.name
+        attrs = current.attrs
+        elem_id = attrs.get('id')
+        classes = attrs.get('class')
         
-    return " > ".join(reversed(path_parts))
+        # Cada segmento se compone de una vez: ID, primera clase o índice
+        # entre hermanos del mismo tipo (solo si hay más de uno)
+        if elem_id:
+            segment = f"{name}#{elem_id}"
+        elif classes:
+            segment = f"{name}.{classes[0]}"
+        else:
+            index = _sibling_index(current, sibling_cache)
+            segment = f"{name}:nth-of-type({index})" if index else name
+        
+        prefix = f"{prefix} > {segment}" if prefix else segment
+        cache[id(current)] = prefix
+        
+    return prefix
 
 def _detect_rtl(node: Tag) -> bool:
     """
@@ -61,29 +255,22 @@ def _detect_rtl(node: Tag) -> bool:
     Returns:
         bool: True si es RTL, False en caso contrario
     """
-    # Verificar atributos explícitos
-    if node.get('dir') == 'rtl':
-        return True
-    
-    # Verificar atributos en padres
-    parent = node.parent
-    while parent:
-        if parent.get('dir') == 'rtl':
+    # Una sola subida: dir="rtl" en el nodo o un ancestro, y el lang más cercano
+    lang = None
+    current = node
+    while current is not None:
+        if current.get('dir') == 'rtl':
             return True
-        parent = parent.parent
+        if lang is None:
+            lang = current.get('lang')
+        current = current.parent
     
     # Verificar atributos lang que indiquen idiomas RTL comunes
-    rtl_langs = ['he', 'ar', 'fa', 'ur']
-    lang = node.get('lang') or (node.parent.get('lang') if node.parent else None)
-    if lang and any(lang.startswith(rtl) for rtl in rtl_langs):
+    if _is_rtl_lang(lang):
         return True
     
     # Verificar clases que puedan indicar RTL
-    classes = node.get('class', [])
-    if any('rtl' in cls.lower() for cls in classes):
-        return True
-        
-    return False
+    return any('rtl' in cls.casefold() for cls in node.get('class', []))
 
 def _sanitize_html(html: str) -> str:
     """
@@ -96,16 +283,14 @@ def _sanitize_html(html: str) -> str:
         str: HTML sanitizado
     """
     # Eliminar caracteres nulos
-    html = html.replace('\0', '')
+    html = html.translate(_NULL_TABLE)
     
-    # Corregir tags no cerrados comunes
-    unclosed_tags = ['img', 'br', 'hr', 'meta', 'input', 'link']
-    for tag in unclosed_tags:
-        # Reemplazar <tag> por <tag/>
-        html = re.sub(f'<{tag}([^>]*[^/])>', f'<{tag}\\1/>', html)
+    # Corregir atributos sin comillas (antes de cerrar tags, para no
+    # incluir la "/" añadida en el valor)
+    html = _ATTR_RE.sub(r'="\1"', html)
     
-    # Corregir atributos sin comillas
-    html = re.sub(r'=([^\s>][^\s>]*)', r'="\1"', html)
+    # Corregir tags no cerrados comunes: <tag> por <tag/>
+    html = _UNCLOSED_RE.sub(r'<\1\2/>', html)
     
     return html
 
@@ -132,34 +317,29 @@ def _validate_html(html: str) -> None:
             MAX_HTML_SIZE
         )
 
-def extract_text_nodes(html: str, min_text_length: int = 2) -> List[TextChunk]:
+def _extract_bs4(html: str, min_text_length: int) -> List[TextChunk]:
     """
-    Extrae nodos de texto del HTML preservando su estructura.
+    Extrae nodos de texto recorriendo el árbol de BeautifulSoup.
     
     Args:
         html: Contenido HTML como string
-        min_text_length: Longitud mínima de texto para extraer (evita espacios, etc.)
+        min_text_length: Longitud mínima de texto para extraer
         
     Returns:
         List[TextChunk]: Lista de fragmentos de texto con sus paths
         
     Raises:
         MalformedHTMLError: Si el HTML está malformado
-        EmptyHTMLError: Si el HTML está vacío
-        HTMLTooLargeError: Si el HTML es demasiado grande
     """
-    # Validar HTML
-    _validate_html(html)
-    
     # Intentar parsear el HTML
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-    except ParserError as e:
+        soup = make_soup(html, parse_only=_TEXT_STRAINER)
+    except ParserRejectedMarkup as e:
         # Intentar sanitizar y reprocesar
         logger.warning(f"HTML malformado, intentando sanitizar: {str(e)}")
         try:
             sanitized_html = _sanitize_html(html)
-            soup = BeautifulSoup(sanitized_html, 'html.parser')
+            soup = make_soup(sanitized_html, parse_only=_TEXT_STRAINER)
         except Exception as e:
             # Si falla después de sanitizar, lanzar excepción
             error_fragment = html[:100] + "..." if len(html) > 100 else html
@@ -168,30 +348,57 @@ def extract_text_nodes(html: str, min_text_length: int = 2) -> List[TextChunk]:
                 error_fragment
             )
     
+    _copy_root_attrs(html, soup)
+    return _walk_bs4(soup, min_text_length)
+
+def _walk_bs4(
+    soup: BeautifulSoup,
+    min_text_length: int,
+    keep_refs: bool = False
+) -> List[TextChunk]:
+    """
+    Recorre un árbol de BeautifulSoup y extrae sus nodos de texto.
+    
+    Args:
+        soup: Documento parseado
+        min_text_length: Longitud mínima de texto para extraer
+        keep_refs: Si se guarda el NavigableString en TextChunk._node_ref
+        
+    Returns:
+        List[TextChunk]: Lista de fragmentos de texto con sus paths
+    """
     chunks = []
+    path_cache: Dict[int, str] = {}
+    sibling_cache: Dict[int, Dict[int, int]] = {}
     
     # Función recursiva para procesar nodos
     def process_node(node, parent_path: Optional[str] = None):
+        if isinstance(node, PreformattedString):
+            # Comentarios, CDATA, doctype: no son texto visible
+            return
         if isinstance(node, NavigableString):
-            if node.strip() and len(node.strip()) >= min_text_length:
+            text = node.strip()
+            if text and len(text) >= min_text_length and not _SKIP_RE.match(text):
                 if node.parent:
                     try:
-                        path = _generate_css_path(node.parent)
-                        is_rtl = _detect_rtl(node.parent)
+                        path = _generate_css_path(node.parent, path_cache, sibling_cache)
+                        is_rtl = _detect_rtl(node.parent) or _is_rtl_text(text)
                         chunks.append(TextChunk(
-                            text=node.strip(),
+                            text=text,
                             path=path,
-                            is_rtl=is_rtl
+                            is_rtl=is_rtl,
+                            _node_ref=node if keep_refs else None
                         ))
                     except Exception as e:
                         # Si falla la generación del path, usar un path genérico
                         logger.warning(f"Error generando path CSS: {str(e)}")
                         chunks.append(TextChunk(
-                            text=node.strip(),
+                            text=text,
                             path=f"body {node.parent.name}" if node.parent and node.parent.name else "body",
-                            is_rtl=False
+                            is_rtl=False,
+                            _node_ref=node if keep_refs else None
                         ))
-        elif isinstance(node, Tag):
+        elif isinstance(node, Tag) and node.name not in _SKIP_SUBTREE_TAGS:
             # Procesar hijos
             for child in node.children:
                 process_node(child)
@@ -199,5 +406,456 @@ def extract_text_nodes(html: str, min_text_length: int = 2) -> List[TextChunk]:
     # Iniciar procesamiento
     process_node(soup)
     
+    return chunks
+
+class _Frame:
+    """Estado de un elemento abierto durante el recorrido con lxml."""
+    __slots__ = ("path", "dir_rtl", "lang", "is_rtl", "totals", "seen")
+    
+    def __init__(self, path: str, dir_rtl: bool, lang: Optional[str]):
+        self.path = path
+        self.dir_rtl = dir_rtl
+        self.lang = lang
+        self.is_rtl = dir_rtl
+        self.totals: Optional[Counter] = None  # Hijos por tag, calculado al abrir el primero
+        self.seen: Dict[str, int] = {}  # Hijos por tag vistos hasta ahora
+
+def _extract_lxml(html: str, min_text_length: int) -> List[TextChunk]:
+    """
+    Extrae nodos de texto con un único recorrido iterwalk de lxml.
+    
+    Mantiene una pila con el path, el estado RTL y el conteo de hermanos de
+    cada elemento abierto, de modo que cada path se calcula una sola vez y
+    el texto se lee directamente de elem.text / child.tail. Produce los
+    mismos paths que _extract_bs4 con _TEXT_STRAINER.
+    
+    Args:
+        html: Contenido HTML como string
+        min_text_length: Longitud mínima de texto para extraer
+        
+    Returns:
+        List[TextChunk]: Lista de fragmentos de texto con sus paths
+        
+    Raises:
+        etree.LxmlError, ValueError: Si lxml no puede parsear el HTML
+    """
+    return _walk_lxml(lxml_html.document_fromstring(html), min_text_length)
+
+def _walk_lxml(root: Any, min_text_length: int, keep_refs: bool = False) -> List[TextChunk]:
+    """
+    Recorre un documento lxml y extrae sus nodos de texto.
+    
+    Args:
+        root: Elemento <html> raíz
+        min_text_length: Longitud mínima de texto para extraer
+        keep_refs: Si se guarda (elemento, "text" | "tail") en TextChunk._node_ref
+        
+    Returns:
+        List[TextChunk]: Lista de fragmentos de texto con sus paths
+    """
+    chunks: List[TextChunk] = []
+    
+    def emit(owner: Any, attr: str, frame: _Frame) -> None:
+        text = getattr(owner, attr)
+        # El texto directo de <html> no forma parte del árbol filtrado
+        if text and frame.path:
+            text = text.strip()
+            if text and len(text) >= min_text_length and not _SKIP_RE.match(text):
+                chunks.append(TextChunk(
+                    text=text,
+                    path=frame.path,
+                    is_rtl=frame.is_rtl or _is_rtl_text(text),
+                    _node_ref=(owner, attr) if keep_refs else None
+                ))
+    
+    def emit_comment_tails(node: Optional[Any], frame: _Frame) -> None:
+        # iterwalk no emite eventos para comentarios: su tail se lee desde
+        # el hermano anterior (o desde el padre si van al principio)
+        while node is not None and not isinstance(node.tag, str):
+            emit(node, "tail", frame)
+            node = node.getnext()
+    
+    stack: List[_Frame] = []
+    walker = etree.iterwalk(root, events=("start", "end"))
+    for event, elem in walker:
+        tag = elem.tag
+        
+        if event == "end":
+            stack.pop()
+            if stack:
+                emit(elem, "tail", stack[-1])
+                emit_comment_tails(elem.getnext(), stack[-1])
+            continue
+        
+        if not stack:
+            stack.append(_Frame("", elem.get("dir") == "rtl", elem.get("lang")))
+            continue
+        
+        parent = stack[-1]
+        if parent.totals is None:
+            parent.totals = Counter(child.tag for child in elem.getparent())
+        index = parent.seen[tag] = parent.seen.get(tag, 0) + 1
+        
+        elem_id = elem.get("id")
+        classes = (elem.get("class") or "").split()
+        if elem_id:
+            segment = f"{tag}#{elem_id}"
+        elif classes:
+            segment = f"{tag}.{classes[0]}"
+        elif parent.totals[tag] > 1:
+            segment = f"{tag}:nth-of-type({index})"
+        else:
+            segment = tag
+        
+        # lang se hereda del ancestro más cercano que lo declare
+        lang = elem.get("lang") or parent.lang
+        frame = _Frame(
+            f"{parent.path} > {segment}" if parent.path else segment,
+            parent.dir_rtl or elem.get("dir") == "rtl",
+            lang,
+        )
+        frame.is_rtl = (
+            frame.dir_rtl
+            or _is_rtl_lang(lang)
+            or any("rtl" in cls.casefold() for cls in classes)
+        )
+        stack.append(frame)
+        
+        if tag in _SKIP_SUBTREE_TAGS:
+            walker.skip_subtree()
+        else:
+            emit(elem, "text", frame)
+            if len(elem):
+                emit_comment_tails(elem[0], frame)
+    
+    return chunks
+
+def build_path_index(
+    document: Any,
+    text_nodes: Optional[List[NavigableString]] = None
+) -> Dict[str, Any]:
+    """
+    Calcula en un solo recorrido el path de cada elemento del documento.
+    
+    Los paths tienen el mismo formato que los de los chunks extraídos, de
+    modo que cada chunk se localiza con una consulta al diccionario en vez
+    de una búsqueda por selector. Si varios elementos comparten path, se
+    conserva el primero en orden de documento. Los subárboles que el
+    extractor omite (script, code...) no se indexan.
+    
+    Args:
+        document: Raíz lxml o documento BeautifulSoup
+        text_nodes: Solo BeautifulSoup: si se indica, se añaden en el mismo
+            recorrido los nodos de texto visibles, en orden de documento
+            (sin comentarios ni los subárboles omitidos)
+        
+    Returns:
+        Dict[str, Any]: Elemento por path
+    """
+    index: Dict[str, Any] = {}
+    
+    if isinstance(document, BeautifulSoup):
+        path_cache: Dict[int, str] = {}
+        sibling_cache: Dict[int, Dict[int, int]] = {}
+        if document.html is not None:
+            # Los paths del extractor empiezan por debajo de <html>
+            path_cache[id(document.html)] = ""
+        stack: List[Any] = [document]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Tag):
+                if node is not document:
+                    path = _generate_css_path(node, path_cache, sibling_cache)
+                    if path:
+                        index.setdefault(path, node)
+                    if node.name in _SKIP_SUBTREE_TAGS:
+                        continue
+                # Recorrido en preorden: el primer hijo sale antes de la pila
+                stack.extend(reversed(node.contents))
+            elif text_nodes is not None and not isinstance(node, PreformattedString):
+                text_nodes.append(node)
+        return index
+    
+    lxml_stack: List[Tuple[Any, str]] = [(document, "")]
+    while lxml_stack:
+        parent, prefix = lxml_stack.pop()
+        totals = Counter(child.tag for child in parent)
+        seen: Counter = Counter()
+        children = []
+        for child in parent:
+            tag = child.tag
+            if not isinstance(tag, str):
+                continue
+            seen[tag] += 1
+            elem_id = child.get("id")
+            classes = (child.get("class") or "").split()
+            if elem_id:
+                segment = f"{tag}#{elem_id}"
+            elif classes:
+                segment = f"{tag}.{classes[0]}"
+            elif totals[tag] > 1:
+                segment = f"{tag}:nth-of-type({seen[tag]})"
+            else:
+                segment = tag
+            path = f"{prefix} > {segment}" if prefix else segment
+            index.setdefault(path, child)
+            if tag not in _SKIP_SUBTREE_TAGS:
+                children.append((child, path))
+        # Orden de documento: el primer hijo se expande antes
+        lxml_stack.extend(reversed(children))
+    return index
+
+STREAMING_BLOCK_SIZE = 64 * 1024  # 64 KB por llamada a feed()
+
+class _StreamFrame:
+    """Elemento abierto (o ya cerrado, si tiene texto pendiente) en _TextTarget."""
+    __slots__ = ("parent", "tag", "elem_id", "first_class", "index",
+                 "dir_rtl", "lang", "is_rtl", "totals", "_path")
+    
+    def __init__(self, parent: Optional["_StreamFrame"], tag: str, attrs: Dict[str, str]):
+        self.parent = parent
+        self.tag = tag
+        self.elem_id = attrs.get("id")
+        classes = (attrs.get("class") or "").split()
+        self.first_class = classes[0] if classes else None
+        self.totals: Optional[Counter] = None  # Hijos por tag vistos hasta ahora
+        self._path: Optional[str] = None
+        
+        if parent is None:
+            self.lang = attrs.get("lang")
+            self.index = 0
+            self.dir_rtl = attrs.get("dir") == "rtl"
+            self.is_rtl = self.dir_rtl
+            return
+        
+        if parent.totals is None:
+            parent.totals = Counter()
+        parent.totals[tag] += 1
+        self.index = parent.totals[tag]
+        self.dir_rtl = parent.dir_rtl or attrs.get("dir") == "rtl"
+        # lang se hereda del ancestro más cercano que lo declare
+        self.lang = attrs.get("lang") or parent.lang
+        self.is_rtl = (
+            self.dir_rtl
+            or _is_rtl_lang(self.lang)
+            or any("rtl" in cls.casefold() for cls in classes)
+        )
+    
+    def path(self) -> str:
+        """Path CSS del elemento; solo es definitivo cuando su padre se ha cerrado."""
+        if self._path is None:
+            parent = self.parent
+            if parent is None:
+                self._path = ""
+            else:
+                if self.elem_id:
+                    segment = f"{self.tag}#{self.elem_id}"
+                elif self.first_class:
+                    segment = f"{self.tag}.{self.first_class}"
+                elif parent.totals[self.tag] > 1:
+                    segment = f"{self.tag}:nth-of-type({self.index})"
+                else:
+                    segment = self.tag
+                parent_path = parent.path()
+                self._path = f"{parent_path} > {segment}" if parent_path else segment
+        return self._path
+
+class _TextTarget:
+    """
+    Target para lxml.etree.HTMLParser: extrae el texto a partir de los
+    eventos del parser, sin construir el árbol.
+    
+    Solo se conservan la pila de elementos abiertos y los elementos con texto
+    pendiente. Los paths se resuelven en close(), porque el nth-of-type de un
+    elemento depende de hermanos que aún no se han parseado.
+    """
+    
+    def __init__(self, min_text_length: int):
+        self.min_text_length = min_text_length
+        self.stack: List[_StreamFrame] = []
+        self.skip_depth = 0
+        self.buffer: List[str] = []
+        self.pending: List[Tuple[str, _StreamFrame]] = []
+    
+    def _flush(self) -> None:
+        if not self.buffer:
+            return
+        text = "".join(self.buffer).strip()
+        self.buffer = []
+        # El texto directo de <html> no forma parte del árbol filtrado
+        if (text and len(self.stack) > 1 and len(text) >= self.min_text_length
+                and not _SKIP_RE.match(text)):
+            self.pending.append((text, self.stack[-1]))
+    
+    def start(self, tag: str, attrs: Dict[str, str]) -> None:
+        self._flush()
+        if self.skip_depth:
+            self.skip_depth += 1
+            return
+        frame = _StreamFrame(self.stack[-1] if self.stack else None, tag, attrs)
+        if tag in _SKIP_SUBTREE_TAGS and self.stack:
+            self.skip_depth = 1
+            return
+        self.stack.append(frame)
+    
+    def end(self, tag: str) -> None:
+        self._flush()
+        if self.skip_depth:
+            self.skip_depth -= 1
+        elif self.stack:
+            self.stack.pop()
+    
+    def data(self, data: str) -> None:
+        if not self.skip_depth:
+            self.buffer.append(data)
+    
+    def comment(self, text: str) -> None:
+        # Un comentario separa nodos de texto (text / tail en el árbol)
+        self._flush()
+    
+    def close(self) -> List[TextChunk]:
+        self._flush()
+        return [
+            TextChunk(text=text, path=frame.path(), is_rtl=frame.is_rtl or _is_rtl_text(text))
+            for text, frame in self.pending
+        ]
+
+def extract_text_nodes_streaming(
+    source: Union[IO, Iterable[Union[str, bytes]]],
+    min_text_length: int = 2,
+    block_size: int = STREAMING_BLOCK_SIZE
+) -> List[TextChunk]:
+    """
+    Extrae nodos de texto alimentando el parser de lxml por bloques.
+    
+    Produce los mismos fragmentos que extract_text_nodes, pero lee la entrada
+    por bloques (un fichero abierto o un iterable de strings/bytes) y no
+    construye el árbol, de modo que el documento nunca está entero en memoria.
+    
+    Args:
+        source: Fichero abierto (se lee con read(block_size)) o iterable de
+            bloques de HTML
+        min_text_length: Longitud mínima de texto para extraer
+        block_size: Tamaño de bloque al leer de un fichero
+        
+    Returns:
+        List[TextChunk]: Lista de fragmentos de texto con sus paths
+        
+    Raises:
+        EmptyHTMLError: Si el HTML está vacío
+        HTMLTooLargeError: Si el HTML es demasiado grande
+        MalformedHTMLError: Si lxml no está disponible o no puede parsear el HTML
+    """
+    if lxml_html is None:
+        raise MalformedHTMLError("La extracción por bloques requiere lxml", "")
+    
+    if hasattr(source, "read"):
+        blocks: Iterable[Union[str, bytes]] = iter(lambda: source.read(block_size), source.read(0))
+    else:
+        blocks = source
+    
+    target = _TextTarget(min_text_length)
+    parser = None
+    size = 0
+    content = 0
+    try:
+        for block in blocks:
+            size += len(block)
+            if size > MAX_HTML_SIZE:
+                raise HTMLTooLargeError(
+                    f"El HTML es demasiado grande (más de {MAX_HTML_SIZE} bytes)",
+                    size,
+                    MAX_HTML_SIZE
+                )
+            if content < MIN_HTML_SIZE:
+                content += len(block.strip())
+            if parser is None:
+                # Con bytes se asume UTF-8, como en make_soup
+                parser = etree.HTMLParser(
+                    target=target,
+                    encoding="utf-8" if isinstance(block, bytes) else None
+                )
+            parser.feed(block)
+        
+        if parser is None or content < MIN_HTML_SIZE:
+            raise EmptyHTMLError("El HTML está vacío o es demasiado pequeño")
+        return parser.close()
+    except (etree.LxmlError, ValueError) as e:
+        raise MalformedHTMLError(f"No se pudo parsear el HTML: {str(e)}", "")
+
+def extract_text_nodes(html: str, min_text_length: int = 2) -> List[TextChunk]:
+    """
+    Extrae nodos de texto del HTML preservando su estructura.
+    
+    Args:
+        html: Contenido HTML como string
+        min_text_length: Longitud mínima de texto para extraer (evita espacios, etc.)
+        
+    Returns:
+        List[TextChunk]: Lista de fragmentos de texto con sus paths
+        
+    Raises:
+        MalformedHTMLError: Si el HTML está malformado
+        EmptyHTMLError: Si el HTML está vacío
+        HTMLTooLargeError: Si el HTML es demasiado grande
+    """
+    # Validar HTML
+    _validate_html(html)
+    
+    # Ahorrar al parser el contenido de scripts y estilos
+    html = _strip_raw_text(html)
+    
+    # Camino rápido con lxml; BeautifulSoup solo si lxml no puede parsear
+    chunks: Optional[List[TextChunk]] = None
+    if lxml_html is not None:
+        try:
+            chunks = _extract_lxml(html, min_text_length)
+        except (etree.LxmlError, ValueError) as e:
+            logger.debug(f"lxml no pudo parsear el HTML, usando BeautifulSoup: {e}")
+    
+    if chunks is None:
+        chunks = _extract_bs4(html, min_text_length)
+    
     logger.debug(f"Extraídos {len(chunks)} fragmentos de texto")
-    return chunks 
\ No newline at end of file
+    return chunks
+
+def extract_document(html: str, min_text_length: int = 2) -> Tuple[Any, List[TextChunk]]:
+    """
+    Parsea el documento completo y extrae sus nodos de texto con referencias.
+    
+    A diferencia de extract_text_nodes, conserva el árbol entero (sin filtrar
+    <head> ni scripts) y guarda en cada TextChunk._node_ref el nodo de texto
+    de origen, de modo que inject_text_inplace puede modificarlo directamente
+    y serializar una sola vez, sin volver a parsear ni buscar por path.
+    
+    Args:
+        html: Contenido HTML como string
+        min_text_length: Longitud mínima de texto para extraer
+        
+    Returns:
+        Tuple[Any, List[TextChunk]]: Documento (raíz lxml o BeautifulSoup) y
+            fragmentos de texto
+        
+    Raises:
+        MalformedHTMLError: Si el HTML está malformado
+        EmptyHTMLError: Si el HTML está vacío
+        HTMLTooLargeError: Si el HTML es demasiado grande
+    """
+    _validate_html(html)
+    
+    if lxml_html is not None:
+        try:
+            root = lxml_html.document_fromstring(html)
+            if not _DOCTYPE_RE.match(html):
+                IMPLIED_DOCTYPE_ROOTS.add(root)
+            return root, _walk_lxml(root, min_text_length, keep_refs=True)
+        except (etree.LxmlError, ValueError) as e:
+            logger.debug(f"lxml no pudo parsear el HTML, usando BeautifulSoup: {e}")
+    
+    try:
+        soup = make_soup(html)
+    except ParserRejectedMarkup as e:
+        error_fragment = html[:100] + "..." if len(html) > 100 else html
+        raise MalformedHTMLError(f"No se pudo parsear el HTML: {str(e)}", error_fragment)
+    
+    return soup, _walk_bs4(soup, min_text_length, keep_refs=True)
@@ -2,21 +2,334 @@
 Inyector de texto en documentos HTML.
 """
 
-from bs4 import BeautifulSoup, Tag
-from typing import List, Dict, Optional, Set
+import html as html_lib
+import re
+from bisect import bisect_right
+from functools import lru_cache
+import soupsieve as sv
+from bs4 import BeautifulSoup, Tag, NavigableString
+from bs4.dammit import EntitySubstitution
+from bs4.element import PreformattedString
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
 from ..models import TextChunk
 from .errors import MalformedHTMLError, NodeNotFoundError, InvalidSelectorError
+from .parser import make_soup
+from .extractor import IMPLIED_DOCTYPE_ROOTS, _DOCTYPE_RE, build_path_index
 from ..utils.logging import get_logger
 
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml es opcional: solo se usan documentos BeautifulSoup
+    etree = None
+    lxml_html = None
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick es opcional: se buscan los paths uno a uno
+    ahocorasick = None
+
 logger = get_logger("injector")
 
-def _find_node_by_path(soup: BeautifulSoup, path: str) -> Optional[Tag]:
+# Paso de un path generado por el extractor: combinador y segmento
+# (tag, tag#id, tag.clase o tag:nth-of-type(n))
+_PATH_STEP_RE = re.compile(r'\s*(>)?\s*([^\s>]+)')
+_SEGMENT_RE = re.compile(r'^([^#.:\s]+)(?:#(.+)|\.(.+)|:nth-of-type\((\d+)\))?$')
+
+# Último segmento de un path que identifica el elemento por id (tag#id o #id)
+_ID_SEGMENT_RE = re.compile(r'(?:^|[\s>])([^\s>#.:]*)#([\w-]+)\s*$')
+
+# Marcado del HTML fuente (comentarios, declaraciones, tags); lo que queda
+# entre dos coincidencias es texto
+_MARKUP_RE = re.compile(
+    r'<!--.*?-->|<![^>]*>|<\?[^>]*>|</[a-zA-Z][^>]*>'
+    r'|<([a-zA-Z][^\s/>]*)(?:[^>"\']|"[^"]*"|\'[^\']*\')*>',
+    re.S
+)
+# Elementos cuyo contenido html.parser entrega sin interpretar
+_RAW_TEXT_END = {
+    "script": re.compile(r'</script', re.I),
+    "style": re.compile(r'</style', re.I),
+}
+
+# Tipo de un paso de path ya parseado: (solo hijos, (tag, id, clase, nth))
+_PathStep = Tuple[bool, Tuple[str, Optional[str], Optional[str], int]]
+
+@lru_cache(maxsize=1024)
+def _compiled_selector(path: str) -> "sv.SoupSieve":
+    """Selector de soupsieve compilado; los paths de plantilla se repiten mucho."""
+    return sv.compile(path)
+
+def _parse_html(html: str) -> Any:
+    """
+    Parsea el HTML con lxml nativo si está disponible, o con BeautifulSoup.
+    
+    lxml construye el mismo árbol que usa el extractor, así que los paths
+    coinciden, y evita construir el árbol de objetos Python de BeautifulSoup.
+    
+    Args:
+        html: HTML como string
+        
+    Returns:
+        Any: Raíz lxml o documento BeautifulSoup
+    """
+    if lxml_html is not None:
+        try:
+            root = lxml_html.document_fromstring(html)
+            if not _DOCTYPE_RE.match(html):
+                IMPLIED_DOCTYPE_ROOTS.add(root)
+            return root
+        except (etree.LxmlError, ValueError) as e:
+            logger.debug(f"lxml no pudo parsear el HTML, usando BeautifulSoup: {e}")
+    return make_soup(html)
+
+def _serialize(document: Any) -> str:
+    """
+    Serializa un documento parseado con _parse_html o extract_document.
+    
+    Args:
+        document: Raíz lxml o documento BeautifulSoup
+        
+    Returns:
+        str: HTML serializado
+    """
+    if isinstance(document, BeautifulSoup):
+        return str(document)
+    if document in IMPLIED_DOCTYPE_ROOTS:
+        # No añadir el DOCTYPE que libxml2 supone si el original no lo tenía
+        return lxml_html.tostring(
+            document.getroottree(), encoding="unicode", doctype=""
+        ).lstrip("\n")
+    return lxml_html.tostring(document.getroottree(), encoding="unicode")
+
+def _parse_segment(segment: str) -> Tuple[str, Optional[str], Optional[str], int]:
+    """
+    Descompone un segmento de path en (tag, id, clase, índice nth-of-type).
+    
+    Raises:
+        InvalidSelectorError: Si el segmento no tiene el formato del extractor
+    """
+    match = _SEGMENT_RE.match(segment)
+    if not match:
+        raise InvalidSelectorError(f"Segmento de path no soportado: '{segment}'", segment)
+    tag, elem_id, cls, index = match.groups()
+    return tag, elem_id, cls, int(index) if index else 0
+
+def _matches_segment(elem: Any, step: Tuple[str, Optional[str], Optional[str], int]) -> bool:
+    """Indica si un elemento lxml cumple un segmento (sin contar nth-of-type)."""
+    tag, elem_id, cls, _ = step
+    if elem.tag != tag:
+        return False
+    if elem_id is not None:
+        return elem.get("id") == elem_id
+    if cls is not None:
+        return cls in (elem.get("class") or "").split()
+    return True
+
+def _candidates(context: Any, child_only: bool, step: Tuple[str, Optional[str], Optional[str], int]) -> Iterator[Any]:
+    """Elementos que cumplen un paso del path a partir de su contexto."""
+    tag, _, _, index = step
+    if child_only:
+        elements = [child for child in context if child.tag == tag]
+    else:
+        elements = list(context.iter(tag))
+    if index:
+        if child_only:
+            if len(elements) >= index:
+                yield elements[index - 1]
+        else:
+            # nth-of-type se cuenta entre los hermanos de cada elemento
+            for elem in elements:
+                parent = elem.getparent()
+                if parent is not None and [c for c in parent if c.tag == tag].index(elem) == index - 1:
+                    yield elem
+        return
+    for elem in elements:
+        if _matches_segment(elem, step):
+            yield elem
+
+@lru_cache(maxsize=1024)
+def _parse_path(path: str) -> Tuple[_PathStep, ...]:
+    """
+    Descompone un path en pasos (combinador, segmento), con caché.
+    
+    Raises:
+        InvalidSelectorError: Si el path no tiene el formato esperado
+    """
+    steps: List[_PathStep] = []
+    pos = 0
+    for match in _PATH_STEP_RE.finditer(path):
+        if match.start() != pos:
+            break
+        steps.append((bool(match.group(1)), _parse_segment(match.group(2))))
+        pos = match.end()
+    if not steps or pos != len(path.rstrip()) or steps[0][0]:
+        raise InvalidSelectorError(f"Selector CSS inválido '{path}'", path)
+    return tuple(steps)
+
+def _find_node_lxml(root: Any, path: str) -> Optional[Any]:
+    """
+    Busca un elemento lxml por un path CSS generado por el extractor.
+    
+    Soporta los combinadores de hijo (">") y descendiente (" ") y los
+    segmentos tag, tag#id, tag.clase y tag:nth-of-type(n). Devuelve la
+    primera coincidencia en orden de documento, como soup.select().
+    
+    Args:
+        root: Raíz lxml
+        path: Path CSS
+        
+    Returns:
+        Optional[Any]: Elemento encontrado o None
+        
+    Raises:
+        InvalidSelectorError: Si el path no tiene el formato esperado
+    """
+    steps = _parse_path(path)
+    
+    def search(context: Any, i: int) -> Optional[Any]:
+        child_only, step = steps[i]
+        for elem in _candidates(context, child_only, step):
+            if i == len(steps) - 1:
+                return elem
+            found = search(elem, i + 1)
+            if found is not None:
+                return found
+        return None
+    
+    # El primer paso puede estar en cualquier punto del documento
+    return search(root.getroottree(), 0)
+
+def _set_text_lxml(elem: Any, text: str) -> None:
+    """
+    Sustituye el primer texto directo no vacío de un elemento lxml.
+    
+    Si el elemento no tiene texto directo, su contenido se reemplaza entero
+    por el texto, como node.string en BeautifulSoup.
+    """
+    if elem.text and elem.text.strip():
+        elem.text = _replace_keeping_whitespace(elem.text, text)
+        return
+    for child in elem:
+        if child.tail and child.tail.strip():
+            child.tail = _replace_keeping_whitespace(child.tail, text)
+            return
+    for child in list(elem):
+        elem.remove(child)
+    elem.text = text
+
+class _DocumentLookup:
+    """Cachés compartidas entre las búsquedas de paths sobre un mismo documento."""
+    __slots__ = ("name_paths", "_ids")
+    
+    def __init__(self):
+        self.name_paths: Dict[int, Tuple[str, ...]] = {}  # Ver _name_path
+        self._ids: Optional[Dict[str, Any]] = None  # id -> elemento (None si se repite)
+    
+    def by_id(self, document: Any, elem_id: str) -> Optional[Any]:
+        """
+        Devuelve el elemento con ese id si es único en el documento.
+        
+        El índice de ids se construye en un solo recorrido la primera vez.
+        
+        Args:
+            document: Raíz lxml o documento BeautifulSoup
+            elem_id: Valor del atributo id
+            
+        Returns:
+            Optional[Any]: Elemento, o None si no existe o el id está repetido
+        """
+        if self._ids is None:
+            if isinstance(document, BeautifulSoup):
+                elements = ((tag.get("id"), tag) for tag in document.find_all(id=True))
+            else:
+                elements = (
+                    (elem.get("id"), elem) for elem in document.iter()
+                    if isinstance(elem.tag, str) and elem.get("id")
+                )
+            ids: Dict[str, Any] = {}
+            for key, elem in elements:
+                ids[key] = None if key in ids else elem
+            self._ids = ids
+        return self._ids.get(elem_id)
+
+def _find_node_by_path(
+    document: Any,
+    path: str,
+    lookup: Optional[_DocumentLookup] = None
+) -> Optional[Any]:
+    """
+    Busca un nodo en el documento usando un path CSS.
+    
+    Si el path termina en un id único en el documento, el elemento se toma
+    directamente del índice de ids: cualquier coincidencia del path completo
+    sería ese mismo elemento.
+    
+    Args:
+        document: Raíz lxml o documento BeautifulSoup
+        path: Path CSS para buscar
+        lookup: Cachés compartidas entre búsquedas sobre el mismo documento
+        
+    Returns:
+        Optional[Any]: Nodo encontrado o None
+        
+    Raises:
+        InvalidSelectorError: Si el selector CSS es inválido
+    """
+    is_soup = isinstance(document, BeautifulSoup)
+    if lookup is not None:
+        match = _ID_SEGMENT_RE.search(path)
+        if match:
+            node = lookup.by_id(document, match.group(2))
+            tag = match.group(1)
+            if node is not None and (not tag or tag == (node.name if is_soup else node.tag)):
+                return node
+    
+    if is_soup:
+        return _find_node_bs4(document, path, lookup.name_paths if lookup else None)
+    return _find_node_lxml(document, path)
+
+def _name_path(tag: Tag, cache: Dict[int, Tuple[str, ...]]) -> Tuple[str, ...]:
+    """
+    Nombres de los tags desde la raíz del documento hasta el nodo.
+    
+    Cada ancestro se calcula una sola vez: el resultado de todos los nodos
+    recorridos queda en la caché, indexado por id().
+    
+    Args:
+        tag: Nodo BeautifulSoup
+        cache: Nombres ya calculados por id() del nodo
+        
+    Returns:
+        Tuple[str, ...]: Nombres de la raíz al nodo, ambos incluidos
+    """
+    pending = []
+    current = tag
+    names: Tuple[str, ...] = ()
+    while current is not None:
+        cached = cache.get(id(current))
+        if cached is not None:
+            names = cached
+            break
+        pending.append(current)
+        current = current.parent
+    
+    for current in reversed(pending):
+        names = names + (current.name,)
+        cache[id(current)] = names
+    return names
+
+def _find_node_bs4(
+    soup: BeautifulSoup,
+    path: str,
+    name_paths: Optional[Dict[int, Tuple[str, ...]]] = None
+) -> Optional[Tag]:
     """
     Busca un nodo en el HTML usando un path CSS.
     
     Args:
         soup: Objeto BeautifulSoup
         path: Path CSS para buscar
+        name_paths: Caché de _name_path compartida entre búsquedas
         
     Returns:
         Optional[Tag]: Nodo encontrado o None
@@ -26,9 +339,9 @@ def _find_node_by_path(soup: BeautifulSoup, path: str) -> Optional[Tag]:
     """
     try:
         # Intentar seleccionar directamente
-        nodes = soup.select(path)
-        if nodes:
-            return nodes[0]
+        node = _compiled_selector(path).select_one(soup)
+        if node is not None:
+            return node
             
         # Si no funciona, intentar una búsqueda más flexible
         parts = path.split(" > ")
@@ -37,29 +350,17 @@ def _find_node_by_path(soup: BeautifulSoup, path: str) -> Optional[Tag]:
             
         # Buscar por el último componente del path
         last_part = parts[-1]
-        candidates = soup.select(last_part)
+        candidates = _compiled_selector(last_part).select(soup)
         
         # Si hay múltiples candidatos, intentar refinar con partes anteriores del path
         if len(candidates) > 1 and len(parts) > 1:
+            if name_paths is None:
+                name_paths = {}
+            # Comparar los nombres de tag de los ancestros (sin id, clase ni índice)
+            expected = tuple(p.split("#")[0].split(".")[0].split(":")[0] for p in parts[:-1])
             for candidate in candidates:
-                # Reconstruir path desde el candidato y comparar
-                current = candidate
-                path_parts = [last_part]
-                
-                for _ in range(len(parts) - 1):
-                    if not current.parent:
-                        break
-                    current = current.parent
-                    # Simplificar para comparación (solo nombre de tag)
-                    path_parts.append(current.name)
-                
-                # Comparar paths simplificados
-                original_simple = [p.split("#")[0].split(".")[0].split(":")[0] for p in reversed(parts)]
-                candidate_simple = [p.split("#")[0].split(".")[0].split(":")[0] for p in path_parts]
-                
-                if len(original_simple) <= len(candidate_simple) and all(
-                    a == b for a, b in zip(original_simple, candidate_simple[:len(original_simple)])
-                ):
+                names = _name_path(candidate, name_paths)
+                if len(names) >= len(parts) and names[-len(parts):-1] == expected:
                     return candidate
                     
         # Si hay un solo candidato, devolverlo
@@ -70,6 +371,108 @@ def _find_node_by_path(soup: BeautifulSoup, path: str) -> Optional[Tag]:
     except Exception as e:
         raise InvalidSelectorError(f"Selector CSS inválido '{path}': {str(e)}", path)
 
+def _find_nodes_bs4(soup: BeautifulSoup, paths: List[str]) -> Dict[str, Tag]:
+    """
+    Resuelve varios paths con una sola consulta CSS sobre el documento.
+    
+    Los paths se unen con comas para recorrer el árbol una sola vez y cada
+    nodo devuelto se asigna a los paths que cumple; como en select_one, se
+    queda la primera coincidencia en orden de documento. Los paths que no
+    compilan se omiten para que los trate _find_node_bs4.
+    
+    Args:
+        soup: Objeto BeautifulSoup
+        paths: Paths CSS a resolver
+        
+    Returns:
+        Dict[str, Tag]: Nodo encontrado por path (solo los que coinciden)
+    """
+    valid: List[str] = []
+    for path in paths:
+        try:
+            _compiled_selector(path)
+            valid.append(path)
+        except Exception:
+            continue
+    if not valid:
+        return {}
+    
+    found: Dict[str, Tag] = {}
+    pending = valid
+    for node in _compiled_selector(",".join(valid)).select(soup):
+        matched = [path for path in pending if _compiled_selector(path).match(node)]
+        if matched:
+            for path in matched:
+                found[path] = node
+            pending = [path for path in pending if path not in found]
+            if not pending:
+                break
+    return found
+
+def _content_matcher(chunks: List[TextChunk]) -> Callable[[str], Optional[TextChunk]]:
+    """
+    Prepara la búsqueda aproximada de chunks por contenido.
+    
+    Un texto coincide con un chunk si está contenido en su path o si el path
+    está contenido en él; gana el primer chunk de la lista. Los paths se
+    preparan una sola vez: la igualdad se resuelve con un diccionario, el
+    texto dentro de un path con una búsqueda sobre todos los paths
+    concatenados y el path dentro del texto con un autómata Aho-Corasick
+    (si pyahocorasick está instalado).
+    
+    Args:
+        chunks: Chunks pendientes, en orden de prioridad
+        
+    Returns:
+        Callable[[str], Optional[TextChunk]]: Función que recibe un texto
+            ya sin espacios exteriores y devuelve su chunk, o None
+    """
+    exact: Dict[str, int] = {}
+    for i, chunk in enumerate(chunks):
+        exact.setdefault(chunk.path, i)
+    
+    # Los paths separados por "\0": la primera aparición de un texto está
+    # en el path de menor índice que lo contiene
+    joined = "\0".join(chunk.path for chunk in chunks)
+    starts: List[int] = []
+    offset = 0
+    for chunk in chunks:
+        starts.append(offset)
+        offset += len(chunk.path) + 1
+    
+    automaton = None
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for path, i in exact.items():
+            automaton.add_word(path, i)
+        automaton.make_automaton()
+    
+    def match(text: str) -> Optional[TextChunk]:
+        best = exact.get(text)
+        if best == 0:
+            return chunks[0]
+        
+        if "\0" not in text:
+            pos = joined.find(text)
+            if pos >= 0:
+                i = bisect_right(starts, pos) - 1
+                best = i if best is None else min(best, i)
+        
+        if automaton is not None:
+            for _, i in automaton.iter(text):
+                if best is None or i < best:
+                    best = i
+        else:
+            limit = len(chunks) if best is None else best
+            for i in range(limit):
+                if chunks[i].path in text:
+                    best = i
+                    break
+        
+        return chunks[best] if best is not None else None
+    
+    return match
+
 def _validate_chunks(chunks: List[TextChunk]) -> None:
     """
     Valida la lista de chunks.
@@ -93,6 +496,11 @@ def inject_text(html: str, chunks: List[TextChunk], strict: bool = False) -> str
     """
     Inyecta texto procesado de vuelta en el HTML.
     
+    Vuelve a parsear el HTML y localiza cada nodo por su path, primero en un
+    índice construido en un solo recorrido y, si falta, por selector. Cuando los
+    chunks provienen de extract_document en el mismo proceso, es preferible
+    inject_text_inplace, que evita el segundo parseo y las búsquedas.
+    
     Args:
         html: HTML original como string
         chunks: Lista de fragmentos de texto procesados
@@ -110,36 +518,68 @@ def inject_text(html: str, chunks: List[TextChunk], strict: bool = False) -> str
     
     # Parsear HTML
     try:
-        soup = BeautifulSoup(html, 'html.parser')
+        document = _parse_html(html)
     except Exception as e:
         raise MalformedHTMLError(f"Error al parsear HTML: {str(e)}")
+    is_soup = isinstance(document, BeautifulSoup)
+    
+    # Paths en paralelo a los chunks; si un path se repite, gana el último
+    # chunk, y done marca por posición los ya inyectados
+    paths = [chunk.path for chunk in chunks]
+    latest: Dict[str, int] = {path: i for i, path in enumerate(paths)}
+    done = bytearray(len(chunks))
     
-    # Crear un mapa de paths a chunks para acceso más rápido
-    chunk_map: Dict[str, TextChunk] = {chunk.path: chunk for chunk in chunks}
+    # BeautifulSoup: las sustituciones de nodos de texto se aplazan para
+    # aplicarlas sobre el fuente (ver _splice_text_edits); los cambios de
+    # estructura obligan a serializar el árbol
+    edits: Dict[int, Tuple[NavigableString, str]] = {}
+    structural = False
     
-    # Mapa para rastrear nodos ya procesados
-    processed_nodes: Set[str] = set()
+    # Un solo recorrido del árbol para localizar los paths exactos; el
+    # selector solo se usa para los que no aparecen en el índice
+    # En BeautifulSoup se recogen a la vez los nodos de texto para la
+    # búsqueda por contenido
+    text_nodes: Optional[List[NavigableString]] = [] if is_soup else None
+    path_index = build_path_index(document, text_nodes)
+    lookup = _DocumentLookup()
+    if is_soup:
+        # Los que faltan se resuelven juntos con un único selector unión
+        missing = [path for path in latest if path not in path_index]
+        if missing:
+            path_index.update(_find_nodes_bs4(document, missing))
     
     # Contador de errores
     errors = 0
     
     # Primero intentar inyección directa por path
-    for path, chunk in chunk_map.items():
+    for path, i in latest.items():
+        text = chunks[i].text
         try:
-            node = _find_node_by_path(soup, path)
-            if node:
+            node = path_index.get(path)
+            if node is None:
+                node = _find_node_by_path(document, path, lookup)
+            if node is not None and not is_soup:
+                _set_text_lxml(node, text)
+                done[i] = 1
+                logger.debug(f"Inyectado texto en nodo: {path}")
+            elif node:
                 # Verificar si el nodo tiene contenido de texto directo
                 for child in node.children:
                     if child.string and child.string.strip():
-                        child.replace_with(chunk.text)
-                        processed_nodes.add(path)
+                        if isinstance(child, NavigableString):
+                            edits[id(child)] = (child, text)
+                        else:
+                            child.replace_with(text)
+                            structural = True
+                        done[i] = 1
                         logger.debug(f"Inyectado texto en nodo: {path}")
                         break
                 
                 # Si no tenía texto directo, establecer el contenido completo
-                if path not in processed_nodes:
-                    node.string = chunk.text
-                    processed_nodes.add(path)
+                if not done[i]:
+                    node.string = text
+                    structural = True
+                    done[i] = 1
                     logger.debug(f"Establecido texto en nodo: {path}")
             elif strict:
                 raise NodeNotFoundError(f"No se encontró el nodo con path: {path}", path)
@@ -153,19 +593,167 @@ def inject_text(html: str, chunks: List[TextChunk], strict: bool = False) -> str
                 raise
     
     # Para los chunks no procesados, hacer una búsqueda por contenido
-    unprocessed = [chunk for chunk in chunks if chunk.path not in processed_nodes]
+    unprocessed = [chunks[i] for i, path in enumerate(paths) if not done[latest[path]]]
     if unprocessed:
         logger.debug(f"Intentando inyectar {len(unprocessed)} chunks no procesados")
-        for node in soup.find_all(text=True):
-            if node.strip():
-                for chunk in unprocessed:
+        match = _content_matcher(unprocessed)
+        if is_soup:
+            for node in text_nodes:
+                if node.parent is None or id(node) in edits:
+                    continue  # Sustituido ya en la inyección por path
+                stripped = node.strip()
+                if stripped:
                     # Buscar coincidencia aproximada
-                    if node.strip() in chunk.path or chunk.path in node.strip():
-                        node.replace_with(chunk.text)
+                    chunk = match(stripped)
+                    if chunk is not None:
+                        edits[id(node)] = (node, chunk.text)
+                        logger.debug(f"Inyectado texto por coincidencia aproximada: {chunk.path}")
+        else:
+            for elem in document.iter():
+                for owner, attr in ((elem, "text"), (elem, "tail")):
+                    value = getattr(owner, attr)
+                    if not (value and value.strip()) or (attr == "text" and not isinstance(elem.tag, str)):
+                        continue
+                    # Buscar coincidencia aproximada
+                    chunk = match(value.strip())
+                    if chunk is not None:
+                        setattr(owner, attr, chunk.text)
                         logger.debug(f"Inyectado texto por coincidencia aproximada: {chunk.path}")
-                        break
     
     if errors > 0:
         logger.warning(f"No se pudieron inyectar {errors} chunks")
     
-    return str(soup) 
\ No newline at end of file
+    if is_soup and edits:
+        if not structural:
+            spliced = _splice_text_edits(html, document, edits)
+            if spliced is not None:
+                return spliced
+            logger.debug("El árbol no coincide con el HTML fuente, se serializa el documento")
+        for node, text in edits.values():
+            if node.parent is not None:
+                node.replace_with(text)
+    
+    return _serialize(document)
+
+def _source_text_runs(html: str) -> List[Tuple[int, int, bool]]:
+    """
+    Localiza los tramos de texto del HTML fuente.
+    
+    Args:
+        html: HTML original
+        
+    Returns:
+        List[Tuple[int, int, bool]]: (inicio, fin, es_raw) de cada tramo, en
+            orden; es_raw indica contenido de script/style, sin entidades
+    """
+    runs: List[Tuple[int, int, bool]] = []
+    pos = 0
+    length = len(html)
+    while pos < length:
+        match = _MARKUP_RE.search(html, pos)
+        if match is None:
+            runs.append((pos, length, False))
+            break
+        if match.start() > pos:
+            runs.append((pos, match.start(), False))
+        pos = match.end()
+        name = match.group(1)
+        end_re = _RAW_TEXT_END.get(name.lower()) if name else None
+        if end_re is not None:
+            close = end_re.search(html, pos)
+            end = close.start() if close else length
+            if end > pos:
+                runs.append((pos, end, True))
+            pos = end
+    return runs
+
+def _splice_text_edits(
+    html: str,
+    soup: BeautifulSoup,
+    edits: Dict[int, Tuple[NavigableString, str]]
+) -> Optional[str]:
+    """
+    Aplica los textos nuevos directamente sobre el HTML fuente.
+    
+    Evita modificar el árbol y volver a serializarlo con str(soup), que en
+    documentos grandes cuesta más que todo lo demás, y conserva intacto el
+    marcado original. Los nodos de texto del árbol se emparejan en orden con
+    los tramos de texto del fuente; si algún par no coincide (HTML que el
+    parser ha reparado), se devuelve None para serializar el árbol.
+    
+    Args:
+        html: HTML original con el que se construyó soup
+        soup: Documento parseado, sin modificar
+        edits: Texto nuevo por id() del NavigableString que sustituye
+        
+    Returns:
+        Optional[str]: HTML con los textos sustituidos, o None si el árbol no
+            se corresponde con el fuente
+    """
+    runs = [
+        (start, end, raw) for start, end, raw in _source_text_runs(html)
+        if html[start:end].strip()
+    ]
+    strings = [
+        node for node in soup.descendants
+        if isinstance(node, NavigableString)
+        and not isinstance(node, PreformattedString)
+        and node.strip()
+    ]
+    if len(runs) != len(strings):
+        return None
+    
+    pieces: List[str] = []
+    pos = 0
+    for node, (start, end, raw) in zip(strings, runs):
+        source = html[start:end]
+        if (source if raw else html_lib.unescape(source)) != node:
+            return None
+        edit = edits.get(id(node))
+        if edit is not None:
+            pieces.append(html[pos:start])
+            pieces.append(EntitySubstitution.substitute_xml(edit[1]))
+            pos = end
+    pieces.append(html[pos:])
+    return "".join(pieces)
+
+def _replace_keeping_whitespace(original: str, text: str) -> str:
+    """Sustituye el contenido de un nodo de texto conservando sus espacios exteriores."""
+    stripped = original.strip()
+    if not stripped:
+        return text
+    start = original.index(stripped)
+    return original[:start] + text + original[start + len(stripped):]
+
+def inject_text_inplace(document: Any, chunks: List[TextChunk]) -> str:
+    """
+    Inyecta texto procesado modificando directamente el documento parseado.
+    
+    Args:
+        document: Documento devuelto por extract_document (raíz lxml o BeautifulSoup)
+        chunks: Fragmentos procesados que conservan su _node_ref
+        
+    Returns:
+        str: HTML serializado con el texto inyectado
+        
+    Raises:
+        ValueError: Si algún chunk no tiene referencia a su nodo
+    """
+    _validate_chunks(chunks)
+    
+    for i, chunk in enumerate(chunks):
+        ref = chunk._node_ref
+        if ref is None:
+            raise ValueError(f"El chunk {i} no tiene referencia a su nodo")
+        
+        if isinstance(ref, tuple):
+            # lxml: (elemento, "text" | "tail")
+            owner, attr = ref
+            setattr(owner, attr, _replace_keeping_whitespace(getattr(owner, attr) or "", chunk.text))
+        else:
+            # BeautifulSoup: NavigableString (se conserva la referencia al nodo nuevo)
+            new_node = NavigableString(_replace_keeping_whitespace(str(ref), chunk.text))
+            ref.replace_with(new_node)
+            chunk._node_ref = new_node
+    
+    return _serialize(document)
@@ -0,0 +1,30 @@
+"""
+Construcción de árboles BeautifulSoup con el parser más rápido disponible.
+"""
+
+from typing import Any, Union
+from bs4 import BeautifulSoup, FeatureNotFound
+
+# Parser preferido (lxml, en C) y fallback en Python puro
+PREFERRED_PARSER = "lxml"
+FALLBACK_PARSER = "html.parser"
+
+def make_soup(markup: Union[str, bytes], **kwargs: Any) -> BeautifulSoup:
+    """
+    Parsea HTML con lxml, revirtiendo a html.parser si lxml no está instalado.
+
+    Args:
+        markup: HTML como string o bytes
+        **kwargs: Argumentos adicionales para BeautifulSoup (parse_only, etc.)
+
+    Returns:
+        BeautifulSoup: Árbol parseado
+    """
+    # Con bytes se asume UTF-8 para evitar la detección de codificación
+    if isinstance(markup, bytes):
+        kwargs.setdefault("from_encoding", "utf-8")
+
+    try:
+        return BeautifulSoup(markup, PREFERRED_PARSER, **kwargs)
+    except FeatureNotFound:
+        return BeautifulSoup(markup, FALLBACK_PARSER, **kwargs)
@@ -4,7 +4,7 @@ Módulo principal para el procesamiento de HTML con LLMs.
 
 from .openai_client import OpenAIClient
 from .gemini_client import GeminiClient
-from .local_client import LocalClient
+from .local_client import LocalLLMClient
 from .errors import (
     LLMError,
     RateLimitError,
@@ -18,7 +18,7 @@ from .errors import (
 __all__ = [
     'OpenAIClient',
     'GeminiClient',
-    'LocalClient',
+    'LocalLLMClient',
     'LLMError',
     'RateLimitError',
     'AuthenticationError',
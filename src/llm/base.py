@@ -6,6 +6,8 @@ from typing import Protocol, List, Dict, Any, Optional
 
 class ChatMessage:
     """Mensaje para el chat con el LLM."""
+    __slots__ = ("role", "content")
+    
     def __init__(self, role: str, content: str):
         self.role = role
         self.content = content
@@ -32,6 +34,25 @@ class LLMClient(Protocol):
         """
         ...
         
+    async def achat(
+        self, 
+        messages: List[ChatMessage], 
+        use_cache: bool = True,
+        **params: Any
+    ) -> str:
+        """
+        Versión asíncrona de chat, para lanzar varias peticiones en paralelo.
+        
+        Args:
+            messages: Lista de mensajes para el chat
+            use_cache: Si se debe usar la caché
+            **params: Parámetros adicionales específicos del modelo
+            
+        Returns:
+            str: Respuesta del modelo
+        """
+        ...
+        
     def get_model_name(self) -> str:
         """
         Obtiene el nombre del modelo utilizado.
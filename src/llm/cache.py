@@ -2,22 +2,153 @@
 Sistema de caché para respuestas de LLM.
 """
 
+import atexit
 import hashlib
-import json
+import math
 import os
+import sqlite3
+import threading
 import time
-from typing import Dict, List, Optional, Any, Tuple
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Tuple, Union
 from pathlib import Path
 from .base import ChatMessage
+from ..utils.serialization import dumps
+
+try:
+    from blake3 import blake3 as _new_digest
+except ImportError:  # blake3 es opcional: SHA-256 de OpenSSL (hashlib)
+    _new_digest = hashlib.sha256
+
+try:
+    import zstandard
+    _DECOMPRESS_ERRORS: Tuple[type, ...] = (zlib.error, UnicodeDecodeError, zstandard.ZstdError)
+except ImportError:  # zstandard es opcional: se comprime con zlib
+    zstandard = None
+    _DECOMPRESS_ERRORS = (zlib.error, UnicodeDecodeError)
+
+try:
+    import faiss
+    import numpy as np
+except ImportError:  # faiss es opcional: se usa búsqueda lineal en Python
+    faiss = None
+    np = None
+
+# Valores por defecto (configurables con LLM_CACHE_DIR, LLM_CACHE_TTL y
+# LLM_CACHE_MAX_ENTRIES). El límite de entradas debe cubrir varios documentos
+# grandes: con menos, una segunda pasada sobre la misma página vuelve a pagar
+# los chunks expulsados
+DEFAULT_CACHE_DIR = ".llm_cache"
+DEFAULT_TTL = 86400  # 24 horas
+DEFAULT_MAX_ENTRIES = 100_000
+
+# Parámetros que afectan a la respuesta (se ignoran timeout, etc.)
+_RELEVANT_PARAMS = ("temperature", "max_tokens", "top_p", "top_k")
+
+# Segundos de espera si otro proceso tiene bloqueada la base de datos
+_BUSY_TIMEOUT = 30.0
+
+# Las respuestas más cortas se guardan sin comprimir
+_COMPRESS_MIN_BYTES = 128
+_ZSTD_LEVEL = 3
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def _compress_response(response: str) -> Union[str, bytes]:
+    """
+    Comprime una respuesta para guardarla en disco (zstd o, si no, zlib).
+    
+    Args:
+        response: Respuesta del modelo
+        
+    Returns:
+        Union[str, bytes]: Bytes comprimidos, o el texto original si es corto
+    """
+    data = response.encode("utf-8")
+    if len(data) < _COMPRESS_MIN_BYTES:
+        return response
+    if zstandard is not None:
+        return zstandard.compress(data, _ZSTD_LEVEL)
+    return zlib.compress(data)
+
+def _decompress_response(value: Union[str, bytes, None]) -> Optional[str]:
+    """
+    Recupera una respuesta guardada con _compress_response.
+    
+    Args:
+        value: Texto o bytes leídos del índice
+        
+    Returns:
+        Optional[str]: Respuesta, o None si no se puede descomprimir (p. ej.
+            datos zstd sin zstandard instalado)
+    """
+    if value is None or isinstance(value, str):
+        return value
+    try:
+        if value.startswith(_ZSTD_MAGIC):
+            if zstandard is None:
+                return None
+            return zstandard.decompress(value).decode("utf-8")
+        return zlib.decompress(value).decode("utf-8")
+    except _DECOMPRESS_ERRORS:
+        return None
+
+@lru_cache(maxsize=1024)
+def _hash_query(
+    messages: Tuple[Tuple[str, str], ...],
+    model: str,
+    params: Tuple[Any, ...]
+) -> str:
+    """
+    Calcula el hash de una consulta normalizada.
+    
+    Se usa BLAKE3 si está instalado (mucho más rápido con SIMD) y, si no,
+    el SHA-256 de hashlib. La clave no es criptográfica, pero cambia según
+    el algoritmo: una caché en disco creada con uno no se reutiliza con el
+    otro.
+    
+    Cada campo se añade al hash precedido de su longitud en bytes, sin
+    construir un JSON intermedio. get() y set() de la misma consulta (y
+    los reintentos) comparten el resultado gracias a lru_cache.
+    """
+    digest = _new_digest()
+    for field in (model, *(part for message in messages for part in message)):
+        data = field.encode("utf-8")
+        digest.update(b"%d:" % len(data))
+        digest.update(data)
+    # Valores de _RELEVANT_PARAMS en orden fijo: su repr basta como clave
+    digest.update(repr(params).encode("utf-8"))
+    return digest.hexdigest()
+
+def make_cache_key(messages: List[ChatMessage], model: str, params: Dict[str, Any]) -> str:
+    """
+    Genera una clave única para una consulta.
+    
+    Args:
+        messages: Lista de mensajes
+        model: Nombre del modelo
+        params: Parámetros adicionales
+        
+    Returns:
+        str: Clave hash para la consulta
+    """
+    return _hash_query(
+        tuple((msg.role, msg.content) for msg in messages),
+        model,
+        tuple(params.get(k) for k in _RELEVANT_PARAMS)
+    )
 
 class LLMCache:
     """Cache para respuestas de LLM."""
     
     def __init__(
         self,
-        cache_dir: str = ".llm_cache",
-        ttl: int = 86400,  # 24 horas por defecto
-        max_entries: int = 1000
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        ttl: int = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        memory_entries: int = 10_000,
+        flush_interval: float = 1.0
     ):
         """
         Inicializa el sistema de caché.
@@ -26,32 +157,82 @@ class LLMCache:
             cache_dir: Directorio para almacenar la caché
             ttl: Tiempo de vida de las entradas en segundos
             max_entries: Número máximo de entradas en caché
+            memory_entries: Número máximo de entradas en la capa en memoria (LRU)
+            flush_interval: Segundos que se acumulan las escrituras antes de
+                guardarlas en disco en una sola transacción
         """
         self.cache_dir = Path(cache_dir)
         self.ttl = ttl
         self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.flush_interval = flush_interval
+        # Capa LRU en memoria delante del disco: clave -> (timestamp, respuesta)
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # Los clientes síncronos se usan desde varios hilos (ThreadPoolExecutor)
+        self._memory_lock = threading.Lock()
         self.cache_dir.mkdir(exist_ok=True, parents=True)
-        self.metadata_file = self.cache_dir / "metadata.json"
-        self.metadata: Dict[str, Dict[str, Any]] = self._load_metadata()
+        self.index_file = self.cache_dir / "index.db"
+        # La conexión se comparte entre hilos; el lock serializa su uso
+        self._lock = threading.Lock()
+        self._db = self._open_index()
+        # Escrituras pendientes (clave -> fila), guardadas en segundo plano
+        self._pending: Dict[str, Tuple[str, float, str, str, str]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
         
-    def _load_metadata(self) -> Dict[str, Dict[str, Any]]:
-        """Carga los metadatos de la caché."""
-        if not self.metadata_file.exists():
-            return {}
+    @classmethod
+    def from_env(cls) -> "LLMCache":
+        """
+        Crea la caché con la configuración de las variables de entorno.
         
-        try:
-            with open(self.metadata_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return {}
+        LLM_CACHE_DIR permite compartir la caché entre procesos (workers de
+        gunicorn, ejecuciones sucesivas de la CLI) apuntando al mismo
+        directorio.
+        
+        Returns:
+            LLMCache: Caché configurada
+        """
+        return cls(
+            cache_dir=os.getenv("LLM_CACHE_DIR", DEFAULT_CACHE_DIR),
+            ttl=int(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL)),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        )
+    
+    def _open_index(self) -> sqlite3.Connection:
+        """
+        Abre (o crea) el índice SQLite con las entradas de la caché.
+        
+        Metadatos y respuesta van en la misma fila: cada inserción o borrado
+        toca solo esa fila y una lectura es una consulta por clave primaria,
+        sin abrir un fichero por entrada.
+        """
+        # timeout: otros procesos pueden estar escribiendo en el mismo índice
+        db = sqlite3.connect(
+            str(self.index_file),
+            timeout=_BUSY_TIMEOUT,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        # WAL permite lectores concurrentes desde otros procesos
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS entries("
+            "key TEXT PRIMARY KEY, ts REAL NOT NULL, model TEXT, params TEXT, response TEXT)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS entries_ts ON entries(ts)")
+        return db
     
-    def _save_metadata(self) -> None:
-        """Guarda los metadatos de la caché."""
+    def _read_entry(self, key: str) -> Optional[Tuple[float, Optional[str]]]:
+        """(timestamp, respuesta) de una entrada del índice, o None si no existe."""
         try:
-            with open(self.metadata_file, "w", encoding="utf-8") as f:
-                json.dump(self.metadata, f)
-        except IOError:
-            pass  # Silenciar errores de escritura
+            with self._lock:
+                return self._db.execute(
+                    "SELECT ts, response FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
     
     def _generate_key(self, messages: List[ChatMessage], model: str, params: Dict[str, Any]) -> str:
         """
@@ -65,23 +246,7 @@ class LLMCache:
         Returns:
             str: Clave hash para la consulta
         """
-        # Normalizar mensajes para generar clave consistente
-        msg_data = [{"role": msg.role, "content": msg.content} for msg in messages]
-        
-        # Filtrar parámetros relevantes (ignorar timeout, etc.)
-        relevant_params = {k: v for k, v in params.items() 
-                          if k in ["temperature", "max_tokens", "top_p", "top_k"]}
-        
-        # Crear diccionario para hash
-        hash_dict = {
-            "messages": msg_data,
-            "model": model,
-            "params": relevant_params
-        }
-        
-        # Generar hash
-        hash_str = hashlib.sha256(json.dumps(hash_dict, sort_keys=True).encode()).hexdigest()
-        return hash_str
+        return make_cache_key(messages, model, params)
     
     def get(
         self, 
@@ -102,29 +267,56 @@ class LLMCache:
         """
         key = self._generate_key(messages, model, params)
         
-        # Verificar si existe en metadata
-        if key not in self.metadata:
+        # Consultar primero la capa en memoria
+        response = self._recall(key)
+        if response is not None:
+            return response
+        
+        # Entradas escritas pero aún no guardadas en disco
+        with self._pending_lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            self._remember(key, pending[1], pending[4])
+            return pending[4]
+        
+        # Verificar si existe en el índice
+        entry = self._read_entry(key)
+        if entry is None:
             return None
+        timestamp, response = entry[0], _decompress_response(entry[1])
         
         # Verificar TTL
-        entry = self.metadata[key]
-        if time.time() - entry["timestamp"] > self.ttl:
+        if time.time() - timestamp > self.ttl:
             # Expirado, eliminar
             self._remove_entry(key)
             return None
         
-        # Leer contenido
-        cache_file = self.cache_dir / f"{key}.txt"
-        if not cache_file.exists():
+        if response is None:
             self._remove_entry(key)
             return None
         
-        try:
-            with open(cache_file, "r", encoding="utf-8") as f:
-                return f.read()
-        except IOError:
-            self._remove_entry(key)
-            return None
+        self._remember(key, timestamp, response)
+        return response
+    
+    def _recall(self, key: str) -> Optional[str]:
+        """Respuesta de la capa en memoria, si existe y no ha expirado."""
+        with self._memory_lock:
+            memory_entry = self._memory.get(key)
+            if memory_entry is None:
+                return None
+            if time.time() - memory_entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                return memory_entry[1]
+            del self._memory[key]
+        return None
+    
+    def _remember(self, key: str, timestamp: float, response: str) -> None:
+        """Guarda una respuesta en la capa en memoria, expulsando la menos usada."""
+        with self._memory_lock:
+            self._memory[key] = (timestamp, response)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
     
     def set(
         self, 
@@ -143,63 +335,203 @@ class LLMCache:
             response: Respuesta a cachear
         """
         key = self._generate_key(messages, model, params)
+        timestamp = time.time()
+        self._remember(key, timestamp, response)
+        
+        # La escritura en disco se agrupa con las siguientes y se hace en
+        # segundo plano, sin bloquear al llamante
+        relevant = {k: v for k, v in params.items() if k in _RELEVANT_PARAMS}
+        row = (key, timestamp, model, dumps(relevant).decode("utf-8"), response)
+        with self._pending_lock:
+            self._pending[key] = row
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def flush(self) -> None:
+        """Guarda en disco, en una sola transacción, las escrituras pendientes."""
+        with self._pending_lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            timer, self._flush_timer = self._flush_timer, None
+        if timer is not None:
+            timer.cancel()
+        if not pending:
+            return
+        
+        # Se comprime aquí, fuera del hilo que llamó a set()
+        rows = [row[:4] + (_compress_response(row[4]),) for row in pending]
         
-        # Guardar contenido
-        cache_file = self.cache_dir / f"{key}.txt"
         try:
-            with open(cache_file, "w", encoding="utf-8") as f:
-                f.write(response)
-        except IOError:
+            with self._lock:
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries(key, ts, model, params, response) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._db.execute("COMMIT")
+        except sqlite3.Error:
+            if self._db.in_transaction:
+                self._db.rollback()
             return  # Silenciar errores de escritura
         
-        # Actualizar metadata
-        self.metadata[key] = {
-            "timestamp": time.time(),
-            "model": model,
-            "params": {k: v for k, v in params.items() 
-                      if k in ["temperature", "max_tokens", "top_p", "top_k"]}
-        }
-        
         # Limpiar caché si es necesario
         self._cleanup()
-        
-        # Guardar metadata
-        self._save_metadata()
     
     def _remove_entry(self, key: str) -> None:
         """Elimina una entrada de la caché."""
-        if key in self.metadata:
-            del self.metadata[key]
-        
-        cache_file = self.cache_dir / f"{key}.txt"
-        if cache_file.exists():
-            try:
-                os.remove(cache_file)
-            except OSError:
-                pass
+        with self._memory_lock:
+            self._memory.pop(key, None)
+        with self._pending_lock:
+            self._pending.pop(key, None)
+        try:
+            with self._lock:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
     
     def _cleanup(self) -> None:
         """Limpia entradas antiguas si se excede el límite."""
-        if len(self.metadata) <= self.max_entries:
-            return
+        try:
+            with self._lock:
+                (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+                if count <= self.max_entries:
+                    return
+                
+                # Eliminar las entradas más antiguas (el índice sobre ts evita ordenar)
+                self._db.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY ts LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+        except sqlite3.Error:
+            pass
+    
+    def clear(self) -> None:
+        """Limpia toda la caché."""
+        with self._pending_lock:
+            self._pending.clear()
+        try:
+            with self._lock:
+                self._db.execute("DELETE FROM entries")
+        except sqlite3.Error:
+            pass
+        with self._memory_lock:
+            self._memory.clear()
+
+class SemanticCache:
+    """
+    Caché semántica: reutiliza la respuesta de una consulta anterior cuyo
+    embedding sea casi idéntico (similitud coseno >= threshold).
+    
+    Las entradas se agrupan por contexto (modelo, mensajes previos y
+    parámetros), de modo que solo se comparan textos con el mismo prompt.
+    """
+    
+    def __init__(self, threshold: float = 0.95, max_entries: int = 10_000):
+        """
+        Inicializa la caché semántica.
         
-        # Ordenar por timestamp (más antiguo primero)
-        sorted_entries = sorted(
-            self.metadata.items(),
-            key=lambda x: x[1]["timestamp"]
-        )
+        Args:
+            threshold: Similitud coseno mínima para considerar un acierto
+            max_entries: Número máximo de entradas por contexto
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # contexto -> (índice de vectores, respuestas en el mismo orden)
+        self._entries: Dict[str, Tuple[Any, List[str]]] = {}
+    
+    @staticmethod
+    def _normalize(vector: List[float]) -> List[float]:
+        """Normaliza un vector para que el producto interno sea el coseno."""
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+    
+    def lookup(self, context_key: str, vector: List[float]) -> Optional[str]:
+        """
+        Busca la respuesta más parecida dentro de un contexto.
         
-        # Eliminar entradas más antiguas
-        to_remove = len(self.metadata) - self.max_entries
-        for key, _ in sorted_entries[:to_remove]:
-            self._remove_entry(key)
+        Args:
+            context_key: Clave del contexto de la consulta
+            vector: Embedding del texto consultado
+            
+        Returns:
+            Optional[str]: Respuesta cacheada o None si no hay acierto
+        """
+        return self.lookup_many(context_key, [vector])[0]
+    
+    def lookup_many(
+        self,
+        context_key: str,
+        vectors: List[List[float]]
+    ) -> List[Optional[str]]:
+        """
+        Busca varias consultas del mismo contexto con una sola búsqueda.
+        
+        Args:
+            context_key: Clave del contexto de las consultas
+            vectors: Embeddings de los textos consultados
+            
+        Returns:
+            List[Optional[str]]: Respuesta cacheada o None para cada vector
+        """
+        entry = self._entries.get(context_key)
+        if entry is None or not entry[1] or not vectors:
+            return [None] * len(vectors)
+        
+        index, responses = entry
+        queries = [self._normalize(vector) for vector in vectors]
+        if faiss is not None:
+            scores, ids = index.search(np.asarray(queries, dtype="float32"), 1)
+            best = [(float(score[0]), int(i[0])) for score, i in zip(scores, ids)]
+        else:
+            best = [
+                max(
+                    (sum(a * b for a, b in zip(query, stored)), i)
+                    for i, stored in enumerate(index)
+                )
+                for query in queries
+            ]
+        
+        return [
+            responses[best_id] if best_id >= 0 and best_score >= self.threshold else None
+            for best_score, best_id in best
+        ]
+    
+    def add(self, context_key: str, vector: List[float], response: str) -> None:
+        """
+        Añade una respuesta a la caché, expulsando la más antigua si está llena.
+        
+        Args:
+            context_key: Clave del contexto de la consulta
+            vector: Embedding del texto consultado
+            response: Respuesta a cachear
+        """
+        normalized = self._normalize(vector)
+        entry = self._entries.get(context_key)
+        if entry is None:
+            index = faiss.IndexFlatIP(len(normalized)) if faiss is not None else []
+            entry = self._entries[context_key] = (index, [])
+        
+        index, responses = entry
+        if len(responses) >= self.max_entries:
+            responses.pop(0)
+            if faiss is not None:
+                index.remove_ids(np.asarray([0], dtype="int64"))
+            else:
+                index.pop(0)
+        
+        if faiss is not None:
+            index.add(np.asarray([normalized], dtype="float32"))
+        else:
+            index.append(normalized)
+        responses.append(response)
     
     def clear(self) -> None:
-        """Limpia toda la caché."""
-        for key in list(self.metadata.keys()):
-            self._remove_entry(key)
-        self.metadata = {}
-        self._save_metadata()
+        """Limpia toda la caché semántica."""
+        self._entries.clear()
 
 # Instancia global para uso en toda la aplicación
-global_cache = LLMCache() 
\ No newline at end of file
+global_cache = LLMCache.from_env()
\ No newline at end of file
@@ -2,13 +2,23 @@
 Módulo que define las excepciones personalizadas para el procesamiento LLM.
 """
 
+from typing import Optional
+
 class LLMError(Exception):
     """Excepción base para todos los errores relacionados con LLM."""
     pass
 
 class RateLimitError(LLMError):
     """Se lanza cuando se excede el límite de tasa de la API."""
-    pass
+    
+    def __init__(self, message: str = "", retry_after: Optional[float] = None):
+        """
+        Args:
+            message: Descripción del error
+            retry_after: Segundos a esperar indicados por el servidor, si los hay
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
 
 class AuthenticationError(LLMError):
     """Se lanza cuando hay un error de autenticación con la API."""
@@ -2,6 +2,7 @@
 Fábrica para crear instancias de clientes LLM.
 """
 
+from functools import lru_cache
 from typing import Literal, Optional
 from .base import LLMClient
 from .openai_client import OpenAIClient
@@ -36,4 +37,32 @@ def create_llm_client(
     elif provider == "local":
         return LocalLLMClient(model=model or "llama2", **kwargs)
     else:
-        raise ValueError(f"Proveedor LLM no válido: {provider}") 
\ No newline at end of file
+        raise ValueError(f"Proveedor LLM no válido: {provider}")
+
+@lru_cache(maxsize=16)
+def get_llm_client(
+    provider: LLMProvider,
+    model: Optional[str] = None,
+    **kwargs
+) -> LLMClient:
+    """
+    Devuelve un cliente LLM compartido, creándolo la primera vez.
+    
+    Reutilizar el cliente mantiene el tokenizer y el pool de conexiones
+    síncrono entre llamadas. Las conexiones asíncronas son de cada bucle de
+    eventos: se mantienen entre llamadas a process_html porque todas usan
+    el mismo bucle (ver pipeline._pipeline_loop). Los clientes devueltos se
+    comparten: no deben cerrarse.
+    
+    Args:
+        provider: Proveedor LLM a utilizar
+        model: Nombre del modelo (opcional)
+        **kwargs: Argumentos adicionales para el cliente (deben ser hashables)
+        
+    Returns:
+        LLMClient: Instancia del cliente LLM
+        
+    Raises:
+        ValueError: Si el proveedor no es válido
+    """
+    return create_llm_client(provider, model, **kwargs)
@@ -2,7 +2,10 @@
 Cliente LLM para Google Gemini.
 """
 
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import List, Any, Optional
 from google import genai
 from google.genai import types
@@ -16,6 +19,11 @@ from .errors import (
     ModelError
 )
 
+# Llamadas síncronas simultáneas desde achat: el SDK no tiene API asíncrona y
+# el ejecutor por defecto de asyncio (min(32, CPUs + 4) hilos) limitaría la
+# concurrencia del pipeline en máquinas con pocas CPUs
+MAX_WORKERS = 16
+
 class GeminiClient(LLMClient):
     """Cliente para interactuar con modelos de Google Gemini."""
     
@@ -61,6 +69,10 @@ class GeminiClient(LLMClient):
             model_name=self.model,
             generation_config=self.default_generation_config
         )
+        self._executor = ThreadPoolExecutor(
+            max_workers=MAX_WORKERS,
+            thread_name_prefix="gemini"
+        )
     
     def _create_generation_config(self, params: dict[str, Any]) -> types.GenerationConfig:
         """
@@ -137,4 +149,19 @@ class GeminiClient(LLMClient):
         except genai_exceptions.GenAIError as e:
             raise LLMError(f"Error de Gemini API: {e}")
         except Exception as e:
-            raise LLMError(f"Error inesperado: {e}") 
\ No newline at end of file
+            raise LLMError(f"Error inesperado: {e}")
+    
+    async def achat(self, messages: List[ChatMessage], **params: Any) -> str:
+        """
+        Versión asíncrona de chat; ejecuta la llamada síncrona en el pool de
+        hilos del cliente (la espera de red libera el GIL).
+        
+        Args:
+            messages: Lista de mensajes para el chat
+            **params: Parámetros adicionales (temperature, max_tokens, etc.)
+            
+        Returns:
+            str: Respuesta del modelo
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(self.chat, messages, **params))
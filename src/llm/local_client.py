@@ -2,8 +2,10 @@
 Cliente LLM para modelos locales vía HTTP.
 """
 
+import asyncio
 import json
-from typing import List, Any
+import weakref
+from typing import List, Any, Dict
 import httpx
 from .base import LLMClient, ChatMessage
 from .retry import retry_with_backoff, handle_http_errors
@@ -14,6 +16,53 @@ from .errors import (
     ModelError
 )
 
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:  # HTTP/2 requiere el extra httpx[http2]
+    _HTTP2 = False
+
+# Conexiones reutilizadas entre peticiones consecutivas al servidor local
+_POOL_LIMITS = httpx.Limits(
+    max_connections=64,
+    max_keepalive_connections=32,
+    keepalive_expiry=30.0
+)
+
+def _parse_response(response: httpx.Response) -> str:
+    """
+    Extrae el contenido de la respuesta del servidor o lanza el error adecuado.
+    
+    Args:
+        response: Respuesta HTTP de /api/chat
+        
+    Returns:
+        str: Respuesta del modelo
+        
+    Raises:
+        LLMError: Si el servidor devuelve un error o una respuesta mal formada
+        RateLimitError: Si se excede el límite de tasa
+        AuthenticationError: Si hay un error de autenticación
+        ModelError: Si hay un error con el modelo
+    """
+    if response.status_code != 200:
+        error_msg = response.text
+        if "rate limit" in error_msg.lower():
+            raise RateLimitError("Límite de tasa excedido")
+        elif "authentication" in error_msg.lower():
+            raise AuthenticationError("Error de autenticación")
+        elif "model" in error_msg.lower():
+            raise ModelError("Error del modelo")
+        else:
+            raise LLMError(f"Error del servidor: {error_msg}")
+    
+    try:
+        return response.json()["message"]["content"]
+    except json.JSONDecodeError as e:
+        raise LLMError(f"Error al decodificar respuesta: {e}")
+    except KeyError as e:
+        raise LLMError(f"Respuesta mal formada: {e}")
+
 class LocalLLMClient(LLMClient):
     """Cliente para interactuar con modelos LLM locales vía HTTP."""
     
@@ -39,8 +88,61 @@ class LocalLLMClient(LLMClient):
         self.timeout = timeout
         self.client = httpx.Client(
             base_url=self.base_url,
-            timeout=self.timeout
+            timeout=self.timeout,
+            limits=_POOL_LIMITS,
+            http2=_HTTP2
         )
+        # Un cliente asíncrono por bucle de eventos: sus conexiones quedan
+        # ligadas al bucle que las abre
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+    
+    def __enter__(self) -> "LocalLLMClient":
+        return self
+    
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Cierra las conexiones del cliente síncrono."""
+        self.client.close()
+    
+    async def aclose(self) -> None:
+        """Cierra el cliente síncrono y el asíncrono del bucle actual."""
+        self.close()
+        async_client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if async_client is not None:
+            await async_client.aclose()
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """
+        Devuelve el cliente asíncrono del bucle de eventos actual.
+        
+        Las conexiones quedan ligadas al bucle que las abre, así que cada
+        bucle tiene su propio cliente y una misma instancia puede usarse a
+        la vez desde bucles de varios hilos. process_html usa siempre el
+        mismo bucle; con bucles propios de corta vida hay que cerrar el
+        cliente de cada uno con aclose().
+        """
+        loop = asyncio.get_running_loop()
+        async_client = self._async_clients.get(loop)
+        if async_client is None:
+            async_client = self._async_clients[loop] = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=_POOL_LIMITS,
+                http2=_HTTP2
+            )
+        return async_client
+    
+    def _payload(self, messages: List[ChatMessage], params: Dict[str, Any]) -> Dict[str, Any]:
+        """Cuerpo de la petición en formato compatible con Ollama."""
+        return {
+            "model": self.model,
+            "messages": [{"role": msg.role, "content": msg.content} for msg in messages],
+            **params
+        }
     
     @retry_with_backoff(max_retries=3)
     @handle_http_errors
@@ -62,37 +164,33 @@ class LocalLLMClient(LLMClient):
             ModelError: Si hay un error con el modelo
         """
         try:
-            # Formato compatible con Ollama
-            formatted_messages = [
-                {"role": msg.role, "content": msg.content}
-                for msg in messages
-            ]
+            response = self.client.post("/api/chat", json=self._payload(messages, params))
+        except httpx.RequestError as e:
+            raise LLMError(f"Error de conexión: {e}")
+        return _parse_response(response)
+    
+    @retry_with_backoff(max_retries=3)
+    @handle_http_errors
+    async def achat(self, messages: List[ChatMessage], **params: Any) -> str:
+        """
+        Versión asíncrona de chat con httpx.AsyncClient, sin ocupar un hilo
+        por petición.
+        
+        Args:
+            messages: Lista de mensajes para el chat
+            **params: Parámetros adicionales (temperature, max_tokens, etc.)
             
-            response = self.client.post(
+        Returns:
+            str: Respuesta del modelo
+            
+        Raises:
+            LLMError: Si ocurre un error en la comunicación con la API
+        """
+        try:
+            response = await self._get_async_client().post(
                 "/api/chat",
-                json={
-                    "model": self.model,
-                    "messages": formatted_messages,
-                    **params
-                }
+                json=self._payload(messages, params)
             )
-            
-            if response.status_code != 200:
-                error_msg = response.text
-                if "rate limit" in error_msg.lower():
-                    raise RateLimitError("Límite de tasa excedido")
-                elif "authentication" in error_msg.lower():
-                    raise AuthenticationError("Error de autenticación")
-                elif "model" in error_msg.lower():
-                    raise ModelError("Error del modelo")
-                else:
-                    raise LLMError(f"Error del servidor: {error_msg}")
-                    
-            return response.json()["message"]["content"]
-            
         except httpx.RequestError as e:
             raise LLMError(f"Error de conexión: {e}")
-        except json.JSONDecodeError as e:
-            raise LLMError(f"Error al decodificar respuesta: {e}")
-        except KeyError as e:
-            raise LLMError(f"Respuesta mal formada: {e}") 
\ No newline at end of file
+        return _parse_response(response)
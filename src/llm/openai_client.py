@@ -2,19 +2,155 @@
 Cliente LLM para OpenAI.
 """
 
+import asyncio
+import atexit
+import hashlib
 import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import httpx
 import tiktoken
-from typing import List, Any, Dict, Optional
-from openai import OpenAI, OpenAIError
+from typing import AsyncIterator, Iterator, List, Any, Dict, Optional, Tuple
+from openai import AsyncOpenAI, OpenAI, OpenAIError
 from .base import LLMClient, ChatMessage
-from .retry import retry_with_backoff, handle_http_errors
-from .cache import global_cache
-from .errors import (
-    LLMError,
-    RateLimitError,
-    AuthenticationError,
-    ModelError
+from .retry import retry_with_backoff, handle_http_errors, translate_openai_error
+from .cache import global_cache, make_cache_key
+from .errors import LLMError
+
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:  # HTTP/2 requiere el extra httpx[http2]
+    _HTTP2 = False
+
+# Pool amplio para el fanout concurrente; los reintentos los gestiona retry_with_backoff
+_POOL_LIMITS = httpx.Limits(
+    max_connections=256,
+    max_keepalive_connections=64,
+    keepalive_expiry=30.0
 )
+_CONNECT_TIMEOUT = 10.0
+
+# Peticiones simultáneas por defecto en chat_many / achat_many
+DEFAULT_MANY_CONCURRENCY = 8
+
+# Por debajo de este número de textos, lanzar hilos para tokenizar cuesta más
+# de lo que ahorra
+_BATCH_TOKENIZE_MIN = 16
+
+# Cliente HTTP síncrono compartido por todas las instancias del proceso
+_shared_http_client: Optional[httpx.Client] = None
+_shared_http_client_lock = threading.Lock()
+
+def _get_shared_http_client(timeout: float) -> httpx.Client:
+    """
+    Devuelve el cliente HTTP síncrono del proceso, creándolo si no existe.
+    
+    Args:
+        timeout: Tiempo máximo de espera por defecto en segundos
+        
+    Returns:
+        httpx.Client: Cliente con el pool de conexiones compartido
+    """
+    global _shared_http_client
+    with _shared_http_client_lock:
+        if _shared_http_client is None or _shared_http_client.is_closed:
+            _shared_http_client = httpx.Client(
+                timeout=httpx.Timeout(timeout, connect=_CONNECT_TIMEOUT),
+                transport=httpx.HTTPTransport(
+                    limits=_POOL_LIMITS,
+                    http2=_HTTP2,
+                    retries=0
+                )
+            )
+        return _shared_http_client
+
+@atexit.register
+def _close_shared_http_client() -> None:
+    """Cierra el pool de conexiones compartido al terminar el proceso."""
+    with _shared_http_client_lock:
+        if _shared_http_client is not None:
+            _shared_http_client.close()
+
+def _make_async_http_client(timeout: float) -> httpx.AsyncClient:
+    """
+    Crea un cliente HTTP asíncrono con el pool de conexiones ajustado.
+    
+    Sus conexiones quedan ligadas al bucle de eventos en el que se usan, así
+    que cada instancia crea uno por bucle (ver OpenAIClient.async_client).
+    
+    Args:
+        timeout: Tiempo máximo de espera por defecto en segundos
+        
+    Returns:
+        httpx.AsyncClient: Cliente asíncrono
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=_CONNECT_TIMEOUT),
+        transport=httpx.AsyncHTTPTransport(
+            limits=_POOL_LIMITS,
+            http2=_HTTP2,
+            retries=0
+        )
+    )
+
+@lru_cache(maxsize=32)
+def _encoding_for_model(model: str) -> "tiktoken.Encoding":
+    """Tokenizer del modelo, compartido entre instancias del cliente."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Fallback para modelos no reconocidos
+        return tiktoken.get_encoding("cl100k_base")
+
+@lru_cache(maxsize=128)
+def _system_message_dict(content: str) -> Dict[str, str]:
+    """Dict del mensaje de sistema, compartido entre peticiones con el mismo prompt."""
+    return {"role": "system", "content": content}
+
+@lru_cache(maxsize=128)
+def _prompt_cache_key(content: str) -> str:
+    """Clave estable del prefijo de sistema para la caché de prompts de OpenAI."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+
+def _format_messages(messages: List[ChatMessage]) -> List[Dict[str, str]]:
+    """
+    Convierte los mensajes al formato de la API.
+    
+    Los mensajes de sistema se repiten en todos los chunks de un trabajo, así
+    que su dict se construye una sola vez.
+    
+    Args:
+        messages: Lista de mensajes
+        
+    Returns:
+        List[Dict[str, str]]: Mensajes en formato OpenAI
+    """
+    return [
+        _system_message_dict(msg.content) if msg.role == "system"
+        else {"role": msg.role, "content": msg.content}
+        for msg in messages
+    ]
+
+def _request_params(messages: List[ChatMessage], params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Añade prompt_cache_key a los parámetros cuando hay prompt de sistema.
+    
+    Así las peticiones con el mismo prefijo se enrutan juntas y reutilizan la
+    caché de prefijos del servidor.
+    
+    Args:
+        messages: Lista de mensajes
+        params: Parámetros de la petición
+        
+    Returns:
+        Dict[str, Any]: Parámetros para la API
+    """
+    if not messages or messages[0].role != "system" or "extra_body" in params:
+        return params
+    return {**params, "extra_body": {"prompt_cache_key": _prompt_cache_key(messages[0].content)}}
 
 class OpenAIClient(LLMClient):
     """Cliente para interactuar con modelos de OpenAI."""
@@ -44,15 +180,44 @@ class OpenAIClient(LLMClient):
         self.timeout = timeout
         self.client = OpenAI(
             api_key=self.api_key,
-            timeout=self.timeout
+            timeout=self.timeout,
+            http_client=_get_shared_http_client(self.timeout)
+        )
+        # Un cliente asíncrono por bucle de eventos (ver async_client)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+            weakref.WeakKeyDictionary()
         )
         
         # Inicializar tokenizer
-        try:
-            self.tokenizer = tiktoken.encoding_for_model(model)
-        except KeyError:
-            # Fallback para modelos no reconocidos
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.tokenizer = _encoding_for_model(model)
+    
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """
+        Cliente asíncrono del bucle de eventos actual.
+        
+        Las conexiones no pueden reutilizarse entre bucles, así que cada
+        bucle tiene su propio cliente; dentro de un bucle todas las
+        peticiones comparten el mismo pool. process_html usa siempre el
+        mismo bucle, así que sus conexiones se mantienen entre documentos;
+        quien ejecute aprocess_html en bucles propios de corta vida debe
+        cerrar el cliente de cada bucle con aclose().
+        """
+        loop = asyncio.get_running_loop()
+        async_client = self._async_clients.get(loop)
+        if async_client is None:
+            async_client = self._async_clients[loop] = AsyncOpenAI(
+                api_key=self.api_key,
+                timeout=self.timeout,
+                http_client=_make_async_http_client(self.timeout)
+            )
+        return async_client
+    
+    async def aclose(self) -> None:
+        """Cierra el cliente asíncrono del bucle actual (el síncrono es compartido)."""
+        async_client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if async_client is not None:
+            await async_client.close()
     
     def get_model_name(self) -> str:
         """
@@ -75,7 +240,41 @@ class OpenAIClient(LLMClient):
         """
         if not text:
             return 0
-        return len(self.tokenizer.encode(text))
+        # encode_ordinary: los tokens especiales escritos en el texto cuentan
+        # como texto normal en lugar de lanzar ValueError
+        return len(self.tokenizer.encode_ordinary(text))
+    
+    def get_token_counts(self, texts: List[str]) -> List[int]:
+        """
+        Estima el número de tokens de varios textos a la vez.
+        
+        Con muchos textos se usa encode_ordinary_batch, que tokeniza en
+        paralelo en varios hilos sin el GIL.
+        
+        Args:
+            texts: Textos a analizar
+            
+        Returns:
+            List[int]: Número estimado de tokens de cada texto
+        """
+        if len(texts) < _BATCH_TOKENIZE_MIN:
+            return [self.get_token_count(text) for text in texts]
+        return [
+            len(tokens) for tokens in
+            self.tokenizer.encode_ordinary_batch(texts, num_threads=os.cpu_count() or 1)
+        ]
+    
+    def _translate_error(self, e: OpenAIError) -> LLMError:
+        """
+        Convierte un error del SDK de OpenAI en el error LLM correspondiente.
+        
+        Args:
+            e: Error de OpenAI
+            
+        Returns:
+            LLMError: Error a lanzar
+        """
+        return translate_openai_error(e) or LLMError(f"Error de OpenAI: {e}")
     
     @retry_with_backoff(max_retries=3)
     @handle_http_errors
@@ -109,15 +308,12 @@ class OpenAIClient(LLMClient):
                 return cached_response
         
         try:
-            formatted_messages = [
-                {"role": msg.role, "content": msg.content}
-                for msg in messages
-            ]
+            formatted_messages = _format_messages(messages)
             
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=formatted_messages,
-                **params
+                **_request_params(messages, params)
             )
             
             result = response.choices[0].message.content
@@ -129,11 +325,251 @@ class OpenAIClient(LLMClient):
             return result
             
         except OpenAIError as e:
-            if "rate_limit" in str(e).lower():
-                raise RateLimitError(f"Límite de tasa excedido: {e}")
-            elif "authentication" in str(e).lower():
-                raise AuthenticationError(f"Error de autenticación: {e}")
-            elif "model" in str(e).lower():
-                raise ModelError(f"Error del modelo: {e}")
-            else:
-                raise LLMError(f"Error de OpenAI: {e}") 
\ No newline at end of file
+            raise self._translate_error(e)
+    
+    @retry_with_backoff(max_retries=3)
+    @handle_http_errors
+    async def achat(
+        self, 
+        messages: List[ChatMessage], 
+        use_cache: bool = True,
+        **params: Any
+    ) -> str:
+        """
+        Versión asíncrona de chat usando AsyncOpenAI.
+        
+        Args:
+            messages: Lista de mensajes para el chat
+            use_cache: Si se debe usar la caché
+            **params: Parámetros adicionales (temperature, max_tokens, etc.)
+            
+        Returns:
+            str: Respuesta del modelo
+            
+        Raises:
+            LLMError: Si ocurre un error en la comunicación con la API
+            RateLimitError: Si se excede el límite de tasa
+            AuthenticationError: Si hay un error de autenticación
+            ModelError: Si hay un error con el modelo
+        """
+        if use_cache:
+            cached_response = global_cache.get(messages, self.model, params)
+            if cached_response:
+                return cached_response
+        
+        try:
+            formatted_messages = _format_messages(messages)
+            
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=formatted_messages,
+                **_request_params(messages, params)
+            )
+            
+            result = response.choices[0].message.content
+            
+            if use_cache and result:
+                global_cache.set(messages, self.model, params, result)
+            
+            return result
+            
+        except OpenAIError as e:
+            raise self._translate_error(e)
+    
+    def chat_stream(
+        self,
+        messages: List[ChatMessage],
+        use_cache: bool = True,
+        **params: Any
+    ) -> Iterator[str]:
+        """
+        Envía mensajes al modelo y devuelve la respuesta a medida que llega.
+        
+        Pensado para salidas largas que se pueden consumir por partes; cuando
+        hace falta la respuesta completa (p. ej. el JSON de un lote), chat()
+        evita el coste de procesar cada evento. La respuesta completa se
+        guarda en la caché exacta al terminar; la caché semántica no se usa.
+        
+        Args:
+            messages: Lista de mensajes para el chat
+            use_cache: Si se debe usar la caché
+            **params: Parámetros adicionales (temperature, max_tokens, etc.)
+            
+        Yields:
+            str: Fragmentos de la respuesta, en orden
+            
+        Raises:
+            LLMError: Si ocurre un error en la comunicación con la API
+        """
+        if use_cache:
+            cached_response = global_cache.get(messages, self.model, params)
+            if cached_response:
+                yield cached_response
+                return
+        
+        parts: List[str] = []
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=_format_messages(messages),
+                stream=True,
+                **_request_params(messages, params)
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        except OpenAIError as e:
+            raise self._translate_error(e)
+        
+        if use_cache and parts:
+            global_cache.set(messages, self.model, params, "".join(parts))
+    
+    async def achat_stream(
+        self,
+        messages: List[ChatMessage],
+        use_cache: bool = True,
+        **params: Any
+    ) -> AsyncIterator[str]:
+        """
+        Versión asíncrona de chat_stream.
+        
+        Args:
+            messages: Lista de mensajes para el chat
+            use_cache: Si se debe usar la caché
+            **params: Parámetros adicionales (temperature, max_tokens, etc.)
+            
+        Yields:
+            str: Fragmentos de la respuesta, en orden
+            
+        Raises:
+            LLMError: Si ocurre un error en la comunicación con la API
+        """
+        if use_cache:
+            cached_response = global_cache.get(messages, self.model, params)
+            if cached_response:
+                yield cached_response
+                return
+        
+        parts: List[str] = []
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=_format_messages(messages),
+                stream=True,
+                **_request_params(messages, params)
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        except OpenAIError as e:
+            raise self._translate_error(e)
+        
+        if use_cache and parts:
+            global_cache.set(messages, self.model, params, "".join(parts))
+    
+    def _plan_many(
+        self,
+        conversations: List[List[ChatMessage]],
+        use_cache: bool,
+        params: Dict[str, Any]
+    ) -> Tuple[List[Optional[str]], Dict[str, List[int]]]:
+        """
+        Resuelve desde la caché lo posible y agrupa el resto por clave.
+        
+        Args:
+            conversations: Conversaciones en el orden del llamante
+            use_cache: Si se debe usar la caché
+            params: Parámetros de la petición
+            
+        Returns:
+            Tuple[List[Optional[str]], Dict[str, List[int]]]: Respuestas ya
+                conocidas (None si faltan) y posiciones de cada consulta
+                pendiente, indexadas por su clave de caché
+        """
+        results: List[Optional[str]] = [None] * len(conversations)
+        pending: Dict[str, List[int]] = {}
+        for i, messages in enumerate(conversations):
+            if use_cache:
+                cached_response = global_cache.get(messages, self.model, params)
+                if cached_response:
+                    results[i] = cached_response
+                    continue
+            # Las conversaciones idénticas se envían una sola vez
+            pending.setdefault(make_cache_key(messages, self.model, params), []).append(i)
+        return results, pending
+    
+    def chat_many(
+        self,
+        conversations: List[List[ChatMessage]],
+        use_cache: bool = True,
+        max_concurrency: int = DEFAULT_MANY_CONCURRENCY,
+        **params: Any
+    ) -> List[str]:
+        """
+        Envía varias conversaciones independientes y devuelve sus respuestas
+        en el mismo orden.
+        
+        Los aciertos de caché no generan peticiones, las conversaciones
+        repetidas se envían una vez y el resto se lanza en paralelo sobre el
+        pool de conexiones compartido.
+        
+        Args:
+            conversations: Lista de conversaciones (listas de mensajes)
+            use_cache: Si se debe usar la caché
+            max_concurrency: Peticiones simultáneas como máximo
+            **params: Parámetros adicionales (temperature, max_tokens, etc.)
+            
+        Returns:
+            List[str]: Respuesta de cada conversación
+            
+        Raises:
+            LLMError: Si alguna petición falla tras los reintentos
+        """
+        results, pending = self._plan_many(conversations, use_cache, params)
+        if pending:
+            indices = list(pending.values())
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(indices)))) as executor:
+                responses = executor.map(
+                    lambda positions: self.chat(conversations[positions[0]], use_cache=use_cache, **params),
+                    indices
+                )
+                for positions, response in zip(indices, responses):
+                    for i in positions:
+                        results[i] = response
+        return results
+    
+    async def achat_many(
+        self,
+        conversations: List[List[ChatMessage]],
+        use_cache: bool = True,
+        max_concurrency: int = DEFAULT_MANY_CONCURRENCY,
+        **params: Any
+    ) -> List[str]:
+        """
+        Versión asíncrona de chat_many.
+        
+        Args:
+            conversations: Lista de conversaciones (listas de mensajes)
+            use_cache: Si se debe usar la caché
+            max_concurrency: Peticiones simultáneas como máximo
+            **params: Parámetros adicionales (temperature, max_tokens, etc.)
+            
+        Returns:
+            List[str]: Respuesta de cada conversación
+            
+        Raises:
+            LLMError: Si alguna petición falla tras los reintentos
+        """
+        results, pending = self._plan_many(conversations, use_cache, params)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def run(positions: List[int]) -> None:
+            async with semaphore:
+                response = await self.achat(conversations[positions[0]], use_cache=use_cache, **params)
+            for i in positions:
+                results[i] = response
+        
+        await asyncio.gather(*(run(positions) for positions in pending.values()))
+        return results
@@ -0,0 +1,230 @@
+"""
+Limitador de tasa del lado del cliente para las APIs de LLM.
+
+Mantiene ventanas deslizantes de 60 segundos de peticiones (RPM) y tokens
+(TPM) por modelo, de modo que las peticiones esperan antes de enviarse en
+lugar de provocar errores 429 y reintentos. Es opcional: solo se limitan
+los modelos configurados en LLM_RATE_LIMITS o con set_rate_limits().
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Optional, Tuple
+from ..utils.logging import get_logger
+
+logger = get_logger("llm.rate_limiter")
+
+# Duración de la ventana deslizante (los límites de las APIs son por minuto)
+WINDOW_SECONDS = 60.0
+
+# Límites (RPM, TPM) del primer nivel de cada proveedor, por prefijo de
+# modelo. Solo se aplican si LLM_RATE_LIMITS los pide ("tier1").
+TIER1_RATE_LIMITS: Dict[str, Tuple[int, int]] = {
+    "gpt-4o-mini": (500, 200_000),
+    "gpt-4o": (500, 30_000),
+    "gpt-4.1-mini": (500, 200_000),
+    "gpt-4.1": (500, 30_000),
+    "gpt-4": (500, 10_000),
+    "gpt-3.5-turbo": (500, 200_000),
+    "gemini": (60, 32_000),
+}
+
+def _limits_from_env() -> Dict[str, Tuple[int, int]]:
+    """
+    Lee los límites de la variable de entorno LLM_RATE_LIMITS.
+    
+    El limitador es opcional: sin la variable no se limita ningún modelo.
+    El valor es una lista separada por comas de "prefijo=rpm:tpm" y, si se
+    incluye, "tier1" para partir de TIER1_RATE_LIMITS; por ejemplo
+    "tier1,gpt-4o=5000:800000". Los límites son por proceso: con varios
+    workers hay que repartir entre ellos la cuota de la cuenta.
+    
+    Returns:
+        Dict[str, Tuple[int, int]]: Límites (RPM, TPM) por prefijo de modelo
+    """
+    limits: Dict[str, Tuple[int, int]] = {}
+    for item in os.getenv("LLM_RATE_LIMITS", "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if item == "tier1":
+            limits.update(TIER1_RATE_LIMITS)
+            continue
+        try:
+            prefix, values = item.split("=", 1)
+            rpm, tpm = (int(value) for value in values.split(":", 1))
+        except ValueError:
+            logger.warning("Entrada no válida en LLM_RATE_LIMITS, se ignora: %s", item)
+            continue
+        limits[prefix.strip()] = (rpm, tpm)
+    return limits
+
+# Límites (RPM, TPM) por prefijo de modelo; se usa el prefijo más largo que
+# coincida. Se ajustan con LLM_RATE_LIMITS o con set_rate_limits()
+MODEL_RATE_LIMITS: Dict[str, Tuple[int, int]] = _limits_from_env()
+
+class CostAwareLimiter:
+    """
+    Limitador doble RPM + TPM con ventanas deslizantes de 60 segundos.
+
+    Cada petición consume una entrada en la ventana de peticiones y su coste
+    estimado en la ventana de tokens. acquire() espera a que caduquen las
+    entradas más antiguas cuando cualquiera de las dos ventanas está llena.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        """
+        Inicializa el limitador.
+
+        Args:
+            rpm: Peticiones permitidas por minuto
+            tpm: Tokens permitidos por minuto
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests: Deque[float] = deque()
+        self._tokens: Deque[Tuple[float, int]] = deque()
+        self._tokens_in_window = 0
+        self._blocked_until = 0.0
+        # Las ventanas se comparten entre bucles de eventos de distintos hilos;
+        # el lock solo protege la sección sin await
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        """Descarta las entradas que han salido de la ventana."""
+        horizon = now - WINDOW_SECONDS
+        while self._requests and self._requests[0] <= horizon:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= horizon:
+            self._tokens_in_window -= self._tokens.popleft()[1]
+
+    def _reserve(self, cost: int) -> float:
+        """
+        Reserva capacidad para una petición si cabe en ambas ventanas.
+
+        Args:
+            cost: Tokens estimados de la petición
+
+        Returns:
+            float: 0 si se ha reservado, o los segundos a esperar antes de
+                volver a intentarlo
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            self._expire(now)
+
+            sleep_for = 0.0
+            if len(self._requests) >= self.rpm:
+                sleep_for = self._requests[0] + WINDOW_SECONDS - now
+            # Una petición mayor que el TPM completo se deja pasar con la
+            # ventana vacía; de lo contrario esperaría indefinidamente
+            if self._tokens and self._tokens_in_window + cost > self.tpm:
+                # Esperar hasta que caduquen suficientes tokens
+                excess = self._tokens_in_window + cost - self.tpm
+                for ts, tokens in self._tokens:
+                    excess -= tokens
+                    if excess <= 0:
+                        sleep_for = max(sleep_for, ts + WINDOW_SECONDS - now)
+                        break
+                else:
+                    # Mayor que el TPM: esperar a que se vacíe la ventana
+                    sleep_for = max(sleep_for, self._tokens[-1][0] + WINDOW_SECONDS - now)
+            if sleep_for > 0:
+                return sleep_for
+
+            self._requests.append(now)
+            self._tokens.append((now, cost))
+            self._tokens_in_window += cost
+            return 0.0
+
+    async def acquire(self, tokens_estimate: int) -> None:
+        """
+        Espera hasta que la petición quepa en los límites y la registra.
+
+        Args:
+            tokens_estimate: Tokens estimados (entrada más salida máxima)
+        """
+        while True:
+            sleep_for = self._reserve(tokens_estimate)
+            if sleep_for <= 0:
+                return
+            logger.debug("Límite de tasa local alcanzado, esperando %.2fs", sleep_for)
+            await asyncio.sleep(sleep_for)
+
+    def penalize(self, retry_after: float) -> None:
+        """
+        Bloquea nuevas peticiones tras un 429 del servidor.
+
+        Args:
+            retry_after: Segundos indicados por la cabecera Retry-After
+        """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+_limiters: Dict[str, Optional[CostAwareLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+def _limits_for_model(model: str) -> Optional[Tuple[int, int]]:
+    """Límites (RPM, TPM) del prefijo más largo que coincide con el modelo."""
+    matches = [prefix for prefix in MODEL_RATE_LIMITS if model.startswith(prefix)]
+    if not matches:
+        return None
+    return MODEL_RATE_LIMITS[max(matches, key=len)]
+
+def get_rate_limiter(model: str) -> Optional[CostAwareLimiter]:
+    """
+    Obtiene el limitador compartido de un modelo.
+
+    Args:
+        model: Nombre del modelo
+
+    Returns:
+        Optional[CostAwareLimiter]: Limitador del modelo, o None si no tiene
+            límites configurados
+    """
+    with _limiters_lock:
+        if model not in _limiters:
+            limits = _limits_for_model(model)
+            _limiters[model] = CostAwareLimiter(*limits) if limits else None
+        return _limiters[model]
+
+def set_rate_limits(model: str, rpm: int, tpm: int) -> None:
+    """
+    Configura los límites de un modelo (o prefijo de modelo).
+
+    Args:
+        model: Nombre o prefijo del modelo
+        rpm: Peticiones permitidas por minuto
+        tpm: Tokens permitidos por minuto
+    """
+    with _limiters_lock:
+        MODEL_RATE_LIMITS[model] = (rpm, tpm)
+        # Los limitadores se recrean con los nuevos límites en el siguiente uso
+        _limiters.clear()
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Interpreta el valor de una cabecera Retry-After.
+
+    Args:
+        value: Segundos o fecha HTTP
+
+    Returns:
+        Optional[float]: Segundos a esperar, o None si no es válido
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
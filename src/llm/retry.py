@@ -2,18 +2,130 @@
 Módulo para manejar reintentos y errores comunes en clientes LLM.
 """
 
+import asyncio
+import inspect
+import random
 import time
 from functools import wraps
-from typing import Type, Callable, Any, Optional
+from typing import Type, Callable, Any, Optional, Tuple
 import httpx
+import openai
 from openai import OpenAIError
 from google.genai.types import exceptions as genai_exceptions
 from .errors import (
     LLMError,
     RateLimitError,
     AuthenticationError,
-    ModelError
+    ModelError,
+    RetryError
 )
+from .rate_limiter import parse_retry_after
+
+# Errores del SDK de OpenAI que no deben reintentarse: (clase, error propio, prefijo)
+_OPENAI_ERRORS: Tuple[Tuple[Type[Exception], Type[LLMError], str], ...] = (
+    (openai.RateLimitError, RateLimitError, "Límite de tasa excedido"),
+    (openai.AuthenticationError, AuthenticationError, "Error de autenticación"),
+    (openai.PermissionDeniedError, AuthenticationError, "Error de autenticación"),
+    (openai.NotFoundError, ModelError, "Error del modelo"),
+    (openai.BadRequestError, ModelError, "Error del modelo"),
+)
+
+_GENAI_ERRORS: Tuple[Tuple[Type[Exception], Type[LLMError], str], ...] = (
+    (genai_exceptions.RateLimitError, RateLimitError, "Límite de tasa excedido"),
+    (genai_exceptions.AuthenticationError, AuthenticationError, "Error de autenticación"),
+    (genai_exceptions.ModelError, ModelError, "Error del modelo"),
+)
+
+def retry_after_from_error(e: Exception) -> Optional[float]:
+    """
+    Extrae la cabecera Retry-After de la respuesta asociada a un error.
+    
+    Args:
+        e: Error del SDK o de httpx
+        
+    Returns:
+        Optional[float]: Segundos a esperar, o None si no se indicó
+    """
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    retry_after_ms = parse_retry_after(headers.get("retry-after-ms"))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    return parse_retry_after(headers.get("retry-after"))
+
+def backoff_delay(
+    attempt: int,
+    error: Optional[Exception] = None,
+    initial_delay: float = 1.0,
+    max_delay: float = 10.0,
+    backoff_factor: float = 2.0
+) -> float:
+    """
+    Calcula la espera antes de un reintento.
+    
+    Si el error es un RateLimitError con Retry-After se usa ese valor tal
+    cual; si no, backoff exponencial con jitter aleatorio (x0.5-1.5) para
+    que las tareas concurrentes que recibieron el mismo 429 no reintenten
+    todas a la vez.
+    
+    Args:
+        attempt: Número de intento fallido, empezando en 0
+        error: Error que provocó el reintento
+        initial_delay: Retraso inicial en segundos
+        max_delay: Retraso máximo en segundos (antes del jitter)
+        backoff_factor: Factor de multiplicación para el retraso
+        
+    Returns:
+        float: Segundos a esperar
+    """
+    if isinstance(error, RateLimitError) and error.retry_after is not None:
+        return error.retry_after
+    delay = min(max_delay, initial_delay * backoff_factor ** attempt)
+    return delay * random.uniform(0.5, 1.5)
+
+def translate_openai_error(e: OpenAIError) -> Optional[LLMError]:
+    """
+    Convierte un error del SDK de OpenAI en el error propio equivalente.
+    
+    Args:
+        e: Error de OpenAI
+        
+    Returns:
+        Optional[LLMError]: Error a lanzar, o None si el error es transitorio
+            (conexión, timeout, error del servidor)
+    """
+    for sdk_error, error, prefix in _OPENAI_ERRORS:
+        if isinstance(e, sdk_error):
+            if error is RateLimitError:
+                return RateLimitError(f"{prefix}: {e}", retry_after_from_error(e))
+            return error(f"{prefix}: {e}")
+    return None
+
+def _raise_if_not_retryable(e: Exception) -> None:
+    """
+    Convierte excepciones específicas de los SDKs en errores propios.
+    
+    Args:
+        e: Excepción capturada durante un intento
+        
+    Raises:
+        RateLimitError, AuthenticationError, ModelError, LLMError: Si la
+            excepción no debe reintentarse
+    """
+    if isinstance(e, (AuthenticationError, ModelError)):
+        # Ya traducido por el cliente: reintentar no cambiaría el resultado
+        raise e
+    if isinstance(e, OpenAIError):
+        error = translate_openai_error(e)
+        if error is not None:
+            raise error from e
+    elif isinstance(e, genai_exceptions.GenAIError):
+        for sdk_error, error_class, prefix in _GENAI_ERRORS:
+            if isinstance(e, sdk_error):
+                raise error_class(f"{prefix}: {e}") from e
+        raise LLMError(f"Error de Gemini API: {e}") from e
 
 def retry_with_backoff(
     max_retries: int = 3,
@@ -25,6 +137,16 @@ def retry_with_backoff(
     """
     Decorador para reintentar operaciones con backoff exponencial.
     
+    La espera de cada reintento la calcula backoff_delay (jitter y
+    Retry-After). Si se agotan los reintentos por límites de tasa se relanza
+    el último RateLimitError para que el llamante pueda reaccionar; con
+    otros errores transitorios se lanza RetryError.
+    
+    Un llamante con su propio bucle de reintentos (el pipeline, que además
+    coordina el limitador de tasa) puede pasar max_retries=0 en la llamada
+    para que solo haya un nivel de reintentos; el argumento no llega a la
+    función decorada.
+    
     Args:
         max_retries: Número máximo de reintentos
         initial_delay: Retraso inicial en segundos
@@ -36,43 +158,52 @@ def retry_with_backoff(
         Callable: Función decorada
     """
     def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                last_exception: Optional[Exception] = None
+                retries = kwargs.pop("max_retries", max_retries)
+                
+                for attempt in range(retries + 1):
+                    try:
+                        return await func(*args, **kwargs)
+                    except exceptions as e:
+                        last_exception = e
+                        _raise_if_not_retryable(e)
+                        if attempt == retries:
+                            break
+                        
+                        # Esperar sin bloquear el event loop
+                        await asyncio.sleep(backoff_delay(
+                            attempt, e, initial_delay, max_delay, backoff_factor
+                        ))
+                
+                if isinstance(last_exception, RateLimitError):
+                    raise last_exception
+                raise RetryError(f"Todos los reintentos fallaron: {last_exception}") from last_exception
+                
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
-            delay = initial_delay
             last_exception: Optional[Exception] = None
+            retries = kwargs.pop("max_retries", max_retries)
             
-            for attempt in range(max_retries + 1):
+            for attempt in range(retries + 1):
                 try:
                     return func(*args, **kwargs)
                 except exceptions as e:
                     last_exception = e
-                    if attempt == max_retries:
+                    _raise_if_not_retryable(e)
+                    if attempt == retries:
                         break
-                        
-                    # Convertir excepciones específicas
-                    if isinstance(e, OpenAIError):
-                        if "rate_limit" in str(e).lower():
-                            raise RateLimitError(f"Límite de tasa excedido: {e}")
-                        elif "authentication" in str(e).lower():
-                            raise AuthenticationError(f"Error de autenticación: {e}")
-                        elif "model" in str(e).lower():
-                            raise ModelError(f"Error del modelo: {e}")
-                    elif isinstance(e, genai_exceptions.GenAIError):
-                        if isinstance(e, genai_exceptions.RateLimitError):
-                            raise RateLimitError(f"Límite de tasa excedido: {e}")
-                        elif isinstance(e, genai_exceptions.AuthenticationError):
-                            raise AuthenticationError(f"Error de autenticación: {e}")
-                        elif isinstance(e, genai_exceptions.ModelError):
-                            raise ModelError(f"Error del modelo: {e}")
-                        else:
-                            raise LLMError(f"Error de Gemini API: {e}")
                     
-                    # Esperar con backoff exponencial
-                    time.sleep(min(delay, max_delay))
-                    delay *= backoff_factor
+                    time.sleep(backoff_delay(attempt, e, initial_delay, max_delay, backoff_factor))
             
             # Si llegamos aquí, todos los reintentos fallaron
-            raise LLMError(f"Todos los reintentos fallaron: {last_exception}")
+            if isinstance(last_exception, RateLimitError):
+                raise last_exception
+            raise RetryError(f"Todos los reintentos fallaron: {last_exception}") from last_exception
             
         return wrapper
     return decorator
@@ -87,20 +218,45 @@ def handle_http_errors(func: Callable) -> Callable:
     Returns:
         Callable: Función decorada
     """
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            try:
+                return await func(*args, **kwargs)
+            except (httpx.HTTPStatusError, httpx.RequestError) as e:
+                _raise_http_error(e)
+                
+        return async_wrapper
+    
     @wraps(func)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
         try:
             return func(*args, **kwargs)
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 429:
-                raise RateLimitError("Límite de tasa excedido")
-            elif e.response.status_code == 401:
-                raise AuthenticationError("Error de autenticación")
-            elif e.response.status_code == 404:
-                raise ModelError("Modelo no encontrado")
-            else:
-                raise LLMError(f"Error HTTP {e.response.status_code}: {e}")
-        except httpx.RequestError as e:
-            raise LLMError(f"Error de conexión: {e}")
+        except (httpx.HTTPStatusError, httpx.RequestError) as e:
+            _raise_http_error(e)
             
-    return wrapper 
\ No newline at end of file
+    return wrapper
+
+def _raise_http_error(e: httpx.HTTPError) -> None:
+    """
+    Convierte un error de httpx en el error LLM correspondiente.
+    
+    Args:
+        e: Error HTTP o de conexión
+        
+    Raises:
+        RateLimitError, AuthenticationError, ModelError, LLMError
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        if e.response.status_code == 429:
+            raise RateLimitError(
+                "Límite de tasa excedido",
+                parse_retry_after(e.response.headers.get("retry-after"))
+            )
+        elif e.response.status_code == 401:
+            raise AuthenticationError("Error de autenticación")
+        elif e.response.status_code == 404:
+            raise ModelError("Modelo no encontrado")
+        else:
+            raise LLMError(f"Error HTTP {e.response.status_code}: {e}")
+    raise LLMError(f"Error de conexión: {e}")
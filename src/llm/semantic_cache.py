@@ -0,0 +1,126 @@
+"""
+Caché semántica de respuestas a nivel de pipeline.
+
+Los textos se vectorizan localmente con SentenceTransformers (sin llamadas
+a la API) y se reutiliza la respuesta de un chunk anterior casi idéntico:
+menús, pies de página o avisos legales repetidos entre documentos.
+"""
+
+import threading
+from typing import List, Optional
+from .cache import SemanticCache
+from .errors import ConfigurationError
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # sentence-transformers es opcional: sin caché semántica local
+    SentenceTransformer = None
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+
+class ChunkSemanticCache:
+    """
+    Caché semántica de chunks con embeddings locales.
+
+    Guarda las respuestas en un SemanticCache agrupadas por contexto (tarea,
+    idioma, modelo, etc.), de modo que solo se reutilizan respuestas
+    generadas con el mismo prompt.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = 10_000
+    ):
+        """
+        Inicializa la caché.
+
+        Args:
+            model_name: Modelo de SentenceTransformers para los embeddings
+            threshold: Similitud coseno mínima para considerar un acierto
+            max_entries: Número máximo de entradas por contexto
+
+        Raises:
+            ConfigurationError: Si sentence-transformers no está instalado
+        """
+        if SentenceTransformer is None:
+            raise ConfigurationError(
+                "La caché semántica requiere sentence-transformers "
+                "(pip install llm-html-processor[semantic-cache])"
+            )
+        self.model_name = model_name
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._store = SemanticCache(threshold=threshold, max_entries=max_entries)
+        # SemanticCache no es seguro entre hilos
+        self._store_lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Calcula los embeddings normalizados de varios textos en una sola llamada.
+
+        Args:
+            texts: Textos a vectorizar
+
+        Returns:
+            List[List[float]]: Un embedding por texto
+        """
+        if not texts:
+            return []
+        with self._model_lock:
+            # El modelo se carga al primer uso: tarda varios segundos
+            if self._model is None:
+                self._model = SentenceTransformer(self.model_name)
+            return self._model.encode(texts, normalize_embeddings=True).tolist()
+
+    def lookup_many(self, context_key: str, vectors: List[List[float]]) -> List[Optional[str]]:
+        """
+        Busca las respuestas cacheadas de varios embeddings de un contexto.
+
+        Args:
+            context_key: Clave del contexto de las consultas
+            vectors: Embeddings de los textos
+
+        Returns:
+            List[Optional[str]]: Respuesta cacheada o None para cada vector
+        """
+        with self._store_lock:
+            return self._store.lookup_many(context_key, vectors)
+
+    def add(self, context_key: str, vector: List[float], response: str) -> None:
+        """
+        Guarda una respuesta en la caché.
+
+        Args:
+            context_key: Clave del contexto de la consulta
+            vector: Embedding del texto consultado
+            response: Respuesta a cachear
+        """
+        with self._store_lock:
+            self._store.add(context_key, vector, response)
+
+    def clear(self) -> None:
+        """Limpia todas las respuestas cacheadas."""
+        with self._store_lock:
+            self._store.clear()
+
+_chunk_cache: Optional[ChunkSemanticCache] = None
+_chunk_cache_lock = threading.Lock()
+
+def get_chunk_semantic_cache() -> ChunkSemanticCache:
+    """
+    Obtiene la caché semántica compartida por todo el proceso.
+
+    Returns:
+        ChunkSemanticCache: Instancia global
+
+    Raises:
+        ConfigurationError: Si sentence-transformers no está instalado
+    """
+    global _chunk_cache
+    with _chunk_cache_lock:
+        if _chunk_cache is None:
+            _chunk_cache = ChunkSemanticCache()
+        return _chunk_cache
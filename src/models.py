@@ -5,7 +5,7 @@ Modelos de datos para el procesador de HTML.
 from dataclasses import dataclass, field
 from typing import Literal, Optional, Dict, Any
 
-@dataclass
+@dataclass(slots=True)
 class ProcessingOptions:
     """Opciones para el procesamiento de HTML."""
     task: Literal["paraphrase", "summarize", "custom"]
@@ -16,22 +16,27 @@ class ProcessingOptions:
     preserve_html: bool = True
     extra_prompt: Optional[str] = None
     use_cache: bool = True
+    semantic_cache: bool = False  # Reutilizar respuestas de textos casi idénticos (requiere sentence-transformers)
     min_text_length: int = 2  # Longitud mínima de texto para procesar
+    batch_size: int = 16  # Chunks por petición al LLM (1 = una petición por chunk; solo con proveedores con modo JSON)
+    stream: bool = False  # Recibir las respuestas en streaming (solo proveedores que lo soportan)
 
-@dataclass
+@dataclass(slots=True)
 class TextChunk:
     """Fragmento de texto extraído del HTML."""
     text: str
     path: str  # Selector CSS-like para localizar el nodo
     is_rtl: bool = False
+    # Nodo de origen en el árbol parseado (solo en memoria, ver extract_document)
+    _node_ref: Any = field(default=None, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class ProcessingResult:
     """Resultado del procesamiento de HTML."""
     html: str
     stats: Dict[str, Any] = field(default_factory=dict)  # Estadísticas de procesamiento (tokens, costes, etc.)
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CostEstimate:
     """Estimación de costos para el procesamiento."""
     input_tokens: int = 0
@@ -2,177 +2,866 @@
 Pipeline de procesamiento de HTML con LLMs.
 """
 
+import asyncio
+import atexit
+import logging
+import os
+import threading
 import time
-import traceback
+from collections import defaultdict
+from contextlib import aclosing
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Tuple
 from .models import ProcessingOptions, ProcessingResult, TextChunk
-from .core.extractor import extract_text_nodes
-from .core.injector import inject_text
+from .core.extractor import extract_document
+from .core.injector import inject_text_inplace
 from .core.errors import HTMLProcessingError, MalformedHTMLError, EmptyHTMLError
-from .llm.factory import create_llm_client, LLMProvider
+from .llm.factory import get_llm_client, LLMProvider
 from .llm.base import ChatMessage
-from .llm.errors import LLMError, RateLimitError, AuthenticationError
+from .llm.openai_client import OpenAIClient
+from .llm.local_client import LocalLLMClient
+from .llm.errors import LLMError, RateLimitError, AuthenticationError, ConfigurationError, RetryError
+from .llm.cache import global_cache
+from .llm.rate_limiter import get_rate_limiter
+from .llm.retry import backoff_delay
+from .llm.semantic_cache import get_chunk_semantic_cache
 from .utils.logging import get_logger
+from .utils.serialization import dumps, loads
 
 logger = get_logger("pipeline")
 
 # Límites y constantes
 MAX_RETRY_ATTEMPTS = 3
-CHUNK_BATCH_SIZE = 10  # Procesar chunks en lotes para evitar problemas de memoria
+MAX_CONCURRENT_REQUESTS = 8  # Peticiones simultáneas al LLM (respetar límites de tasa)
+STREAM_IDLE_TIMEOUT = 30.0  # Segundos sin recibir tokens antes de abandonar una respuesta en streaming
+BATCH_ITEM_OVERHEAD_TOKENS = 10  # Tokens de la envoltura JSON de cada elemento en una respuesta por lotes
+
+# Bucle de eventos persistente en el que process_html ejecuta aprocess_html.
+# Los clientes asíncronos y sus conexiones quedan ligados al bucle que los
+# crea: con un bucle nuevo por documento (asyncio.run) cada llamada abriría
+# conexiones nuevas y dejaría las anteriores sin cerrar
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
 
 class PipelineError(Exception):
     """Excepción base para errores en el pipeline."""
     pass
 
-def _create_prompt_for_task(
-    chunk: TextChunk, 
-    options: ProcessingOptions
-) -> List[ChatMessage]:
+@lru_cache(maxsize=64)
+def _system_prompt(task: str, language: str) -> str:
     """
-    Crea un prompt para el LLM según la tarea.
+    Prompt de sistema para una tarea e idioma.
     
-    Args:
-        chunk: Fragmento de texto a procesar
-        options: Opciones de procesamiento
-        
-    Returns:
-        List[ChatMessage]: Lista de mensajes para el LLM
+    Se memoiza para que todos los chunks de un trabajo compartan el mismo
+    string (y el cliente LLM pueda reutilizar el mensaje ya formateado).
+    No depende de la dirección del texto: un prefijo idéntico en todas las
+    peticiones aprovecha la caché de prompts del proveedor.
     """
-    messages = []
-    
     # Instrucciones base según la tarea
-    if options.task == "paraphrase":
+    if task == "paraphrase":
         system_prompt = (
-            f"Eres un asistente experto en reescritura de texto en {options.language}. "
+            f"Eres un asistente experto en reescritura de texto en {language}. "
             f"Reescribe el texto manteniendo su significado original pero con palabras diferentes. "
             f"Mantén el mismo tono y nivel de formalidad. "
             f"Si el texto contiene HTML o código, presérvalo exactamente."
         )
-        user_prompt = f"Reescribe este texto: {chunk.text}"
     
-    elif options.task == "summarize":
+    elif task == "summarize":
         system_prompt = (
-            f"Eres un asistente experto en resumir texto en {options.language}. "
+            f"Eres un asistente experto en resumir texto en {language}. "
             f"Resume el texto manteniendo los puntos clave y el significado esencial. "
             f"Si el texto contiene HTML o código, presérvalo en la medida de lo posible."
         )
-        user_prompt = f"Resume este texto: {chunk.text}"
     
-    elif options.task == "custom":
+    elif task == "custom":
         system_prompt = (
-            f"Eres un asistente experto en procesamiento de texto en {options.language}. "
+            f"Eres un asistente experto en procesamiento de texto en {language}. "
             f"Sigue las instrucciones exactamente."
         )
-        user_prompt = f"{options.extra_prompt or 'Procesa este texto:'} {chunk.text}"
     
     else:
-        raise ValueError(f"Tarea no soportada: {options.task}")
+        raise ValueError(f"Tarea no soportada: {task}")
+    
+    return system_prompt
+
+# Instrucción RTL, en un mensaje aparte tras el prompt de sistema común
+_RTL_HINT = ChatMessage(
+    "system",
+    "El texto está en un idioma de derecha a izquierda (RTL), asegúrate de preservar esta característica."
+)
+
+# Prefijo del mensaje de usuario por tarea ("custom" usa options.extra_prompt)
+_USER_PREFIXES = {
+    "paraphrase": "Reescribe este texto: ",
+    "summarize": "Resume este texto: ",
+}
+
+_BATCH_INSTRUCTIONS = {
+    "paraphrase": "Reescribe el texto de cada elemento.",
+    "summarize": "Resume el texto de cada elemento.",
+}
+
+_BATCH_FORMAT_PROMPT = (
+    " Recibirás un objeto JSON con una lista \"items\" de elementos {\"id\", \"text\"}. "
+    "Aplica la tarea al campo \"text\" de cada elemento por separado y responde "
+    "únicamente con un objeto JSON {\"items\": [{\"id\": ..., \"text\": ...}]} "
+    "con los mismos ids."
+)
+
+@lru_cache(maxsize=64)
+def _system_message(task: str, language: str, batch: bool = False) -> ChatMessage:
+    """
+    Mensaje de sistema compartido por todos los chunks de un trabajo.
+    
+    Los mensajes no se modifican tras crearse, así que la misma instancia
+    se reutiliza en todas las peticiones.
+    
+    Args:
+        task: Tarea a realizar
+        language: Idioma del texto
+        batch: Si se añaden las instrucciones del formato por lotes
+        
+    Returns:
+        ChatMessage: Mensaje de sistema
+    """
+    system_prompt = _system_prompt(task, language)
+    if batch:
+        system_prompt += _BATCH_FORMAT_PROMPT
+    return ChatMessage("system", system_prompt)
+
+def _create_prompt_for_task(
+    chunk: TextChunk, 
+    options: ProcessingOptions
+) -> List[ChatMessage]:
+    """
+    Crea un prompt para el LLM según la tarea.
     
-    # Añadir instrucciones RTL si es necesario
+    Args:
+        chunk: Fragmento de texto a procesar
+        options: Opciones de procesamiento
+        
+    Returns:
+        List[ChatMessage]: Lista de mensajes para el LLM
+    """
+    messages = [_system_message(options.task, options.language)]
     if chunk.is_rtl:
-        system_prompt += " El texto está en un idioma de derecha a izquierda (RTL), asegúrate de preservar esta característica."
+        messages.append(_RTL_HINT)
+    prefix = _USER_PREFIXES.get(options.task) or f"{options.extra_prompt or 'Procesa este texto:'} "
+    messages.append(ChatMessage("user", prefix + chunk.text))
+    return messages
+
+def _create_batch_prompt(
+    chunks: List[TextChunk],
+    options: ProcessingOptions
+) -> List[ChatMessage]:
+    """
+    Crea un único prompt que agrupa varios chunks con el mismo valor de is_rtl.
     
-    messages.append(ChatMessage("system", system_prompt))
-    messages.append(ChatMessage("user", user_prompt))
+    Los textos se envían como JSON indexado y se pide la respuesta en el
+    mismo formato, para poder asignar cada resultado a su chunk.
     
+    Args:
+        chunks: Fragmentos de texto a procesar juntos
+        options: Opciones de procesamiento
+        
+    Returns:
+        List[ChatMessage]: Lista de mensajes para el LLM
+    """
+    messages = [_system_message(options.task, options.language, batch=True)]
+    if chunks[0].is_rtl:
+        messages.append(_RTL_HINT)
+    instruction = (
+        _BATCH_INSTRUCTIONS.get(options.task)
+        or options.extra_prompt
+        or "Procesa el texto de cada elemento."
+    )
+    payload = dumps({"items": [{"id": i, "text": c.text} for i, c in enumerate(chunks)]})
+    messages.append(ChatMessage("user", f"{instruction}\n{payload.decode('utf-8')}"))
     return messages
 
-def _process_chunk_batch(
-    llm, 
-    chunks: List[TextChunk], 
+def _parse_batch_response(response: str, size: int) -> Dict[int, str]:
+    """
+    Extrae los textos procesados de una respuesta por lotes.
+    
+    Args:
+        response: Respuesta JSON del LLM
+        size: Número de elementos enviados
+        
+    Returns:
+        Dict[int, str]: Texto procesado por id (solo los ids válidos)
+        
+    Raises:
+        ValueError: Si la respuesta no es JSON con el formato esperado
+    """
+    data = loads(response)
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("La respuesta no contiene una lista de elementos")
+    
+    results: Dict[int, str] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item_id, text = item.get("id"), item.get("text")
+        if isinstance(item_id, int) and 0 <= item_id < size and isinstance(text, str):
+            results[item_id] = text
+    return results
+
+def _traceback_if_debug(error: BaseException) -> Optional[BaseException]:
+    """Excepción a pasar como exc_info: la traza solo se formatea en DEBUG."""
+    return error if logger.isEnabledFor(logging.DEBUG) else None
+
+def _is_cached(llm, messages: List[ChatMessage], options: ProcessingOptions, params: Dict[str, Any]) -> bool:
+    """Indica si la respuesta ya está en la caché exacta del cliente."""
+    return (
+        options.use_cache
+        and isinstance(llm, OpenAIClient)
+        and global_cache.get(messages, llm.get_model_name(), params) is not None
+    )
+
+async def _achat(
+    llm,
+    messages: List[ChatMessage],
+    options: ProcessingOptions,
+    **params: Any
+) -> str:
+    """
+    Envía una petición al LLM, en streaming si options.stream lo pide.
+    
+    En streaming la respuesta se recibe por fragmentos y una generación
+    detenida se abandona tras STREAM_IDLE_TIMEOUT segundos sin tokens, en
+    lugar de esperar al timeout completo de la petición.
+    
+    Args:
+        llm: Cliente LLM
+        messages: Mensajes a enviar
+        options: Opciones de procesamiento
+        **params: Parámetros para el LLM
+        
+    Returns:
+        str: Respuesta completa del LLM
+        
+    Raises:
+        LLMError: Si el streaming deja de recibir tokens
+    """
+    if not options.stream or not hasattr(llm, "achat_stream"):
+        # Los reintentos los gestiona _chat_with_retries: sin los del cliente
+        return await llm.achat(messages, use_cache=options.use_cache, max_retries=0, **params)
+    
+    loop = asyncio.get_running_loop()
+    parts: List[str] = []
+    try:
+        async with asyncio.timeout(STREAM_IDLE_TIMEOUT) as deadline:
+            async with aclosing(llm.achat_stream(messages, use_cache=options.use_cache, **params)) as stream:
+                async for part in stream:
+                    parts.append(part)
+                    deadline.reschedule(loop.time() + STREAM_IDLE_TIMEOUT)
+    except TimeoutError:
+        raise LLMError(f"Sin tokens del modelo durante {STREAM_IDLE_TIMEOUT:g}s")
+    return "".join(parts)
+
+async def _chat_with_retries(
+    llm,
+    messages: List[ChatMessage],
     options: ProcessingOptions,
-    stats: Dict[str, Any]
+    semaphore: asyncio.Semaphore,
+    label: str,
+    tokens_in: int = 0,
+    **params: Any
+) -> Optional[str]:
+    """
+    Llama al LLM reintentando ante límites de tasa y errores transitorios.
+    
+    Es el único nivel de reintentos: el cliente se llama sin los suyos
+    (max_retries=0), de modo que las esperas no retienen el semáforo y cada
+    429 bloquea el limitador RPM/TPM del modelo. Antes de cada envío se
+    reserva capacidad en el limitador, para que las peticiones esperen en
+    el cliente en lugar de provocar errores 429.
+    
+    Args:
+        llm: Cliente LLM
+        messages: Mensajes a enviar
+        options: Opciones de procesamiento
+        semaphore: Limita las peticiones simultáneas al LLM
+        label: Descripción de la petición (para logging)
+        tokens_in: Tokens estimados de los mensajes
+        **params: Parámetros adicionales para el LLM
+        
+    Returns:
+        Optional[str]: Respuesta del LLM, o None si falló
+    """
+    params = {"temperature": options.temperature, "max_tokens": options.max_tokens, **params}
+    limiter = get_rate_limiter(llm.get_model_name())
+    if limiter is not None and _is_cached(llm, messages, options, params):
+        # Las respuestas en caché no consumen cuota de la API
+        limiter = None
+    retry_count = 0
+    
+    while retry_count < MAX_RETRY_ATTEMPTS:
+        try:
+            async with semaphore:
+                if limiter is not None:
+                    await limiter.acquire(tokens_in + options.max_tokens)
+                return await _achat(llm, messages, options, **params)
+            
+        except RateLimitError as e:
+            # Retry-After si el servidor lo indica; si no, backoff con jitter
+            wait_time = backoff_delay(retry_count, e, initial_delay=2.0)
+            retry_count += 1
+            if limiter is not None:
+                limiter.penalize(wait_time)
+            logger.warning("Límite de tasa excedido, reintentando en %.1fs: %s", wait_time, e)
+            await asyncio.sleep(wait_time)
+        
+        except RetryError as e:
+            # Error transitorio (conexión, timeout, error del servidor)
+            wait_time = backoff_delay(retry_count, e)
+            retry_count += 1
+            logger.warning("Error procesando %s, reintentando en %.1fs: %s", label, wait_time, e)
+            await asyncio.sleep(wait_time)
+            
+        except (AuthenticationError, LLMError) as e:
+            logger.error("Error procesando %s: %s", label, e)
+            return None
+            
+        except Exception as e:
+            logger.error(
+                "Error inesperado procesando %s: %s", label, e, exc_info=_traceback_if_debug(e)
+            )
+            return None
+    
+    # Si agotamos los reintentos
+    logger.error("Agotados reintentos para %s", label)
+    return None
+
+def _token_counts(llm, texts: List[str]) -> List[int]:
+    """Tokens de varios textos, con una sola llamada si el cliente lo permite."""
+    get_token_counts = getattr(llm, "get_token_counts", None)
+    if get_token_counts is not None:
+        return get_token_counts(texts)
+    return [llm.get_token_count(text) for text in texts]
+
+def _with_token_counts(
+    llm,
+    prompts: List[List[ChatMessage]]
+) -> List[Tuple[List[ChatMessage], int]]:
+    """
+    Estima los tokens de entrada de varios prompts con una sola llamada al
+    tokenizador.
+    
+    El prompt de sistema es el mismo string en todos los chunks de un
+    trabajo, así que se tokeniza una sola vez.
+    
+    Args:
+        llm: Cliente LLM
+        prompts: Mensajes de cada petición
+        
+    Returns:
+        List[Tuple[List[ChatMessage], int]]: Pares (mensajes, tokens de entrada)
+    """
+    texts = list(dict.fromkeys(msg.content for messages in prompts for msg in messages))
+    tokens = dict(zip(texts, _token_counts(llm, texts)))
+    return [(messages, sum(tokens[msg.content] for msg in messages)) for messages in prompts]
+
+async def _process_one(
+    llm,
+    chunk: TextChunk,
+    index: int,
+    total: int,
+    options: ProcessingOptions,
+    stats: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    prompt: Optional[Tuple[List[ChatMessage], int]] = None
+) -> TextChunk:
+    """
+    Procesa un chunk con una petición propia.
+    
+    Args:
+        llm: Cliente LLM
+        chunk: Chunk a procesar
+        index: Posición del chunk (para logging)
+        total: Número total de chunks (para logging)
+        options: Opciones de procesamiento
+        stats: Diccionario de estadísticas
+        semaphore: Limita las peticiones simultáneas al LLM
+        prompt: Mensajes y tokens de entrada ya calculados (ver _with_token_counts)
+        
+    Returns:
+        TextChunk: Chunk procesado, o el original si hubo un error
+    """
+    logger.debug("Procesando chunk %d/%d: %.50s...", index + 1, total, chunk.text)
+    
+    # Crear prompt y estimar tokens de entrada
+    if prompt is None:
+        prompt = _with_token_counts(llm, [_create_prompt_for_task(chunk, options)])[0]
+    messages, tokens_in = prompt
+    stats["total_tokens_in"] += tokens_in
+    
+    response = await _chat_with_retries(
+        llm, messages, options, semaphore, f"chunk {index+1}", tokens_in
+    )
+    if response is None:
+        # En caso de error, mantener el texto original
+        stats["errors"] += 1
+        return chunk
+    
+    # Estimar tokens de salida
+    tokens_out = llm.get_token_count(response)
+    stats["total_tokens_out"] += tokens_out
+    
+    stats["chunks_processed"] += 1
+    logger.debug("Chunk %d procesado: %d tokens in, %d tokens out", index + 1, tokens_in, tokens_out)
+    
+    # Crear chunk procesado
+    return TextChunk(
+        text=response,
+        path=chunk.path,
+        is_rtl=chunk.is_rtl,
+        _node_ref=chunk._node_ref
+    )
+
+def _json_mode_params(llm) -> Optional[Dict[str, Any]]:
+    """
+    Parámetros que fuerzan una respuesta JSON.
+    
+    Returns:
+        Optional[Dict[str, Any]]: Parámetros, o None si el proveedor no lo
+            soporta; en ese caso no se agrupan chunks, porque una respuesta
+            que no es JSON obliga a repetir cada chunk por separado
+    """
+    if isinstance(llm, OpenAIClient):
+        return {"response_format": {"type": "json_object"}}
+    if isinstance(llm, LocalLLMClient):
+        # Ollama: /api/chat con format=json
+        return {"format": "json"}
+    return None
+
+async def _process_batch(
+    llm,
+    batch: List[Tuple[int, TextChunk]],
+    total: int,
+    options: ProcessingOptions,
+    stats: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    prompt: Tuple[List[ChatMessage], int],
+    json_params: Dict[str, Any]
+) -> List[Tuple[int, TextChunk]]:
+    """
+    Procesa varios chunks en una sola petición al LLM.
+    
+    Si la respuesta no es JSON válido, o le faltan elementos, los chunks
+    afectados se procesan individualmente.
+    
+    Args:
+        llm: Cliente LLM
+        batch: Pares (índice, chunk) con el mismo valor de is_rtl
+        total: Número total de chunks (para logging)
+        options: Opciones de procesamiento
+        stats: Diccionario de estadísticas
+        semaphore: Limita las peticiones simultáneas al LLM
+        prompt: Mensajes del lote y sus tokens de entrada
+        json_params: Parámetros del modo JSON del proveedor (ver _json_mode_params)
+        
+    Returns:
+        List[Tuple[int, TextChunk]]: Pares (índice, chunk procesado)
+    """
+    label = f"lote de {len(batch)} chunks ({batch[0][0]+1}-{batch[-1][0]+1}/{total})"
+    logger.debug("Procesando %s", label)
+    
+    messages, tokens_in = prompt
+    stats["total_tokens_in"] += tokens_in
+    
+    response = await _chat_with_retries(
+        llm, messages, options, semaphore, label, tokens_in, **json_params
+    )
+    if response is None:
+        # En caso de error, mantener los textos originales
+        stats["errors"] += len(batch)
+        return batch
+    
+    stats["total_tokens_out"] += llm.get_token_count(response)
+    
+    try:
+        results = _parse_batch_response(response, len(batch))
+    except ValueError as e:
+        logger.warning("Respuesta no válida para %s, procesando por separado: %s", label, e)
+        results = {}
+    
+    processed: List[Tuple[int, TextChunk]] = []
+    missing: List[Tuple[int, TextChunk]] = []
+    for item_id, (index, chunk) in enumerate(batch):
+        if item_id in results:
+            processed.append((index, TextChunk(
+                text=results[item_id],
+                path=chunk.path,
+                is_rtl=chunk.is_rtl,
+                _node_ref=chunk._node_ref
+            )))
+        else:
+            missing.append((index, chunk))
+    stats["chunks_processed"] += len(processed)
+    
+    # Reintentar individualmente los elementos ausentes en la respuesta
+    if missing:
+        prompts = _with_token_counts(
+            llm, [_create_prompt_for_task(chunk, options) for _, chunk in missing]
+        )
+        fallback = await asyncio.gather(*(
+            _process_one(llm, chunk, index, total, options, stats, semaphore, prompt)
+            for (index, chunk), prompt in zip(missing, prompts)
+        ))
+        processed.extend(zip((index for index, _ in missing), fallback))
+    
+    return processed
+
+def _make_batches(
+    chunks: List[TextChunk],
+    batch_size: int,
+    token_counts: List[int],
+    max_tokens: int
+) -> List[List[Tuple[int, TextChunk]]]:
+    """
+    Agrupa los chunks en lotes que comparten el prompt de sistema.
+    
+    Todas las respuestas de un lote comparten max_tokens, así que cada lote
+    se limita también por los tokens estimados de su respuesta: los de sus
+    textos más la envoltura JSON de cada elemento. Una respuesta truncada no
+    es JSON válido y obligaría a repetir el lote chunk a chunk.
+    
+    Args:
+        chunks: Lista de chunks
+        batch_size: Número máximo de chunks por lote
+        token_counts: Tokens de cada chunk
+        max_tokens: Tokens máximos de la respuesta de cada petición
+        
+    Returns:
+        List[List[Tuple[int, TextChunk]]]: Lotes de pares (índice, chunk)
+    """
+    batches: List[List[Tuple[int, TextChunk]]] = []
+    # Lote abierto y sus tokens estimados, por valor de is_rtl
+    current: Dict[bool, Tuple[List[Tuple[int, TextChunk]], int]] = {}
+    for i, (chunk, tokens) in enumerate(zip(chunks, token_counts)):
+        tokens += BATCH_ITEM_OVERHEAD_TOKENS
+        batch, batch_tokens = current.get(chunk.is_rtl, ([], 0))
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append((i, chunk))
+        current[chunk.is_rtl] = (batch, batch_tokens + tokens)
+    
+    batches.extend(batch for batch, _ in current.values())
+    return batches
+
+async def _process_single(
+    llm,
+    index: int,
+    chunk: TextChunk,
+    total: int,
+    options: ProcessingOptions,
+    stats: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    prompt: Tuple[List[ChatMessage], int]
+) -> List[Tuple[int, TextChunk]]:
+    """Procesa un lote de un solo chunk sin el formato JSON."""
+    return [(index, await _process_one(llm, chunk, index, total, options, stats, semaphore, prompt))]
+
+def _log_task_error(error: BaseException, stats: Dict[str, Any]) -> None:
+    """Registra un error no controlado de una tarea sin cancelar las demás."""
+    if isinstance(error, asyncio.CancelledError):
+        raise error
+    stats["errors"] += 1
+    logger.error(
+        "Error inesperado procesando chunks: %s", error, exc_info=_traceback_if_debug(error)
+    )
+
+async def _dispatch_chunks(
+    chunks: List[TextChunk],
+    llm,
+    options: ProcessingOptions,
+    stats: Dict[str, Any],
+    semaphore: asyncio.Semaphore
 ) -> List[TextChunk]:
     """
-    Procesa un lote de chunks.
+    Envía los chunks al LLM, agrupándolos en lotes si options.batch_size > 1
+    y el proveedor admite respuestas en modo JSON.
     
     Args:
+        chunks: Lista de chunks no vacíos a procesar
         llm: Cliente LLM
-        chunks: Lista de chunks a procesar
         options: Opciones de procesamiento
         stats: Diccionario de estadísticas
+        semaphore: Limita las peticiones simultáneas al LLM
         
     Returns:
-        List[TextChunk]: Chunks procesados
+        List[TextChunk]: Chunks procesados, en el mismo orden que la entrada
     """
-    processed_chunks = []
+    total = len(chunks)
+    json_params = _json_mode_params(llm)
     
-    for i, chunk in enumerate(chunks):
-        if not chunk.text.strip():
-            processed_chunks.append(chunk)
+    if options.batch_size <= 1 or json_params is None:
+        prompts = _with_token_counts(
+            llm, [_create_prompt_for_task(chunk, options) for chunk in chunks]
+        )
+        tasks = [
+            asyncio.create_task(
+                _process_one(llm, chunk, i, total, options, stats, semaphore, prompt)
+            )
+            for i, (chunk, prompt) in enumerate(zip(chunks, prompts))
+        ]
+        processed = list(chunks)
+        for i, result in enumerate(await asyncio.gather(*tasks, return_exceptions=True)):
+            if isinstance(result, BaseException):
+                _log_task_error(result, stats)
+            else:
+                processed[i] = result
+        return processed
+    
+    batches = _make_batches(
+        chunks,
+        options.batch_size,
+        _token_counts(llm, [chunk.text for chunk in chunks]),
+        options.max_tokens
+    )
+    prompts = _with_token_counts(llm, [
+        _create_prompt_for_task(batch[0][1], options) if len(batch) == 1
+        else _create_batch_prompt([chunk for _, chunk in batch], options)
+        for batch in batches
+    ])
+    
+    processed = list(chunks)
+    tasks = []
+    for batch, prompt in zip(batches, prompts):
+        if len(batch) == 1:
+            index, chunk = batch[0]
+            tasks.append(asyncio.create_task(_process_single(
+                llm, index, chunk, total, options, stats, semaphore, prompt
+            )))
+        else:
+            tasks.append(asyncio.create_task(
+                _process_batch(llm, batch, total, options, stats, semaphore, prompt, json_params)
+            ))
+    
+    for results in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(results, BaseException):
+            # Los chunks del lote fallido conservan su texto original
+            _log_task_error(results, stats)
             continue
-            
-        retry_count = 0
-        success = False
+        for index, chunk in results:
+            processed[index] = chunk
+    return processed
+
+def _semantic_context_key(options: ProcessingOptions, llm, is_rtl: bool) -> str:
+    """Contexto de la caché semántica: todo lo que cambia el prompt o la respuesta."""
+    return repr((
+        options.task, options.language, llm.get_model_name(), is_rtl,
+        options.extra_prompt, options.temperature, options.max_tokens
+    ))
+
+async def _dispatch_with_semantic_cache(
+    chunks: List[TextChunk],
+    llm,
+    options: ProcessingOptions,
+    stats: Dict[str, Any],
+    semaphore: asyncio.Semaphore
+) -> List[TextChunk]:
+    """
+    Despacha los chunks reutilizando respuestas de textos casi idénticos.
+    
+    Todos los textos se vectorizan en una sola llamada; solo los que no
+    tienen un acierto en la caché semántica llegan al LLM, y sus respuestas
+    se añaden a la caché para los siguientes documentos.
+    
+    Args:
+        chunks: Chunks no vacíos a procesar (sin duplicados exactos)
+        llm: Cliente LLM
+        options: Opciones de procesamiento
+        stats: Diccionario de estadísticas
+        semaphore: Limita las peticiones simultáneas al LLM
         
-        while retry_count < MAX_RETRY_ATTEMPTS and not success:
-            try:
-                logger.debug(f"Procesando chunk {i+1}/{len(chunks)}: {chunk.text[:50]}...")
-                
-                # Crear prompt
-                messages = _create_prompt_for_task(chunk, options)
-                
-                # Estimar tokens de entrada
-                tokens_in = sum(llm.get_token_count(msg.content) for msg in messages)
-                stats["total_tokens_in"] += tokens_in
-                
-                # Llamar al LLM
-                response = llm.chat(
-                    messages,
-                    use_cache=options.use_cache,
-                    temperature=options.temperature,
-                    max_tokens=options.max_tokens
-                )
-                
-                # Estimar tokens de salida
-                tokens_out = llm.get_token_count(response)
-                stats["total_tokens_out"] += tokens_out
-                
-                # Crear chunk procesado
-                processed_chunk = TextChunk(
-                    text=response,
-                    path=chunk.path,
-                    is_rtl=chunk.is_rtl
-                )
-                processed_chunks.append(processed_chunk)
-                
-                stats["chunks_processed"] += 1
-                logger.debug(f"Chunk {i+1} procesado: {tokens_in} tokens in, {tokens_out} tokens out")
-                success = True
-                
-            except RateLimitError as e:
-                retry_count += 1
-                wait_time = 2 ** retry_count  # Backoff exponencial
-                logger.warning(f"Límite de tasa excedido, reintentando en {wait_time}s: {e}")
-                time.sleep(wait_time)
-                
-            except (AuthenticationError, LLMError) as e:
-                logger.error(f"Error procesando chunk {i+1}: {e}")
-                # En caso de error, mantener el texto original
-                processed_chunks.append(chunk)
-                stats["errors"] += 1
-                break
-                
-            except Exception as e:
-                logger.error(f"Error inesperado procesando chunk {i+1}: {e}")
-                logger.debug(traceback.format_exc())
-                # En caso de error, mantener el texto original
-                processed_chunks.append(chunk)
-                stats["errors"] += 1
-                break
+    Returns:
+        List[TextChunk]: Un resultado por chunk, en el mismo orden
+    """
+    try:
+        cache = get_chunk_semantic_cache()
+    except ConfigurationError as e:
+        logger.warning("Caché semántica desactivada: %s", e)
+        stats["warnings"] += 1
+        return await _dispatch_chunks(chunks, llm, options, stats, semaphore)
+    
+    # La inferencia del modelo es CPU: fuera del bucle de eventos
+    vectors = await asyncio.to_thread(cache.embed, [chunk.text for chunk in chunks])
+    
+    by_context: Dict[str, List[Tuple[int, List[float]]]] = defaultdict(list)
+    for i, vector in enumerate(vectors):
+        by_context[_semantic_context_key(options, llm, chunks[i].is_rtl)].append((i, vector))
+    
+    processed = list(chunks)
+    hits = 0
+    misses: List[Tuple[int, List[float], str]] = []
+    for context_key, items in by_context.items():
+        responses = cache.lookup_many(context_key, [vector for _, vector in items])
+        for (i, vector), response in zip(items, responses):
+            if response is None:
+                misses.append((i, vector, context_key))
+                continue
+            processed[i] = TextChunk(
+                text=response,
+                path=chunks[i].path,
+                is_rtl=chunks[i].is_rtl,
+                _node_ref=chunks[i]._node_ref
+            )
+            hits += 1
+    
+    if hits:
+        logger.debug("%d chunks resueltos con la caché semántica", hits)
+    stats["cache_hits"] = stats.get("cache_hits", 0) + hits
+    stats["chunks_processed"] += hits
+    
+    misses.sort()
+    results = await _dispatch_chunks([chunks[i] for i, _, _ in misses], llm, options, stats, semaphore)
+    for (i, vector, context_key), result in zip(misses, results):
+        processed[i] = result
+        # Los chunks fallidos se devuelven sin cambios y no se cachean
+        if result is not chunks[i]:
+            cache.add(context_key, vector, result.text)
+    return processed
+
+async def aprocess_chunks(
+    chunks: List[TextChunk],
+    llm,
+    options: ProcessingOptions,
+    stats: Dict[str, Any],
+    semaphore_limit: int = MAX_CONCURRENT_REQUESTS
+) -> List[TextChunk]:
+    """
+    Procesa todos los chunks en paralelo, limitando las peticiones simultáneas.
+    
+    Los textos repetidos (menús, "Leer más", etc.) se envían una sola vez y
+    la respuesta se reparte entre todas sus apariciones. Los chunks vacíos
+    (el extractor no los genera, pero pueden venir de otros llamantes) se
+    devuelven sin cambios.
+    
+    Args:
+        chunks: Lista de chunks a procesar
+        llm: Cliente LLM
+        options: Opciones de procesamiento
+        stats: Diccionario de estadísticas
+        semaphore_limit: Máximo de peticiones simultáneas al LLM
         
-        # Si agotamos los reintentos
-        if not success:
-            logger.error(f"Agotados reintentos para chunk {i+1}")
-            processed_chunks.append(chunk)
-            stats["errors"] += 1
+    Returns:
+        List[TextChunk]: Chunks procesados, en el mismo orden que la entrada
+    """
+    # El prompt depende del texto y de is_rtl: agrupar por ambos
+    unique: Dict[Tuple[str, bool], List[int]] = defaultdict(list)
+    for i, chunk in enumerate(chunks):
+        # Único punto en el que se descartan los textos vacíos
+        if chunk.text.strip():
+            unique[(chunk.text, chunk.is_rtl)].append(i)
+    
+    representatives = [chunks[indices[0]] for indices in unique.values()]
+    duplicates = sum(map(len, unique.values())) - len(representatives)
+    if duplicates:
+        logger.debug("%d chunks duplicados omitidos", duplicates)
+    stats["dedup_hits"] = stats.get("dedup_hits", 0) + duplicates
+    
+    semaphore = asyncio.Semaphore(semaphore_limit)
+    if options.semantic_cache:
+        results = await _dispatch_with_semantic_cache(representatives, llm, options, stats, semaphore)
+    else:
+        results = await _dispatch_chunks(representatives, llm, options, stats, semaphore)
     
-    return processed_chunks
+    processed = list(chunks)
+    fanned_out = 0
+    for original, result, indices in zip(representatives, results, unique.values()):
+        # Si el chunk falló o estaba vacío se devuelve el original
+        succeeded = result is not original
+        for i in indices:
+            processed[i] = TextChunk(
+                text=result.text,
+                path=chunks[i].path,
+                is_rtl=chunks[i].is_rtl,
+                _node_ref=chunks[i]._node_ref
+            ) if succeeded else chunks[i]
+        if succeeded:
+            fanned_out += len(indices) - 1
+    stats["chunks_processed"] += fanned_out
+    return processed
+
+def _pipeline_loop() -> asyncio.AbstractEventLoop:
+    """
+    Devuelve el bucle de eventos de process_html, arrancándolo si no existe.
+    
+    El bucle corre en un hilo propio y se comparte entre todos los hilos
+    del proceso. Tras un fork (p. ej. gunicorn con preload) el hilo no
+    existe en el proceso hijo, así que se crea otro bucle.
+    """
+    global _loop, _loop_thread, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever, name="pipeline-loop", daemon=True
+            )
+            _loop_thread.start()
+            _loop_pid = os.getpid()
+        return _loop
+
+@atexit.register
+def _stop_pipeline_loop() -> None:
+    """Detiene el bucle de process_html al terminar el proceso."""
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            return
+        _loop.call_soon_threadsafe(_loop.stop)
+        _loop_thread.join(timeout=5.0)
+        if not _loop_thread.is_alive():
+            _loop.close()
 
 def process_html(html: str, options: ProcessingOptions) -> ProcessingResult:
     """
     Procesa HTML usando LLMs según las opciones especificadas.
     
+    Ejecuta aprocess_html en un bucle de eventos persistente compartido por
+    todas las llamadas (ver _pipeline_loop), de modo que las conexiones con
+    el proveedor se reutilizan entre documentos. El parseo y la
+    serialización del HTML se ejecutan en hilos aparte para no bloquear el
+    bucle con documentos grandes. Desde código que ya corre
+    dentro de un bucle (servidores asíncronos, notebooks) hay que usar
+    directamente aprocess_html.
+    
+    Args:
+        html: Contenido HTML como string
+        options: Opciones de procesamiento
+        
+    Returns:
+        ProcessingResult: Resultado del procesamiento
+        
+    Raises:
+        PipelineError: Si hay un error en el pipeline
+        HTMLProcessingError: Si hay un error procesando el HTML
+        RuntimeError: Si se llama desde un bucle de eventos en marcha
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError("process_html no puede llamarse desde un bucle de eventos: usa aprocess_html")
+    
+    future = asyncio.run_coroutine_threadsafe(aprocess_html(html, options), _pipeline_loop())
+    try:
+        return future.result()
+    except BaseException:
+        # Interrupción del llamante (Ctrl+C): no dejar el trabajo en marcha
+        future.cancel()
+        raise
+
+async def aprocess_html(html: str, options: ProcessingOptions) -> ProcessingResult:
+    """
+    Versión asíncrona de process_html.
+    
     Args:
         html: Contenido HTML como string
         options: Opciones de procesamiento
@@ -184,7 +873,7 @@ def process_html(html: str, options: ProcessingOptions) -> ProcessingResult:
         PipelineError: Si hay un error en el pipeline
         HTMLProcessingError: Si hay un error procesando el HTML
     """
-    logger.info(f"Iniciando procesamiento de HTML con tarea: {options.task}")
+    logger.info("Iniciando procesamiento de HTML con tarea: %s", options.task)
     start_time = time.time()
     
     # Estadísticas de procesamiento
@@ -194,15 +883,20 @@ def process_html(html: str, options: ProcessingOptions) -> ProcessingResult:
         "total_tokens_out": 0,
         "processing_time": 0,
         "errors": 0,
-        "warnings": 0
+        "warnings": 0,
+        "cache_hits": 0,
+        "dedup_hits": 0
     }
     
     try:
-        # Extraer nodos de texto
+        # Parsear una sola vez: los chunks guardan la referencia a su nodo y
+        # el texto procesado se escribe directamente en el mismo árbol.
+        # Parsear y serializar son CPU: fuera del bucle, que comparten todas
+        # las llamadas a process_html
         logger.debug("Extrayendo nodos de texto")
         try:
-            chunks = extract_text_nodes(html, options.min_text_length)
-            logger.info(f"Extraídos {len(chunks)} fragmentos de texto")
+            document, chunks = await asyncio.to_thread(extract_document, html, options.min_text_length)
+            logger.info("Extraídos %d fragmentos de texto", len(chunks))
         except EmptyHTMLError:
             logger.warning("HTML vacío o demasiado pequeño, devolviendo sin cambios")
             stats["warnings"] += 1
@@ -211,9 +905,9 @@ def process_html(html: str, options: ProcessingOptions) -> ProcessingResult:
                 stats=stats
             )
         except MalformedHTMLError as e:
-            logger.error(f"HTML malformado: {e}")
+            logger.error("HTML malformado: %s", e)
             if hasattr(e, 'html_fragment') and e.html_fragment:
-                logger.debug(f"Fragmento problemático: {e.html_fragment}")
+                logger.debug("Fragmento problemático: %s", e.html_fragment)
             stats["errors"] += 1
             return ProcessingResult(
                 html=html,  # Devolver HTML original
@@ -238,27 +932,23 @@ def process_html(html: str, options: ProcessingOptions) -> ProcessingResult:
             provider = "local"
         
         # Crear cliente LLM
-        logger.debug(f"Creando cliente LLM: {provider} / {options.model}")
+        logger.debug("Creando cliente LLM: %s / %s", provider, options.model)
         try:
-            llm = create_llm_client(provider, options.model)
+            llm = get_llm_client(provider, options.model)
         except Exception as e:
-            logger.error(f"Error al crear cliente LLM: {e}")
+            logger.error("Error al crear cliente LLM: %s", e)
             raise PipelineError(f"No se pudo crear el cliente LLM: {e}")
         
-        # Procesar chunks en lotes para evitar problemas de memoria
-        processed_chunks = []
-        for i in range(0, len(chunks), CHUNK_BATCH_SIZE):
-            batch = chunks[i:i + CHUNK_BATCH_SIZE]
-            logger.debug(f"Procesando lote {i//CHUNK_BATCH_SIZE + 1}/{(len(chunks)-1)//CHUNK_BATCH_SIZE + 1}")
-            batch_processed = _process_chunk_batch(llm, batch, options, stats)
-            processed_chunks.extend(batch_processed)
+        # Procesar chunks en paralelo con peticiones asíncronas
+        logger.debug("Procesando %d chunks (%d peticiones simultáneas)", len(chunks), MAX_CONCURRENT_REQUESTS)
+        processed_chunks = await aprocess_chunks(chunks, llm, options, stats)
         
         # Reinyectar texto procesado
         logger.debug("Reinyectando texto procesado")
         try:
-            result_html = inject_text(html, processed_chunks, strict=False)
-        except HTMLProcessingError as e:
-            logger.error(f"Error al inyectar texto: {e}")
+            result_html = await asyncio.to_thread(inject_text_inplace, document, processed_chunks)
+        except (HTMLProcessingError, ValueError) as e:
+            logger.error("Error al inyectar texto: %s", e)
             stats["errors"] += 1
             return ProcessingResult(
                 html=html,  # Devolver HTML original en caso de error
@@ -266,18 +956,18 @@ def process_html(html: str, options: ProcessingOptions) -> ProcessingResult:
             )
         
     except Exception as e:
-        logger.error(f"Error en el pipeline: {e}")
-        logger.debug(traceback.format_exc())
+        logger.error("Error en el pipeline: %s", e, exc_info=_traceback_if_debug(e))
         stats["errors"] += 1
         raise PipelineError(f"Error en el pipeline: {e}")
     finally:
         # Completar estadísticas
         stats["processing_time"] = time.time() - start_time
         
-        logger.info(f"Procesamiento completado en {stats['processing_time']:.2f}s")
+        logger.info("Procesamiento completado en %.2fs", stats["processing_time"])
         logger.info(
-            f"Estadísticas: {len(chunks) if 'chunks' in locals() else 0} chunks, "
-            f"{stats['chunks_processed']} procesados, {stats['errors']} errores"
+            "Estadísticas: %d chunks, %d procesados, %d errores",
+            len(chunks) if 'chunks' in locals() else 0,
+            stats["chunks_processed"], stats["errors"]
         )
     
     return ProcessingResult(
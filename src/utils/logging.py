@@ -2,14 +2,23 @@
 Sistema de logging configurable.
 """
 
+import atexit
 import logging
 import os
+import queue
 import sys
+import threading
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from typing import Optional, Literal, Dict, Any
+from typing import Optional, Literal, Dict, Any, Tuple
 
 LogLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
 
+# Rotación de los archivos de log
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 5
+
 class LogConfig:
     """Configuración de logging."""
     
@@ -34,6 +43,59 @@ class LogConfig:
         self.console = console
         self.format = format
 
+@lru_cache(maxsize=8)
+def _formatter(fmt: str) -> logging.Formatter:
+    """Formatter compartido por todos los handlers que usan el mismo formato."""
+    return logging.Formatter(fmt)
+
+# Handlers de archivo por ruta: (handler de cola, listener, handler de archivo)
+_file_handlers: Dict[str, Tuple[QueueHandler, QueueListener, RotatingFileHandler]] = {}
+_file_handlers_lock = threading.Lock()
+
+def _file_handler(log_file: str, formatter: logging.Formatter) -> QueueHandler:
+    """
+    Obtiene el handler compartido de un archivo de log.
+
+    La escritura la hace un QueueListener en su propio hilo, de modo que el
+    logging nunca bloquea el pipeline en disco. El archivo se abre una sola
+    vez por proceso aunque setup_logging se llame varias veces.
+
+    Args:
+        log_file: Ruta del archivo de log
+        formatter: Formatter de los mensajes
+
+    Returns:
+        QueueHandler: Handler que encola los registros
+    """
+    key = str(Path(log_file).resolve())
+    with _file_handlers_lock:
+        if key not in _file_handlers:
+            # Asegurar que el directorio existe
+            Path(key).parent.mkdir(parents=True, exist_ok=True)
+            file_handler = RotatingFileHandler(
+                key,
+                maxBytes=LOG_FILE_MAX_BYTES,
+                backupCount=LOG_FILE_BACKUP_COUNT,
+                encoding="utf-8"
+            )
+            queue_handler = QueueHandler(queue.Queue(-1))
+            listener = QueueListener(queue_handler.queue, file_handler)
+            listener.start()
+            _file_handlers[key] = (queue_handler, listener, file_handler)
+        queue_handler, _, file_handler = _file_handlers[key]
+        # El formato se aplica en el hilo del listener
+        file_handler.setFormatter(formatter)
+        return queue_handler
+
+@atexit.register
+def _stop_file_listeners() -> None:
+    """Vacía las colas pendientes y cierra los archivos de log al salir."""
+    with _file_handlers_lock:
+        for _, listener, file_handler in _file_handlers.values():
+            listener.stop()
+            file_handler.close()
+        _file_handlers.clear()
+
 def setup_logging(
     name: str = "llm_html_processor",
     config: Optional[LogConfig] = None
@@ -58,8 +120,7 @@ def setup_logging(
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
     
-    # Crear formatter
-    formatter = logging.Formatter(config.format)
+    formatter = _formatter(config.format)
     
     # Añadir handler de consola si está habilitado
     if config.console:
@@ -69,13 +130,7 @@ def setup_logging(
     
     # Añadir handler de archivo si está configurado
     if config.log_file:
-        # Asegurar que el directorio existe
-        log_path = Path(config.log_file)
-        log_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        file_handler = logging.FileHandler(config.log_file)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        logger.addHandler(_file_handler(config.log_file, formatter))
     
     return logger
 
@@ -0,0 +1,73 @@
+"""
+Serialización JSON con orjson cuando está disponible.
+"""
+
+import dataclasses
+import json
+from datetime import date, datetime
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: se usa la librería estándar
+    orjson = None
+
+def _default(obj: Any) -> Any:
+    """Serializa en el fallback los tipos que orjson soporta de forma nativa."""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        # Como orjson, se omiten los campos privados (p. ej. TextChunk._node_ref)
+        return {
+            field.name: getattr(obj, field.name)
+            for field in dataclasses.fields(obj)
+            if not field.name.startswith("_")
+        }
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+def dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """
+    Serializa un objeto a JSON en bytes UTF-8.
+    
+    Admite dataclasses y fechas además de los tipos JSON básicos.
+
+    Args:
+        obj: Objeto a serializar
+        indent: Si se indenta la salida con 2 espacios
+        sort_keys: Si se ordenan las claves de los diccionarios
+
+    Returns:
+        bytes: JSON codificado en UTF-8
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option)
+
+    return json.dumps(
+        obj,
+        indent=2 if indent else None,
+        sort_keys=sort_keys,
+        ensure_ascii=False,
+        default=_default
+    ).encode("utf-8")
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Deserializa un documento JSON.
+
+    Args:
+        data: JSON como string o bytes
+
+    Returns:
+        Any: Objeto deserializado
+
+    Raises:
+        ValueError: Si el JSON no es válido
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
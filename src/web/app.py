@@ -4,15 +4,38 @@ Aplicación Flask para la interfaz web y API REST.
 
 import os
 import datetime
+from typing import Any
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask.json.provider import JSONProvider
 from flask_wtf.csrf import CSRFProtect
 from flask_login import LoginManager, current_user
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 from ..utils.logging import get_logger, LogConfig, setup_logging
+from ..utils.serialization import dumps, loads
 
 logger = get_logger("web")
 
+class OrjsonProvider(JSONProvider):
+    """
+    Proveedor JSON de Flask basado en utils.serialization (orjson).
+    
+    Lo usan jsonify(), request.json y el filtro tojson de las plantillas.
+    """
+    
+    # Como el proveedor por defecto de Flask, para respuestas estables
+    sort_keys = True
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(
+            obj,
+            indent=bool(kwargs.get("indent")),
+            sort_keys=kwargs.get("sort_keys", self.sort_keys)
+        ).decode("utf-8")
+    
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return loads(s)
+
 def create_app(test_config=None):
     """
     Crea y configura la aplicación Flask.
@@ -35,13 +58,15 @@ def create_app(test_config=None):
     app.config.from_mapping(
         SECRET_KEY=os.environ.get('SECRET_KEY', 'dev-key-change-in-production'),
         MAX_CONTENT_LENGTH=10 * 1024 * 1024,  # 10 MB máximo
-        UPLOAD_FOLDER=os.path.join(app.instance_path, 'uploads'),
         SESSION_COOKIE_HTTPONLY=True,
         SESSION_COOKIE_SECURE=os.environ.get('FLASK_ENV') == 'production',
         REMEMBER_COOKIE_HTTPONLY=True,
         REMEMBER_COOKIE_SECURE=os.environ.get('FLASK_ENV') == 'production',
     )
     
+    # Serialización JSON con orjson
+    app.json = OrjsonProvider(app)
+    
     # Soporte para proxy
     app.wsgi_app = ProxyFix(app.wsgi_app)
     
@@ -56,7 +81,6 @@ def create_app(test_config=None):
     # Asegurar que existe el directorio de instancia
     try:
         os.makedirs(app.instance_path, exist_ok=True)
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     except OSError:
         pass
     
@@ -2,22 +2,271 @@
 Modelos para la aplicación web.
 """
 
+import atexit
+import contextlib
 import os
-import json
+import queue
+import tempfile
+import threading
 import time
 import uuid
-from dataclasses import dataclass, field, asdict
-from typing import Dict, List, Optional, Any
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Any, Set, Tuple
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from ..utils.logging import get_logger
+from ..utils.serialization import dumps, loads
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+except ImportError:  # argon2-cffi es opcional: se usa PBKDF2 de werkzeug
+    PasswordHasher = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard es opcional: se comprime con zlib
+    zstandard = None
 
 logger = get_logger("web.models")
 
+# Argon2id con los parámetros mínimos recomendados por OWASP
+_password_hasher = (
+    PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+    if PasswordHasher is not None else None
+)
+
+def _hash_password(password: str) -> str:
+    """Calcula el hash de una contraseña (Argon2id si está disponible)."""
+    if _password_hasher is not None:
+        return _password_hasher.hash(password)
+    return generate_password_hash(password)
+
 # Directorio para almacenar datos
 DATA_DIR = os.environ.get("DATA_DIR", "instance/data")
 os.makedirs(DATA_DIR, exist_ok=True)
+USERS_DIR = os.path.join(DATA_DIR, "users")
+# Archivo único de versiones anteriores: se migra a USERS_DIR al primer uso
+USERS_FILE = os.path.join(DATA_DIR, "users.json")
+
+# Usuarios cargados en memoria. Cada usuario se guarda en su propio archivo
+# y cualquier escritura (os.replace) cambia el mtime del directorio, así que
+# solo se vuelve a listar USERS_DIR cuando otro proceso lo ha modificado, y
+# solo se releen los archivos cuya versión ha cambiado
+_users_cache: Dict[str, "User"] = {}
+_users_dir_version: Optional[int] = None
+_users_file_versions: Dict[str, Tuple[int, int]] = {}
+_users_lock = threading.RLock()
+
+# Segundos que se acumulan los cambios no críticos antes de escribirlos
+USER_FLUSH_INTERVAL = 5.0
+
+# Usuarios con cambios pendientes de escribir (ver User.save(sync=False))
+_dirty_users: Set[str] = set()
+# Contadores de uso. Varios procesos los incrementan a la vez, así que no se
+# escribe su valor en memoria: cada proceso acumula sus incrementos desde la
+# última escritura y los suma al valor del archivo. Solo se modifican con
+# User.record_document: asignarlos directamente no llega a disco
+_COUNTER_FIELDS = ("documents_processed", "total_tokens")
+_counter_deltas: Dict[str, Dict[str, int]] = {}
+_flush_timer: Optional[threading.Timer] = None
+
+# Un único hilo escribe los archivos de usuario: las escrituras no se solapan
+# y las peticiones no retienen _users_lock durante la E/S. save() espera como
+# mucho USER_WRITE_TIMEOUT segundos a que su escritura termine.
+USER_WRITE_TIMEOUT = 5.0
+_user_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-writer")
+# Escrituras encoladas o en curso por usuario
+_writing_users: Dict[str, int] = {}
+
+# Índices secundarios de la caché (email/API key -> ID de usuario) y claves
+# con las que está indexado cada usuario, para poder retirarlas al cambiar
+_users_by_email: Dict[str, str] = {}
+_users_by_api_key: Dict[str, str] = {}
+_indexed_keys: Dict[str, Tuple[str, str]] = {}
+
+def _unindex_user(user_id: str) -> None:
+    """Retira un usuario de los índices (requiere _users_lock)."""
+    keys = _indexed_keys.pop(user_id, None)
+    if keys is None:
+        return
+    email, api_key = keys
+    if _users_by_email.get(email) == user_id:
+        del _users_by_email[email]
+    if _users_by_api_key.get(api_key) == user_id:
+        del _users_by_api_key[api_key]
+
+def _index_user(user: "User") -> None:
+    """Indexa un usuario por email y API key (requiere _users_lock)."""
+    old_keys = _indexed_keys.get(user.id)
+    # Las claves nuevas se insertan antes de retirar las antiguas: las
+    # lecturas sin lock nunca dejan de encontrar una clave que no cambia
+    _users_by_email[user.email] = user.id
+    _users_by_api_key[user.api_key] = user.id
+    _indexed_keys[user.id] = (user.email, user.api_key)
+    if old_keys is None:
+        return
+    old_email, old_api_key = old_keys
+    if old_email != user.email and _users_by_email.get(old_email) == user.id:
+        del _users_by_email[old_email]
+    if old_api_key != user.api_key and _users_by_api_key.get(old_api_key) == user.id:
+        del _users_by_api_key[old_api_key]
+
+def _file_version(st: os.stat_result) -> Tuple[int, int]:
+    """Versión de un archivo para invalidar cachés: (mtime_ns, tamaño)."""
+    return st.st_mtime_ns, st.st_size
+
+def _user_path(user_id: str) -> str:
+    """Ruta del archivo de un usuario."""
+    return os.path.join(USERS_DIR, f"{user_id}.json")
+
+def _fsync_dir(path: str) -> None:
+    """Persiste las entradas de un directorio (renombrados incluidos)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        # Windows no permite abrir directorios
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _write_atomic(path: str, payload: bytes, durable: bool = False) -> None:
+    """
+    Escribe un archivo de forma atómica.
+
+    Se escribe en un archivo temporal del mismo directorio y se renombra
+    sobre el destino, de modo que los lectores nunca ven un archivo a medias.
+
+    Args:
+        path: Ruta del archivo
+        payload: Contenido del archivo
+        durable: Si se fuerza la escritura a disco (fsync del archivo y del
+            directorio) antes de volver. Solo para datos que no se pueden
+            perder, como contraseñas o API keys: cuesta una o más esperas
+            al disco
+    """
+    # Una sola llamada a write() sin buffer
+    with tempfile.NamedTemporaryFile(
+        "wb", buffering=0, dir=os.path.dirname(path), suffix=".tmp", delete=False
+    ) as f:
+        f.write(payload)
+        if durable:
+            os.fsync(f.fileno())
+    try:
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+    if durable:
+        _fsync_dir(os.path.dirname(path))
+
+def _write_json_atomic(path: str, data: Any, durable: bool = False) -> None:
+    """
+    Escribe un JSON de forma atómica (ver _write_atomic).
+
+    Args:
+        path: Ruta del archivo
+        data: Datos serializables a JSON
+        durable: Si se fuerza la escritura a disco antes de volver
+    """
+    _write_atomic(path, dumps(data), durable)
+
+def _write_user_file(
+    user_id: str,
+    record: Optional[Dict[str, Any]],
+    durable: bool,
+    deltas: Dict[str, int],
+    last_login: float
+) -> None:
+    """
+    Escribe el archivo de un usuario (se ejecuta en _user_writer).
+
+    El registro se combina con el archivo actual: otro proceso puede haber
+    guardado entretanto sus propios cambios. Los contadores de
+    _COUNTER_FIELDS se toman del archivo y se les suman deltas; de
+    last_login se conserva el mayor.
+
+    Args:
+        user_id: ID del usuario
+        record: Registro completo del usuario, o None si solo se escriben
+            los cambios diferidos (contadores y último login)
+        durable: Si se fuerza la escritura a disco (ver _write_atomic)
+        deltas: Incrementos de los contadores desde la última escritura
+        last_login: Último login conocido por este proceso
+    """
+    path = _user_path(user_id)
+    try:
+        try:
+            with open(path, "rb") as f:
+                current = loads(f.read())
+        except FileNotFoundError:
+            if record is None:
+                raise
+            # Usuario nuevo: los contadores en memoria ya son los válidos
+            current = None
+        if record is None:
+            record = current
+        elif current is not None:
+            for name in _COUNTER_FIELDS:
+                record[name] = current.get(name, 0)
+        if current is not None:
+            for name, delta in deltas.items():
+                record[name] = record.get(name, 0) + delta
+            record["last_login"] = max(current.get("last_login", last_login), last_login)
+        _write_atomic(path, dumps(record), durable)
+        written = True
+    except FileNotFoundError:
+        # Usuario eliminado en otro proceso: no recrearlo
+        logger.warning(f"Usuario {user_id} eliminado, se descartan sus cambios pendientes")
+        written = False
+    except Exception as e:
+        logger.error(f"Error al guardar usuario: {e}")
+        written = False
+    
+    with _users_lock:
+        pending = _writing_users.pop(user_id) - 1
+        if pending:
+            _writing_users[user_id] = pending
+        if written and current is None:
+            # La caché ya refleja lo escrito: evitar releerlo. Un registro
+            # combinado puede incluir cambios de otro proceso: se relee.
+            # La versión de USERS_DIR no se toca: otros procesos pueden haber
+            # escrito desde el último listado, y el siguiente acceso debe
+            # verlo (los archivos sin cambios no se vuelven a parsear)
+            _users_file_versions[user_id] = _file_version(os.stat(path))
+
+def _migrate_users_file() -> None:
+    """
+    Crea USERS_DIR y reparte en él los usuarios de users.json, si existe.
+
+    users.json se renombra a users.json.migrated para no volver a migrarlo.
+    """
+    os.makedirs(USERS_DIR, exist_ok=True)
+    try:
+        with open(USERS_FILE, "rb") as f:
+            users_data = loads(f.read())
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        logger.error(f"Error al migrar usuarios: {e}")
+        return
+    
+    for uid, data in users_data.items():
+        # users.json se retira a continuación: los archivos nuevos deben
+        # estar en disco antes
+        _write_json_atomic(_user_path(uid), data, durable=True)
+    try:
+        os.replace(USERS_FILE, USERS_FILE + ".migrated")
+    except FileNotFoundError:
+        # Otro proceso ya ha completado la migración
+        pass
+    logger.info(f"Migrados {len(users_data)} usuarios a {USERS_DIR}")
 
 # Planes de suscripción
 class SubscriptionPlan:
@@ -57,8 +306,13 @@ PLAN_CONFIG = {
         "features": ["Documentos ilimitados", "Tamaño personalizable", "API dedicada", "Soporte técnico 24/7"]
     }
 }
+# Solo lectura: las vistas comparten estas configuraciones entre peticiones
+PLAN_CONFIG = {plan: MappingProxyType(config) for plan, config in PLAN_CONFIG.items()}
 
-@dataclass
+# Planes sin acceso a la API REST
+_PLANS_WITHOUT_API = frozenset({SubscriptionPlan.FREE, SubscriptionPlan.BASIC})
+
+@dataclass(slots=True)
 class User(UserMixin):
     """Modelo de usuario."""
     id: str
@@ -90,34 +344,83 @@ class User(UserMixin):
             id=user_id,
             email=email,
             name=name,
-            password_hash=generate_password_hash(password)
+            password_hash=_hash_password(password)
         )
         user.save()
         return user
     
+    def set_password(self, password: str) -> None:
+        """
+        Cambia la contraseña del usuario (sin guardar).
+        
+        Args:
+            password: Nueva contraseña en texto plano
+        """
+        self.password_hash = _hash_password(password)
+    
     def check_password(self, password: str) -> bool:
         """
         Verifica la contraseña del usuario.
         
+        Los hashes PBKDF2 antiguos, o Argon2 con otros parámetros, se
+        recalculan y guardan tras una verificación correcta.
+        
         Args:
             password: Contraseña a verificar
             
         Returns:
             bool: True si la contraseña es correcta
         """
-        return check_password_hash(self.password_hash, password)
+        if self.password_hash.startswith("$argon2"):
+            if _password_hasher is None:
+                logger.error("Hash Argon2 sin argon2-cffi instalado: no se puede verificar")
+                return False
+            try:
+                _password_hasher.verify(self.password_hash, password)
+            except (VerificationError, InvalidHashError):
+                return False
+            needs_rehash = _password_hasher.check_needs_rehash(self.password_hash)
+        else:
+            if not check_password_hash(self.password_hash, password):
+                return False
+            needs_rehash = _password_hasher is not None
+        
+        if needs_rehash:
+            self.set_password(password)
+            self.save()
+        return True
     
     def update_login(self) -> None:
         """Actualiza la fecha de último login."""
         self.last_login = time.time()
-        self.save()
+        self.save(sync=False)
     
-    def get_plan_config(self) -> Dict[str, Any]:
+    def record_document(self, tokens: int) -> None:
+        """
+        Suma un documento procesado y sus tokens a las estadísticas.
+        
+        Args:
+            tokens: Tokens consumidos (entrada y salida)
+        """
+        with _users_lock:
+            self.documents_processed += 1
+            self.total_tokens += tokens
+            deltas = _counter_deltas.setdefault(self.id, {})
+            deltas["documents_processed"] = deltas.get("documents_processed", 0) + 1
+            deltas["total_tokens"] = deltas.get("total_tokens", 0) + tokens
+        self.save(sync=False)
+    
+    @property
+    def has_api_access(self) -> bool:
+        """Si el plan de suscripción incluye acceso a la API REST."""
+        return self.subscription_plan not in _PLANS_WITHOUT_API
+    
+    def get_plan_config(self) -> Mapping[str, Any]:
         """
         Obtiene la configuración del plan de suscripción.
         
         Returns:
-            Dict[str, Any]: Configuración del plan
+            Mapping[str, Any]: Configuración del plan (solo lectura)
         """
         return PLAN_CONFIG.get(self.subscription_plan, PLAN_CONFIG[SubscriptionPlan.FREE])
     
@@ -151,23 +454,91 @@ class User(UserMixin):
         Returns:
             Dict[str, Any]: Diccionario con los datos del usuario
         """
-        data = asdict(self)
+        data = self._record()
         # Eliminar datos sensibles
         data.pop("password_hash", None)
         return data
     
-    def save(self) -> None:
-        """Guarda el usuario en el almacenamiento."""
-        users = User.load_all()
-        users[self.id] = self
+    def _record(self) -> Dict[str, Any]:
+        """
+        Datos completos del usuario tal y como se guardan en disco.
         
-        users_data = {uid: user.to_dict() for uid, user in users.items()}
+        Copia superficial: todos los campos son inmutables, así que no hace
+        falta la copia profunda de asdict().
         
+        Returns:
+            Dict[str, Any]: Diccionario con todos los campos
+        """
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+    
+    def save(self, sync: bool = True) -> None:
+        """
+        Guarda el usuario en el almacenamiento.
+        
+        Args:
+            sync: Si es False, solo se actualiza la caché y la escritura en
+                disco se agrupa con las demás en los siguientes
+                USER_FLUSH_INTERVAL segundos. Solo se escriben entonces el
+                último login y los contadores; los cambios de
+                contraseña, API key o plan deben guardarse de inmediato. Las
+                escrituras inmediatas se fuerzan a disco con fsync; las
+                agrupadas no.
+        """
+        global _flush_timer
+        with _users_lock:
+            if not sync:
+                _users_cache[self.id] = self
+                _dirty_users.add(self.id)
+                if _flush_timer is None:
+                    _flush_timer = threading.Timer(USER_FLUSH_INTERVAL, _flush_timer_fired)
+                    _flush_timer.daemon = True
+                    _flush_timer.start()
+                return
+            
+            _dirty_users.discard(self.id)
+            future = self._submit_write(durable=True)
+        
+        # Esperar fuera del lock: el hilo escritor lo necesita al terminar
         try:
-            with open(os.path.join(DATA_DIR, "users.json"), "w") as f:
-                json.dump(users_data, f)
-        except Exception as e:
-            logger.error(f"Error al guardar usuario: {e}")
+            future.result(timeout=USER_WRITE_TIMEOUT)
+        except TimeoutError:
+            logger.error(
+                f"El guardado del usuario {self.id} tarda más de "
+                f"{USER_WRITE_TIMEOUT}s; continúa en segundo plano"
+            )
+    
+    def _submit_write(self, durable: bool, deferred_only: bool = False) -> Future:
+        """
+        Actualiza la caché y encola la escritura del usuario en su archivo.
+        
+        Args:
+            durable: Si se fuerza la escritura a disco (ver _write_atomic)
+            deferred_only: Escribir solo los contadores y el último login
+                sobre el archivo actual, en lugar del registro completo
+            
+        Returns:
+            Future: Se completa cuando el archivo está escrito
+        """
+        with _users_lock:
+            # Incorporar antes los cambios de otros procesos
+            User._cached_users()
+            _users_cache[self.id] = self
+            _index_user(self)
+            _writing_users[self.id] = _writing_users.get(self.id, 0) + 1
+            # Copiar ya: el hilo escritor no debe ver cambios posteriores.
+            # El archivo incluye el hash de la contraseña: to_dict() lo omite
+            record = None if deferred_only else self._record()
+            deltas = _counter_deltas.pop(self.id, {})
+            args = (self.id, record, durable, deltas, self.last_login)
+            try:
+                return _user_writer.submit(_write_user_file, *args)
+            except RuntimeError:
+                # El intérprete se está cerrando y _user_writer ya ha
+                # terminado (flush_users desde atexit): escribir aquí
+                future: Future = Future()
+                _write_user_file(*args)
+                future.set_result(None)
+                return future
     
     @classmethod
     def get(cls, user_id: str) -> Optional['User']:
@@ -180,8 +551,7 @@ class User(UserMixin):
         Returns:
             Optional[User]: Usuario o None si no existe
         """
-        users = cls.load_all()
-        return users.get(user_id)
+        return cls._cached_users().get(user_id)
     
     @classmethod
     def get_by_email(cls, email: str) -> Optional['User']:
@@ -194,11 +564,9 @@ class User(UserMixin):
         Returns:
             Optional[User]: Usuario o None si no existe
         """
-        users = cls.load_all()
-        for user in users.values():
-            if user.email == email:
-                return user
-        return None
+        user = cls._cached_users().get(_users_by_email.get(email, ""))
+        # El objeto puede haberse modificado sin guardar después de indexarlo
+        return user if user is not None and user.email == email else None
     
     @classmethod
     def get_by_api_key(cls, api_key: str) -> Optional['User']:
@@ -211,11 +579,8 @@ class User(UserMixin):
         Returns:
             Optional[User]: Usuario o None si no existe
         """
-        users = cls.load_all()
-        for user in users.values():
-            if user.api_key == api_key:
-                return user
-        return None
+        user = cls._cached_users().get(_users_by_api_key.get(api_key, ""))
+        return user if user is not None and user.api_key == api_key else None
     
     @classmethod
     def load_all(cls) -> Dict[str, 'User']:
@@ -223,33 +588,268 @@ class User(UserMixin):
         Carga todos los usuarios.
         
         Returns:
-            Dict[str, User]: Diccionario de usuarios
+            Dict[str, User]: Diccionario de usuarios (copia modificable)
+        """
+        return dict(cls._cached_users())
+    
+    @classmethod
+    def _cached_users(cls) -> Dict[str, 'User']:
         """
+        Obtiene los usuarios de la caché en memoria.
+        
+        USERS_DIR solo se vuelve a listar si su mtime ha cambiado desde la
+        última carga, y solo se parsean los archivos nuevos o modificados.
+        Mientras la caché está al día no se adquiere el lock, de modo que
+        las consultas no esperan a las escrituras en curso.
+        
+        Returns:
+            Dict[str, User]: Diccionario de usuarios compartido (no modificar)
+        """
+        global _users_dir_version
         try:
-            with open(os.path.join(DATA_DIR, "users.json"), "r") as f:
-                users_data = json.load(f)
-                
-            users = {}
-            for uid, data in users_data.items():
-                users[uid] = cls(**data)
-            return users
+            if os.stat(USERS_DIR).st_mtime_ns == _users_dir_version:
+                return _users_cache
         except FileNotFoundError:
-            return {}
+            pass
+        
+        with _users_lock:
+            try:
+                version = os.stat(USERS_DIR).st_mtime_ns
+            except FileNotFoundError:
+                _migrate_users_file()
+                version = os.stat(USERS_DIR).st_mtime_ns
+            if version == _users_dir_version:
+                return _users_cache
+            
+            seen = set()
+            for entry in os.scandir(USERS_DIR):
+                if not entry.name.endswith(".json"):
+                    continue
+                uid = entry.name[:-len(".json")]
+                seen.add(uid)
+                if uid in _dirty_users or uid in _writing_users:
+                    # Los cambios pendientes en memoria son más recientes
+                    continue
+                file_version = _file_version(entry.stat())
+                if _users_file_versions.get(uid) == file_version:
+                    continue
+                try:
+                    with open(entry.path, "rb") as f:
+                        user = cls(**loads(f.read()))
+                except Exception as e:
+                    logger.error(f"Error al cargar usuario {uid}: {e}")
+                    continue
+                _users_cache[uid] = user
+                _users_file_versions[uid] = file_version
+                _index_user(user)
+            
+            # Usuarios cuyo archivo se ha eliminado
+            for uid in [
+                uid for uid in _users_cache
+                if uid not in seen and uid not in _dirty_users and uid not in _writing_users
+            ]:
+                del _users_cache[uid]
+                _users_file_versions.pop(uid, None)
+                _unindex_user(uid)
+            
+            _users_dir_version = version
+            return _users_cache
+
+def flush_users() -> None:
+    """Escribe en disco los cambios de usuarios pendientes."""
+    with _users_lock:
+        dirty = [_users_cache[uid] for uid in _dirty_users if uid in _users_cache]
+        _dirty_users.clear()
+        # Cambios no críticos: sin fsync ni esperar a la escritura
+        for user in dirty:
+            user._submit_write(durable=False, deferred_only=True)
+
+def _flush_timer_fired() -> None:
+    """Vacía los cambios pendientes al vencer el temporizador."""
+    global _flush_timer
+    with _users_lock:
+        _flush_timer = None
+    flush_users()
+
+# No perder los cambios pendientes al cerrar el proceso
+atexit.register(flush_users)
+
+# Sufijos de los archivos de cada documento: metadatos y HTML en bruto
+DOCUMENT_META_SUFFIX = ".meta.json"
+DOCUMENT_HTML_SUFFIXES = {"original": ".orig.html", "processed": ".proc.html"}
+# Índice por usuario con una línea de metadatos por documento, en orden de
+# creación: los listados leen solo este archivo
+DOCUMENT_INDEX_FILE = "index.jsonl"
+
+# Los HTML de más de DOCUMENT_COMPRESS_MIN_BYTES se guardan comprimidos (zstd
+# o, si no está instalado, zlib) en <ruta del HTML> + COMPRESSED_SUFFIX
+DOCUMENT_COMPRESS_MIN_BYTES = 4096
+COMPRESSED_SUFFIX = ".z"
+_ZSTD_LEVEL = 3
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def _compress_html(data: bytes) -> bytes:
+    """Comprime un HTML codificado en UTF-8 (zstd o, si no, zlib)."""
+    if zstandard is not None:
+        return zstandard.compress(data, _ZSTD_LEVEL)
+    return zlib.compress(data)
+
+def _decompress_html(data: bytes) -> str:
+    """
+    Recupera un HTML guardado con _compress_html.
+    
+    Args:
+        data: Bytes comprimidos
+        
+    Returns:
+        str: HTML
+        
+    Raises:
+        ValueError: Si está comprimido con zstd y zstandard no está instalado
+    """
+    if data.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError("HTML comprimido con zstd: instala zstandard para leerlo")
+        return zstandard.decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
+
+def _documents_dir(user_id: str) -> str:
+    """Directorio de los documentos de un usuario."""
+    return os.path.join(DATA_DIR, "documents", user_id)
+
+# Escritura de documentos en segundo plano: tamaño máximo de la cola,
+# documentos por lote y segundos que se espera a completar un lote
+DOCUMENT_QUEUE_SIZE = 1024
+DOCUMENT_BATCH_SIZE = 64
+DOCUMENT_FLUSH_INTERVAL = 0.05
+# Segundos de espera con la cola llena antes de escribir en el propio hilo
+DOCUMENT_QUEUE_TIMEOUT = 1.0
+
+_document_queue: "queue.Queue[ProcessedDocument]" = queue.Queue(maxsize=DOCUMENT_QUEUE_SIZE)
+# Documentos encolados que aún no están en disco, por ID
+_pending_documents: Dict[str, "ProcessedDocument"] = {}
+_pending_lock = threading.Lock()
+_document_writer: Optional[threading.Thread] = None
+
+def _append_to_index(user_id: str, payloads: List[bytes]) -> None:
+    """
+    Añade documentos al índice de un usuario con una sola escritura.
+    
+    Args:
+        user_id: ID del usuario
+        payloads: Metadatos serializados de cada documento
+    """
+    user_dir = _documents_dir(user_id)
+    index_path = os.path.join(user_dir, DOCUMENT_INDEX_FILE)
+    if not os.path.exists(index_path):
+        # Incluye los documentos recién guardados
+        ProcessedDocument._rebuild_index(user_id)
+        return
+    
+    # Un solo write() en modo append: no se intercalan escrituras de otros
+    # procesos
+    with open(index_path, "a+b", buffering=0) as f:
+        # Si una escritura anterior quedó a medias, empezar en una línea
+        # nueva para no corromper estas entradas
+        prefix = b""
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                prefix = b"\n"
+        f.write(prefix + b"".join(payload + b"\n" for payload in payloads))
+
+def _save_documents(docs: List["ProcessedDocument"]) -> None:
+    """
+    Guarda varios documentos, con una escritura del índice por usuario.
+    
+    Args:
+        docs: Documentos a guardar
+    """
+    by_user: Dict[str, List[bytes]] = {}
+    for doc in docs:
+        payload = doc._write_files()
+        if payload is not None:
+            by_user.setdefault(doc.user_id, []).append(payload)
+    
+    for user_id, payloads in by_user.items():
+        try:
+            _append_to_index(user_id, payloads)
+        except Exception as e:
+            logger.error(f"Error al actualizar el índice de documentos: {e}")
+
+def _document_writer_loop() -> None:
+    """Hilo que agrupa y escribe en disco los documentos encolados."""
+    while True:
+        batch = [_document_queue.get()]
+        deadline = time.monotonic() + DOCUMENT_FLUSH_INTERVAL
+        while len(batch) < DOCUMENT_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_document_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        
+        try:
+            _save_documents(batch)
         except Exception as e:
-            logger.error(f"Error al cargar usuarios: {e}")
-            return {}
+            logger.error(f"Error al guardar documentos: {e}")
+        finally:
+            with _pending_lock:
+                for doc in batch:
+                    _pending_documents.pop(doc.id, None)
+            for _ in batch:
+                _document_queue.task_done()
+
+def _enqueue_document(doc: "ProcessedDocument") -> None:
+    """
+    Encola un documento para guardarlo en segundo plano.
+    
+    Si la cola sigue llena tras DOCUMENT_QUEUE_TIMEOUT segundos, el
+    documento se guarda en el hilo actual.
+    
+    Args:
+        doc: Documento a guardar
+    """
+    global _document_writer
+    with _pending_lock:
+        if _document_writer is None:
+            _document_writer = threading.Thread(
+                target=_document_writer_loop, name="document-writer", daemon=True
+            )
+            _document_writer.start()
+        _pending_documents[doc.id] = doc
+    try:
+        _document_queue.put(doc, timeout=DOCUMENT_QUEUE_TIMEOUT)
+    except queue.Full:
+        doc.save()
+        with _pending_lock:
+            _pending_documents.pop(doc.id, None)
+
+@atexit.register
+def flush_documents() -> None:
+    """Espera a que se guarden los documentos encolados."""
+    if _document_writer is not None:
+        _document_queue.join()
 
-@dataclass
+@dataclass(slots=True)
 class ProcessedDocument:
-    """Documento procesado."""
+    """
+    Documento procesado.
+    
+    Los metadatos se guardan en <id>.meta.json y cada HTML en su propio
+    archivo, que solo se lee al acceder a original_html o processed_html.
+    """
     id: str
     user_id: str
-    original_html: str
-    processed_html: str
     task: str
     model: str
     stats: Dict[str, Any]
     created_at: float = field(default_factory=time.time)
+    _original_html: Optional[str] = field(default=None, repr=False)
+    _processed_html: Optional[str] = field(default=None, repr=False)
     
     @classmethod
     def create(
@@ -279,23 +879,76 @@ class ProcessedDocument:
         doc = cls(
             id=doc_id,
             user_id=user_id,
-            original_html=original_html,
-            processed_html=processed_html,
             task=task,
             model=model,
-            stats=stats
+            stats=stats,
+            _original_html=original_html,
+            _processed_html=processed_html
         )
-        doc.save()
+        # La escritura se hace en segundo plano: get() y get_for_user() ya
+        # ven el documento mientras está pendiente
+        _enqueue_document(doc)
         
         # Actualizar estadísticas del usuario
         user = User.get(user_id)
         if user:
-            user.documents_processed += 1
-            user.total_tokens += stats.get("total_tokens_in", 0) + stats.get("total_tokens_out", 0)
-            user.save()
+            user.record_document(stats.get("total_tokens_in", 0) + stats.get("total_tokens_out", 0))
             
         return doc
     
+    @property
+    def original_html(self) -> str:
+        """HTML original (se lee del disco al primer acceso)."""
+        if self._original_html is None:
+            self._original_html = self._read_html("original")
+        return self._original_html
+    
+    @property
+    def processed_html(self) -> str:
+        """HTML procesado (se lee del disco al primer acceso)."""
+        if self._processed_html is None:
+            self._processed_html = self._read_html("processed")
+        return self._processed_html
+    
+    def html_path(self, kind: str) -> str:
+        """
+        Obtiene la ruta del archivo con uno de los HTML del documento.
+        
+        Args:
+            kind: "original" o "processed"
+            
+        Returns:
+            str: Ruta del archivo
+        """
+        return os.path.join(_documents_dir(self.user_id), self.id + DOCUMENT_HTML_SUFFIXES[kind])
+    
+    def _read_html(self, kind: str) -> str:
+        """Lee uno de los HTML del documento, comprimido o no."""
+        path = self.html_path(kind)
+        try:
+            with open(path + COMPRESSED_SUFFIX, "rb") as f:
+                return _decompress_html(f.read())
+        except FileNotFoundError:
+            pass
+        with open(path, "rb") as f:
+            return f.read().decode("utf-8")
+    
+    def metadata(self) -> Dict[str, Any]:
+        """
+        Obtiene los metadatos del documento (sin los HTML).
+        
+        Returns:
+            Dict[str, Any]: Diccionario con los metadatos
+        """
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "task": self.task,
+            "model": self.model,
+            "stats": self.stats,
+            "created_at": self.created_at
+        }
+    
     def to_dict(self) -> Dict[str, Any]:
         """
         Convierte el documento a diccionario.
@@ -303,21 +956,70 @@ class ProcessedDocument:
         Returns:
             Dict[str, Any]: Diccionario con los datos del documento
         """
-        data = asdict(self)
+        data = self.metadata()
+        data["original_html"] = self.original_html
+        data["processed_html"] = self.processed_html
         return data
     
     def save(self) -> None:
         """Guarda el documento en el almacenamiento."""
+        _save_documents([self])
+    
+    def _write_files(self) -> Optional[bytes]:
+        """
+        Escribe los archivos del documento (sin actualizar el índice).
+        
+        Returns:
+            Optional[bytes]: Metadatos serializados para el índice, o None
+                si no se pudo guardar
+        """
         # Crear directorio para documentos del usuario si no existe
-        user_dir = os.path.join(DATA_DIR, "documents", self.user_id)
+        user_dir = _documents_dir(self.user_id)
         os.makedirs(user_dir, exist_ok=True)
         
-        # Guardar documento
+        # Guardar documento: primero los HTML, de modo que un documento con
+        # metadatos esté siempre completo. Las escrituras son atómicas: un
+        # lector nunca ve un archivo a medias, aunque el proceso muera
         try:
-            with open(os.path.join(user_dir, f"{self.id}.json"), "w") as f:
-                json.dump(self.to_dict(), f)
+            for kind, html in (("original", self.original_html), ("processed", self.processed_html)):
+                path = self.html_path(kind)
+                data = html.encode("utf-8")
+                if len(data) >= DOCUMENT_COMPRESS_MIN_BYTES:
+                    path, stale = path + COMPRESSED_SUFFIX, path
+                    data = _compress_html(data)
+                else:
+                    stale = path + COMPRESSED_SUFFIX
+                _write_atomic(path, data)
+                # Al volver a guardar, no dejar la otra variante
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(stale)
+            payload = dumps(self.metadata())
+            _write_atomic(os.path.join(user_dir, self.id + DOCUMENT_META_SUFFIX), payload)
+            return payload
         except Exception as e:
             logger.error(f"Error al guardar documento: {e}")
+            return None
+    
+    @classmethod
+    def _from_file(cls, file_path: str) -> 'ProcessedDocument':
+        """
+        Carga un documento a partir de su archivo de metadatos.
+        
+        Los documentos guardados por versiones anteriores (<id>.json, con
+        los HTML dentro del JSON) se cargan igualmente.
+        
+        Args:
+            file_path: Ruta de <id>.meta.json o del <id>.json antiguo
+            
+        Returns:
+            ProcessedDocument: Documento cargado
+        """
+        with open(file_path, "rb") as f:
+            data = loads(f.read())
+        if "original_html" in data:
+            data["_original_html"] = data.pop("original_html")
+            data["_processed_html"] = data.pop("processed_html")
+        return cls(**data)
     
     @classmethod
     def get(cls, doc_id: str, user_id: str) -> Optional['ProcessedDocument']:
@@ -331,24 +1033,50 @@ class ProcessedDocument:
         Returns:
             Optional[ProcessedDocument]: Documento o None si no existe
         """
+        with _pending_lock:
+            doc = _pending_documents.get(doc_id)
+        if doc is not None and doc.user_id == user_id:
+            return doc
+        
         try:
-            file_path = os.path.join(DATA_DIR, "documents", user_id, f"{doc_id}.json")
-            if not os.path.exists(file_path):
-                return None
-                
-            with open(file_path, "r") as f:
-                data = json.load(f)
-                
-            return cls(**data)
+            user_dir = _documents_dir(user_id)
+            for file_path in (
+                os.path.join(user_dir, doc_id + DOCUMENT_META_SUFFIX),
+                os.path.join(user_dir, f"{doc_id}.json")
+            ):
+                if os.path.exists(file_path):
+                    return cls._from_file(file_path)
+            return None
         except Exception as e:
             logger.error(f"Error al cargar documento: {e}")
             return None
     
+    @classmethod
+    def _rebuild_index(cls, user_id: str) -> None:
+        """
+        Reconstruye el índice de documentos de un usuario a partir de sus
+        archivos de metadatos (documentos anteriores al índice).
+        
+        Args:
+            user_id: ID del usuario
+        """
+        user_dir = _documents_dir(user_id)
+        docs = [
+            cls._from_file(entry.path)
+            for entry in os.scandir(user_dir) if entry.name.endswith(".json")
+        ]
+        docs.sort(key=lambda d: d.created_at)
+        payload = b"".join(dumps(doc.metadata()) + b"\n" for doc in docs)
+        _write_atomic(os.path.join(user_dir, DOCUMENT_INDEX_FILE), payload)
+    
     @classmethod
     def get_for_user(cls, user_id: str, limit: int = 10) -> List['ProcessedDocument']:
         """
         Obtiene los documentos de un usuario.
         
+        Solo se lee el índice del usuario: los HTML no se leen hasta que se
+        accede a ellos.
+        
         Args:
             user_id: ID del usuario
             limit: Límite de documentos a obtener
@@ -356,21 +1084,44 @@ class ProcessedDocument:
         Returns:
             List[ProcessedDocument]: Lista de documentos
         """
+        with _pending_lock:
+            pending = [doc for doc in _pending_documents.values() if doc.user_id == user_id]
+        
         try:
-            user_dir = os.path.join(DATA_DIR, "documents", user_id)
-            if not os.path.exists(user_dir):
-                return []
-                
             docs = []
-            for filename in os.listdir(user_dir)[:limit]:
-                if filename.endswith(".json"):
-                    with open(os.path.join(user_dir, filename), "r") as f:
-                        data = json.load(f)
-                        docs.append(cls(**data))
+            indexed: Set[str] = set()
+            user_dir = _documents_dir(user_id)
+            if os.path.exists(user_dir):
+                index_path = os.path.join(user_dir, DOCUMENT_INDEX_FILE)
+                if not os.path.exists(index_path):
+                    cls._rebuild_index(user_id)
+                
+                # El índice está en orden de creación: basta con las últimas
+                # líneas. Si se reconstruye mientras el hilo escritor guarda un
+                # lote, las entradas de ese lote pueden quedar duplicadas: se
+                # leen DOCUMENT_BATCH_SIZE líneas más y se descartan los ids
+                # repetidos
+                with open(index_path, "rb") as f:
+                    lines = deque(f, maxlen=limit + DOCUMENT_BATCH_SIZE)
+                for line in reversed(lines):
+                    if len(docs) >= limit:
+                        break
+                    try:
+                        doc = cls(**loads(line))
+                    except (ValueError, TypeError):
+                        # Línea truncada por una escritura interrumpida
+                        logger.warning(f"Entrada no válida en el índice de documentos de {user_id}")
+                        continue
+                    if doc.id not in indexed:
+                        indexed.add(doc.id)
+                        docs.append(doc)
+            
+            # Documentos que aún están en la cola de escritura
+            docs.extend(doc for doc in pending if doc.id not in indexed)
                         
             # Ordenar por fecha de creación (más recientes primero)
             docs.sort(key=lambda d: d.created_at, reverse=True)
-            return docs
+            return docs[:limit]
         except Exception as e:
             logger.error(f"Error al cargar documentos: {e}")
-            return [] 
\ No newline at end of file
+            return []
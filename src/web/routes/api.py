@@ -3,7 +3,8 @@ Rutas de la API REST.
 """
 
 import functools
-from flask import Blueprint, request, jsonify, current_app
+import os
+from flask import Blueprint, request, jsonify, current_app, send_file, Response
 from werkzeug.exceptions import BadRequest, Unauthorized, Forbidden
 
 from ...models import ProcessingOptions
@@ -25,8 +26,7 @@ def require_api_key(f):
             return jsonify({"error": "Invalid API key"}), 401
             
         # Verificar si el plan permite uso de API
-        plan = user.get_plan_config()
-        if user.subscription_plan == "free" or user.subscription_plan == "basic":
+        if not user.has_api_access:
             return jsonify({"error": "Your subscription plan does not include API access"}), 403
             
         # Pasar el usuario a la función
@@ -167,4 +167,36 @@ def get_document(user, doc_id):
         
     except Exception as e:
         current_app.logger.error(f"API error: {str(e)}")
-        return jsonify({"error": "Internal server error"}), 500 
\ No newline at end of file
+        return jsonify({"error": "Internal server error"}), 500
+
+@api_bp.route('/documents/<doc_id>/<kind>', methods=['GET'])
+@require_api_key
+def get_document_html(user, doc_id, kind):
+    """Obtener el HTML original o procesado de un documento, sin envolverlo en JSON."""
+    try:
+        if kind not in ('original', 'processed'):
+            return jsonify({"error": "Invalid kind"}), 404
+            
+        # Obtener documento
+        doc = ProcessedDocument.get(doc_id, user.id)
+        if not doc:
+            return jsonify({"error": "Document not found"}), 404
+            
+        # Servir el archivo directamente si está sin comprimir; los HTML
+        # grandes se guardan comprimidos y los documentos antiguos dentro
+        # del JSON
+        path = doc.html_path(kind)
+        if os.path.exists(path):
+            response = send_file(path, mimetype='text/html')
+        else:
+            html = doc.original_html if kind == 'original' else doc.processed_html
+            response = Response(html, mimetype='text/html')
+        # El HTML lo ha subido el usuario: abierto en el navegador no debe
+        # ejecutar scripts con el origen de la aplicación
+        response.headers['Content-Security-Policy'] = 'sandbox'
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        return response
+        
+    except Exception as e:
+        current_app.logger.error(f"API error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
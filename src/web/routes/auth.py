@@ -4,7 +4,6 @@ Rutas de autenticación de la aplicación web.
 
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash
 
 from ..forms import LoginForm, RegisterForm, ProfileForm, PasswordChangeForm
 from ..models import User
@@ -98,7 +97,7 @@ def change_password():
             flash('Contraseña actual incorrecta', 'danger')
             return render_template('auth/change_password.html', form=form)
             
-        current_user.password_hash = generate_password_hash(form.new_password.data)
+        current_user.set_password(form.new_password.data)
         current_user.save()
         
         flash('Contraseña actualizada correctamente', 'success')
@@ -2,18 +2,28 @@
 Rutas principales de la aplicación web.
 """
 
-import os
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 
 from ...models import ProcessingOptions
 from ...pipeline import process_html
 from ..forms import HTMLProcessForm
-from ..models import ProcessedDocument
+from ..models import ProcessedDocument, PLAN_CONFIG, SubscriptionPlan
+from ..utils import read_upload, UploadTooLargeError
 
 main_bp = Blueprint('main', __name__)
 
+# Planes de suscripción en el orden en que se muestran (PLAN_CONFIG es constante)
+_PLANS = [
+    {"id": plan, "config": PLAN_CONFIG[plan]}
+    for plan in (
+        SubscriptionPlan.FREE,
+        SubscriptionPlan.BASIC,
+        SubscriptionPlan.PRO,
+        SubscriptionPlan.ENTERPRISE
+    )
+]
+
 @main_bp.route('/')
 def index():
     """Página principal."""
@@ -51,17 +61,16 @@ def process():
         # Obtener HTML
         html_content = ""
         if form.html_file.data:
-            # Guardar archivo temporalmente
-            filename = secure_filename(form.html_file.data.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            form.html_file.data.save(filepath)
-            
-            # Leer contenido
-            with open(filepath, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-                
-            # Eliminar archivo temporal
-            os.remove(filepath)
+            # Leer el archivo por bloques, cortando en el límite del plan
+            max_bytes = int(current_user.get_plan_config()["max_size_kb"] * 1024)
+            try:
+                html_content = read_upload(form.html_file.data, max_bytes)
+            except UploadTooLargeError:
+                flash('Has excedido los límites de tu plan de suscripción', 'danger')
+                return render_template('process.html', form=form)
+            except UnicodeDecodeError:
+                flash('El archivo HTML debe estar codificado en UTF-8', 'danger')
+                return render_template('process.html', form=form)
         else:
             html_content = form.html_text.data
         
@@ -126,25 +135,4 @@ def documents():
 @main_bp.route('/plans')
 def plans():
     """Ver planes de suscripción."""
-    from ..models import PLAN_CONFIG, SubscriptionPlan
-    
-    plans = [
-        {
-            "id": SubscriptionPlan.FREE,
-            "config": PLAN_CONFIG[SubscriptionPlan.FREE]
-        },
-        {
-            "id": SubscriptionPlan.BASIC,
-            "config": PLAN_CONFIG[SubscriptionPlan.BASIC]
-        },
-        {
-            "id": SubscriptionPlan.PRO,
-            "config": PLAN_CONFIG[SubscriptionPlan.PRO]
-        },
-        {
-            "id": SubscriptionPlan.ENTERPRISE,
-            "config": PLAN_CONFIG[SubscriptionPlan.ENTERPRISE]
-        }
-    ]
-    
-    return render_template('plans.html', plans=plans) 
\ No newline at end of file
+    return render_template('plans.html', plans=_PLANS) 
\ No newline at end of file
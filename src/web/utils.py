@@ -2,21 +2,41 @@
 Utilidades para la aplicación web.
 """
 
-from urllib.parse import urlparse
-from flask import url_for, redirect
+import codecs
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import urljoin, urlparse
+from flask import url_for, redirect, request
+from werkzeug.datastructures import FileStorage
+
+# Tamaño de los bloques leídos de un archivo subido
+UPLOAD_CHUNK_SIZE = 1 << 16
+
+class UploadTooLargeError(ValueError):
+    """El archivo subido supera el tamaño máximo permitido."""
+
+@lru_cache(maxsize=32)
+def _host_netloc(host_url: str) -> str:
+    """Host de la URL base de la aplicación (hay pocas distintas)."""
+    return urlparse(host_url).netloc
 
 def is_safe_url(target):
     """
     Verifica si una URL es segura para redireccionar.
     
+    Solo se aceptan URLs HTTP(S) del mismo host que la petición actual.
+    
     Args:
         target: URL a verificar
         
     Returns:
         bool: True si es segura
     """
-    ref_url = urlparse(target)
-    return not ref_url.netloc and ref_url.scheme == ''
+    if not target:
+        return False
+    # Los navegadores tratan "\" como "/": "/\evil.com" iría a otro host
+    ref_url = urlparse(urljoin(request.host_url, target.replace("\\", "/")))
+    return ref_url.scheme in ("http", "https") and ref_url.netloc == _host_netloc(request.host_url)
 
 def redirect_next(target, default):
     """
@@ -29,6 +49,44 @@ def redirect_next(target, default):
     Returns:
         Response: Respuesta de redirección
     """
-    if target and is_safe_url(target):
+    if is_safe_url(target):
         return redirect(target)
-    return redirect(url_for(default)) 
\ No newline at end of file
+    return redirect(url_for(default))
+
+def read_upload(
+    file: FileStorage,
+    max_bytes: Optional[int] = None,
+    encoding: str = "utf-8"
+) -> str:
+    """
+    Lee y decodifica un archivo subido por bloques.
+
+    El archivo se lee directamente del stream de la subida, sin copiarlo a
+    disco, y la lectura se corta en cuanto supera max_bytes o contiene bytes
+    no válidos para la codificación.
+
+    Args:
+        file: Archivo subido
+        max_bytes: Tamaño máximo en bytes (opcional)
+        encoding: Codificación del archivo
+
+    Returns:
+        str: Contenido decodificado
+
+    Raises:
+        UploadTooLargeError: Si el archivo supera max_bytes
+        UnicodeDecodeError: Si el archivo no está en la codificación indicada
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    parts = []
+    size = 0
+    while True:
+        chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise UploadTooLargeError(f"El archivo supera {max_bytes} bytes")
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
@@ -0,0 +1,41 @@
+"""
+Pruebas del extractor de texto.
+"""
+
+import pytest
+
+from src.core.extractor import _extract_lxml, _strip_raw_text, extract_text_nodes
+
+def _texts(html: str) -> list:
+    return [chunk.text for chunk in extract_text_nodes(html)]
+
+def test_strip_raw_text_empties_scripts_and_styles():
+    html = "<p>Hola</p><script>var x = '<p>no</p>';</script><style>p{}</style>"
+    assert _strip_raw_text(html) == "<p>Hola</p><script></script><style></style>"
+
+def test_script_inside_comment_does_not_hide_text():
+    html = (
+        "<body><!-- <script> --><p>Hello world</p>"
+        "<script>var x=1;</script><p>Second para</p>"
+    )
+    assert _texts(html) == ["Hello world", "Second para"]
+
+def test_custom_element_with_script_prefix_is_kept():
+    html = (
+        "<script-loader>Custom text here</script-loader>"
+        "<p>After it</p><script>x</script>"
+    )
+    assert _texts(html) == ["Custom text here", "After it"]
+
+@pytest.mark.parametrize("html", [
+    "<body><!-- <script> --><p>Hello world</p><script>var x=1;</script><p>Second para</p>",
+    "<script-loader>Custom text here</script-loader><p>After it</p><script>x</script>",
+    "<p>Uno dos</p><!--><script>x</script><p>Tres cuatro</p>",
+    "<p>Uno dos</p><!-- sin cerrar <script>x</script><p>Tres cuatro</p>",
+    "<p>Uno dos</p><SCRIPT type=x>a</script ><style/>b</style><p>Tres cuatro</p>",
+    "<div><style>p { color: red }</style><p>Texto visible</p></div>",
+])
+def test_strip_raw_text_does_not_change_extraction(html):
+    # Vaciar scripts y estilos no debe alterar lo que extrae el parser
+    expected = [(c.text, c.path) for c in _extract_lxml(html, 2)]
+    assert [(c.text, c.path) for c in extract_text_nodes(html)] == expected
@@ -0,0 +1,98 @@
+"""
+Pruebas de la agrupación de chunks en peticiones por lotes.
+"""
+
+import asyncio
+import json
+
+from src.llm.openai_client import OpenAIClient
+from src.models import ProcessingOptions, TextChunk
+from src.pipeline import BATCH_ITEM_OVERHEAD_TOKENS, _dispatch_chunks, _make_batches
+
+class _PlainClient:
+    """Cliente falso sin modo JSON: responde el texto en mayúsculas."""
+
+    def __init__(self, drop_ids=()):
+        self.requests = []
+        self.drop_ids = set(drop_ids)
+
+    def get_model_name(self) -> str:
+        return "fake-model"
+
+    def get_token_count(self, text: str) -> int:
+        return len(text.split())
+
+    async def achat(self, messages, use_cache=True, **params):
+        self.requests.append((messages, params))
+        content = messages[-1].content
+        if "response_format" in params:
+            payload = json.loads(content.split("\n", 1)[1])
+            return json.dumps({"items": [
+                {"id": item["id"], "text": item["text"].upper()}
+                for item in payload["items"] if item["id"] not in self.drop_ids
+            ]})
+        return content.split(" ", 1)[1].upper() if " " in content else content.upper()
+
+class _JSONClient(_PlainClient, OpenAIClient):
+    """Cliente falso con el modo JSON de OpenAI."""
+
+def _chunks(*texts, is_rtl=False):
+    return [TextChunk(text=text, path=f"p:nth-of-type({i})", is_rtl=is_rtl) for i, text in enumerate(texts)]
+
+def _dispatch(llm, chunks, **options):
+    stats = {"total_tokens_in": 0, "total_tokens_out": 0, "errors": 0, "chunks_processed": 0}
+    opts = ProcessingOptions(task="custom", extra_prompt="Procesa:", use_cache=False, **options)
+    result = asyncio.run(_dispatch_chunks(chunks, llm, opts, stats, asyncio.Semaphore(4)))
+    return result, stats
+
+def test_make_batches_limits_count_and_tokens():
+    chunks = _chunks("a", "b", "c", "d", "e")
+    by_count = _make_batches(chunks, 2, [1] * 5, 10_000)
+    assert [[i for i, _ in batch] for batch in by_count] == [[0, 1], [2, 3], [4]]
+
+    # Cada chunk ocupa 40 + la envoltura: caben dos por lote
+    budget = 2 * (40 + BATCH_ITEM_OVERHEAD_TOKENS)
+    by_tokens = _make_batches(chunks, 16, [40] * 5, budget)
+    assert [[i for i, _ in batch] for batch in by_tokens] == [[0, 1], [2, 3], [4]]
+
+def test_make_batches_keeps_oversized_chunk_alone():
+    chunks = _chunks("a", "b", "c")
+    batches = _make_batches(chunks, 16, [5, 500, 5], 100)
+    assert [[i for i, _ in batch] for batch in batches] == [[0], [1], [2]]
+
+def test_make_batches_separates_rtl():
+    chunks = _chunks("a", "b") + _chunks("c", is_rtl=True) + _chunks("d")
+    batches = _make_batches(chunks, 16, [1] * 4, 10_000)
+    assert sorted([i for i, _ in batch] for batch in batches) == [[0, 1, 3], [2]]
+
+def test_json_client_sends_one_request_per_batch():
+    llm = _JSONClient()
+    result, stats = _dispatch(llm, _chunks("uno dos", "tres cuatro", "cinco seis"))
+    assert len(llm.requests) == 1
+    assert llm.requests[0][1]["response_format"] == {"type": "json_object"}
+    assert [c.text for c in result] == ["UNO DOS", "TRES CUATRO", "CINCO SEIS"]
+    assert stats["chunks_processed"] == 3 and stats["errors"] == 0
+
+def test_batches_are_split_by_max_tokens():
+    llm = _JSONClient()
+    texts = [" ".join(["palabra"] * 30) for _ in range(6)]
+    result, _ = _dispatch(llm, _chunks(*texts), max_tokens=2 * (30 + BATCH_ITEM_OVERHEAD_TOKENS))
+    assert len(llm.requests) == 3
+    assert [c.text for c in result] == [text.upper() for text in texts]
+
+def test_missing_items_fall_back_to_single_requests():
+    llm = _JSONClient(drop_ids={1})
+    result, stats = _dispatch(llm, _chunks("uno dos", "tres cuatro", "cinco seis"))
+    # El lote y una petición individual para el elemento ausente
+    assert len(llm.requests) == 2
+    assert "response_format" not in llm.requests[1][1]
+    assert [c.text for c in result] == ["UNO DOS", "TRES CUATRO", "CINCO SEIS"]
+    assert stats["chunks_processed"] == 3
+
+def test_client_without_json_mode_is_not_batched():
+    llm = _PlainClient()
+    result, stats = _dispatch(llm, _chunks("uno dos", "tres cuatro", "cinco seis"))
+    assert len(llm.requests) == 3
+    assert all("response_format" not in params for _, params in llm.requests)
+    assert [c.text for c in result] == ["UNO DOS", "TRES CUATRO", "CINCO SEIS"]
+    assert stats["errors"] == 0
@@ -0,0 +1,62 @@
+"""
+Pruebas de los reintentos de las peticiones al LLM.
+"""
+
+import asyncio
+
+import pytest
+
+from src import pipeline
+from src.llm.errors import LLMError, RateLimitError, RetryError
+from src.llm.retry import retry_with_backoff
+from src.models import ProcessingOptions
+
+class _FailingClient:
+    """Cliente falso: lanza `error` en las primeras `failures` llamadas y luego responde."""
+
+    def __init__(self, error: Exception, failures: int = 1_000):
+        self.error = error
+        self.failures = failures
+        self.calls = 0
+
+    def get_model_name(self) -> str:
+        return "fake-model"
+
+    @retry_with_backoff(max_retries=3, initial_delay=0, max_delay=0)
+    async def achat(self, messages, use_cache=True, **params):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(pipeline, "backoff_delay", lambda *args, **kwargs: 0.0)
+
+def _chat(llm):
+    options = ProcessingOptions(task="custom", use_cache=False)
+    return asyncio.run(pipeline._chat_with_retries(
+        llm, [], options, asyncio.Semaphore(1), "prueba"
+    ))
+
+def test_persistent_rate_limit_is_retried_only_by_the_pipeline():
+    llm = _FailingClient(RateLimitError("429", retry_after=0))
+    assert _chat(llm) is None
+    assert llm.calls == pipeline.MAX_RETRY_ATTEMPTS
+
+def test_transient_error_is_retried_by_the_pipeline():
+    llm = _FailingClient(LLMError("Error de conexión"), failures=1)
+    assert _chat(llm) == "ok"
+    assert llm.calls == 2
+
+def test_client_retries_when_called_directly():
+    llm = _FailingClient(RateLimitError("429", retry_after=0))
+    with pytest.raises(RateLimitError):
+        asyncio.run(llm.achat([]))
+    assert llm.calls == 4
+
+def test_no_client_retries_with_max_retries_zero():
+    llm = _FailingClient(LLMError("Error de conexión"))
+    with pytest.raises(RetryError):
+        asyncio.run(llm.achat([], max_retries=0))
+    assert llm.calls == 1
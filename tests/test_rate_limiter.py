@@ -0,0 +1,31 @@
+"""
+Pruebas del limitador de tasa del cliente.
+"""
+
+from src.llm import rate_limiter
+from src.llm.rate_limiter import TIER1_RATE_LIMITS, CostAwareLimiter, _limits_from_env
+
+def test_limits_are_opt_in(monkeypatch):
+    monkeypatch.delenv("LLM_RATE_LIMITS", raising=False)
+    assert _limits_from_env() == {}
+
+def test_limits_from_env(monkeypatch):
+    monkeypatch.setenv("LLM_RATE_LIMITS", "tier1, gpt-4o=5000:800000,roto,local=1:x")
+    limits = _limits_from_env()
+    assert limits["gpt-4o"] == (5000, 800_000)
+    assert limits["gemini"] == TIER1_RATE_LIMITS["gemini"]
+    assert "roto" not in limits and "local" not in limits
+
+def test_unconfigured_model_is_not_limited(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "MODEL_RATE_LIMITS", {})
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    assert rate_limiter.get_rate_limiter("gpt-4o") is None
+
+def test_request_larger_than_tpm_waits_for_empty_window():
+    limiter = CostAwareLimiter(rpm=100, tpm=1000)
+    assert limiter._reserve(300) == 0
+    # Con la ventana ocupada debe esperar a que caduque la última entrada
+    assert limiter._reserve(5000) > 0
+    limiter._tokens.clear()
+    limiter._tokens_in_window = 0
+    assert limiter._reserve(5000) == 0